@@ -32,19 +32,38 @@ async def get_music():
     if maiconfig.maimaidxaliasproxy:
         log.info('正在使用代理服务器访问别名服务器')
     maiApi.load_token_proxy()
+    await maiApi.open()
     asyncio.ensure_future(ws_alias_server())
-    log.info('正在获取maimai所有曲目信息')
-    await mai.get_music()
-    log.info('正在获取maimai牌子数据')
-    await mai.get_plate_json()
-    log.info('正在获取maimai所有曲目别名信息')
-    await mai.get_music_alias()
+    timer = Timer('maimai数据加载')
+    local = all(file.exists() for file in (music_file, chart_file, plate_file, alias_file))
+    if local:
+        log.info('正在从本地暂存文件加载maimai数据，网络数据将在后台更新')
+    else:
+        log.info('正在获取maimai所有曲目、牌子与别名数据')
+    try:
+        await mai.load(local)
+    except Exception as e:
+        if not local:
+            raise
+        log.error(f'本地暂存文件加载失败：{type(e)}，正在从网络获取maimai数据')
+        local = False
+        await mai.load()
+    timer.phase('曲目与别名')
     mai.guess()
-    log.success('maimai数据获取完成')
-    
+    await guess.prepare()
+    timer.phase('猜歌数据')
+    log.info(f'已加载字体「{fonts.preload()}」个')
     if maiconfig.saveinmem:
         ScoreBaseImage._load_image()
         log.success('已将图片保存在内存中')
+    timer.phase('字体与图片')
+    render.start()
+    if maiconfig.maimaidxhtmlchart:
+        await browser.start()
+    timer.phase('渲染进程')
+    timer.done()
+    if local:
+        asyncio.ensure_future(update_daily())
     
     if not list(ratingdir.iterdir()):
         log.opt(colors=True).warning(
@@ -64,4 +83,16 @@ async def get_music():
             '请及时私聊BOT使用指令「更新完成表」进行生成。'
         )
 
-scheduler.add_job(update_daily, 'cron', hour=4)
\ No newline at end of file
+@driver.on_shutdown
+async def close_session():
+    """
+    bot关闭时释放连接池、渲染执行器及浏览器
+    """
+    await maiApi.close()
+    render.shutdown()
+    await browser.close()
+
+
+scheduler.add_job(update_daily, 'cron', hour=4)
+if maiconfig.maimaidxrankinginterval > 0:
+    scheduler.add_job(update_ranking, 'interval', seconds=maiconfig.maimaidxrankinginterval)
\ No newline at end of file
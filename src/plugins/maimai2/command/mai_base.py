@@ -6,7 +6,7 @@ from nonebot.permission import SUPERUSER
 from ..libraries.maimaidx_music_info import *
 from ..libraries.maimaidx_player_score import *
 from ..libraries.maimaidx_update_plate import *
-from ..libraries.tool import qqhash
+from ..libraries.tool import Timer, qqhash
 
 update_data         = on_command('更新maimai数据', permission=SUPERUSER)
 maimaidxhelp        = on_command('舞萌帮助', aliases={'帮助maimaidx'})
@@ -16,12 +16,18 @@ mai_what            = on_regex(r'.*mai.*什么(.+)?')
 random_song         = on_regex(r'^[随来给]个((?:dx|sd|标准))?([绿黄红紫白]?)([0-9]+\+?).*')
 rating_ranking      = on_command('查看排名', aliases={'查看排行'})
 my_rating_ranking   = on_command('我的排名')
+refresh_record      = on_command('刷新成绩')
+clear_record        = on_command('清除成绩缓存', permission=SUPERUSER)
+cache_status        = on_command('maimai缓存状态', permission=SUPERUSER)
+render_status       = on_command('maimai渲染状态', permission=SUPERUSER)
 
 
 @update_data.handle()
 async def _(event: PrivateMessageEvent):
-    await mai.get_music()
-    await mai.get_music_alias()
+    await mai.load()
+    mai.guess()
+    await guess.prepare()
+    render.restart()
     await update_data.finish('maimai数据更新完成')
 
 
@@ -155,16 +161,70 @@ async def _(message: Message = CommandArg()):
 async def _(event: MessageEvent):
     try:
         user = await maiApi.query_user_b50(qqid=event.user_id)
-        rank_data = await maiApi.rating_ranking()
-        for num, rank in enumerate(rank_data):
-            if rank.username == user.username:
-                result = f'您的Rating为「{rank.ra}」，排名第「{num + 1}」名'
-                await my_rating_ranking.finish(result, reply_message=True)
+        board = await leaderboard.snapshot()
+        if (rank := board.rank(user.username)) is not None:
+            num, _, ra = rank
+            result = f'截止至 {board.timestamp}\n您的Rating为「{ra}」，排名第「{num}」名'
+            await my_rating_ranking.finish(result, reply_message=True)
     except (UserNotFoundError, UserNotExistsError, UserDisabledQueryError) as e:
         await my_rating_ranking.finish(str(e), reply_message=True)
 
 
+@refresh_record.handle()
+async def _(event: MessageEvent):
+    num = maiApi.invalidate(qqid=event.user_id)
+    await refresh_record.finish(f'已清除「{num}」条成绩缓存，下次查询将重新获取数据', reply_message=True)
+
+
+@clear_record.handle()
+async def _(message: Message = CommandArg()):
+    username = message.extract_plain_text().strip()
+    if username in ['', '全部']:
+        num = maiApi.invalidate()
+    else:
+        num = maiApi.invalidate(username=username)
+    await clear_record.finish(f'已清除「{num}」条成绩缓存，下次查询将重新获取数据', reply_message=True)
+
+
+@cache_status.handle()
+async def _():
+    await cache_status.finish(
+        maiApi.status() + '\n' + assets.status() + '\n' + backgrounds.status(), reply_message=True
+    )
+
+
+@render_status.handle()
+async def _():
+    await render_status.finish(render.status(), reply_message=True)
+
+
+async def update_ranking():
+    try:
+        await leaderboard.refresh()
+    except Exception as e:
+        log.warning(f'排行榜刷新失败：{type(e)}')
+
+
 async def update_daily():
-    await mai.get_music()
+    """
+    从网络更新曲目、牌子与别名数据，启动时以本地暂存文件加载后也由此在后台更新，
+    曲目数据发生变化时才重启渲染执行器并更新定数表与完成表
+    """
+    timer = Timer('maimaiDX数据更新')
+    try:
+        changed = await mai.load()
+    except Exception as e:
+        log.error(f'maimaiDX数据更新失败：{type(e)}')
+        return
+    timer.phase('曲目与别名')
     mai.guess()
-    log.info('maimaiDX数据更新完毕')
\ No newline at end of file
+    await guess.prepare()
+    timer.phase('猜歌数据')
+    if changed:
+        render.restart()
+        timer.phase('渲染进程')
+        log.info('曲目数据发生变化，正在更新定数表与完成表')
+        await update_rating_table()
+        await update_plate_table()
+        timer.phase('定数表与完成表')
+    timer.done()
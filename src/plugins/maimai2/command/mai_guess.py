@@ -93,8 +93,7 @@ async def _(event: GroupMessageEvent):
     gid = event.group_id
     if gid not in guess.Group:
         await guess_music_solve.finish()
-    ans = event.get_plaintext().strip()
-    if ans.lower() in guess.Group[gid].answer:
+    if guess.check(gid, event.get_plaintext()):
         guess.Group[gid].end = True
         answer = MessageSegment.text('猜对了，答案是：\n') + \
             await draw_music_info(guess.Group[gid].music)
@@ -2,6 +2,7 @@ import re
 from textwrap import dedent
 from typing import List, Tuple
 
+import numpy as np
 from nonebot import on_command, on_endswith, on_regex
 from nonebot.adapters.onebot.v11 import (
     GroupMessageEvent,
@@ -37,12 +38,12 @@ def song_level(ds1: float, ds2: float) -> List[Tuple[str, str, float, str]]:
         `result`: 查询结果
     """
     result: List[Tuple[str, str, float, str]] = []
-    music_data = mai.total_list.filter(ds=(ds1, ds2))
-    for music in sorted(music_data, key=lambda x: int(x.id)):
-        if int(music.id) >= 100000:
-            continue
-        for i in music.diff:
-            result.append((music.id, music.title, music.ds[i], diffs[i]))
+    table = mai.chart_table
+    rows = np.flatnonzero(table.mask(ds=(ds1, ds2)))
+    for row in rows[np.lexsort((table.level_index[rows], table.song_id[rows]))]:
+        music = table.music[table.row[row]]
+        i = int(table.level_index[row])
+        result.append((music.id, music.title, music.ds[i], diffs[i]))
     return result
 
 
@@ -298,9 +299,15 @@ async def _(event: MessageEvent, end: str = Endswith()):
     # 标题
     result = mai.total_list.filter(title_search=name)
     if len(result) == 0:
+        # 模糊别名
+        if fuzzy := mai.total_alias_list.fuzzy(name):
+            msg = f'未找到别名为「{name}」的歌曲，您要找的可能是：\n'
+            for _, songs in fuzzy:
+                msg += f'{f"「{songs.SongID}」":<7} {songs.Name}\n'
+            msg += '请使用「id xxxxx」查询指定曲目。'
+            await search_alias_song.finish(msg.strip(), reply_message=True)
         await search_alias_song.finish(error_msg, reply_message=True)
     elif len(result) == 1:
-        msg = await draw_music_info(result.random(), event.user_id)
         await search_alias_song.finish(
             '您要找的是不是：' + await draw_music_info(result.random(), event.user_id), 
             reply_message=True
@@ -83,7 +83,7 @@ async def _(event: MessageEvent, match = RegexMatched(), user_id: Optional[int]
     username = None
     
     rating = match.group(1)
-    score = match.group(2)
+    score = int(match.group(2)) if match.group(2) else None
     
     if rating and rating not in levelList:
         await rise_score.finish('无此等级', reply_message=True)
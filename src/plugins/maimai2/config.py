@@ -1,6 +1,6 @@
 import uuid
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
 
 from loguru import logger as log
 from nonebot import get_driver, get_plugin_config
@@ -15,7 +15,22 @@ class Config(BaseModel):
     maimaidxpath: str
     maimaidxproberproxy: bool = False
     maimaidxaliasproxy: bool = False
-    saveinmem: Optional[bool] = True
+    saveinmem: Optional[Union[bool, int]] = True
+    maimaidxhttp2: bool = True
+    maimaidxmaxconnections: int = 50
+    maimaidxmaxkeepalive: int = 10
+    maimaidxcachettl: int = 120
+    maimaidxcachesize: int = 256
+    maimaidxguessfuzzy: float = 0
+    maimaidxrenderworkers: int = 2
+    maimaidximageformat: Dict[str, str] = {}
+    maimaidximagequality: int = 90
+    maimaidximagequantize: bool = False
+    maimaidximagemaxsize: int = 0
+    maimaidximagetransfer: str = 'bytes'
+    maimaidxhtmlchart: bool = False
+    maimaidxbrowserpages: int = 2
+    maimaidxrankinginterval: int = 600
     botName: str = list(driver.config.nickname)[0] if driver.config.nickname else 'Sakura'
 
 
@@ -48,9 +63,12 @@ alias_file: Path = static / 'music_alias.json'                  # 别名暂存
 local_alias_file: Path = static / 'local_music_alias.json'      # 本地别名文件
 music_file: Path = static / 'music_data.json'                   # 曲目暂存文件
 chart_file: Path = static / 'music_chart.json'                  # 谱面数据暂存文件
+plate_file: Path = static / 'music_plate.json'                  # 牌子数据暂存文件
 guess_file: Path = static / 'group_guess_switch.json'           # 猜歌开关群文件
 group_alias_file: Path = static / 'group_alias_switch.json'     # 别名推送开关群文件
-pie_html_file: Path = static / 'temp_pie.html'                  # 饼图html文件
+guess_weight_file: Path = static / 'guess_weights.npz'          # 猜曲绘裁切权重缓存文件
+image_temp_dir: Path = static / 'temp'                          # 图片发送临时文件夹
+table_manifest_file: Path = static / 'table_manifest.json'      # 定数表与完成表内容哈希文件
 
 
 # 静态资源路径
@@ -1,11 +1,208 @@
 import base64
+import os
+import threading
+from collections import OrderedDict
 from io import BytesIO
-from typing import Tuple, Union
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont, ImageOps
 
-from ..config import SHANGGUMONO, Path, coverdir
+from ..config import SHANGGUMONO, SIYUAN, TBFONT, Path, coverdir, log, maiconfig, maimaidir
+
+
+class AssetCache:
+
+    def __init__(self, budget: int, maxsize: int = 0, name: str = '素材缓存') -> None:
+        """
+        解码后的图片素材缓存，按 `(路径, 尺寸)` 保存 RGBA 图片，超出字节预算或数量上限时淘汰最久未使用的素材
+        
+        返回的图片为共享对象，只能作为绘制来源，需要修改时请先 `copy()`
+        
+        Params:
+            `budget`: 字节预算，为 `0` 时不缓存
+            `maxsize`: 数量上限，为 `0` 时不限制
+            `name`: 状态中显示的名称
+        """
+        self.budget = budget
+        self.maxsize = maxsize
+        self.name = name
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Tuple[str, Optional[Tuple[int, int]]], Image.Image] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, path: Path, size: Optional[Tuple[int, int]] = None) -> Image.Image:
+        """
+        获取素材
+        
+        Params:
+            `path`: 图片路径
+            `size`: 缩放尺寸，为 `None` 时保持原尺寸
+        Returns:
+            `Image.Image` RGBA 图片
+        """
+        def load() -> Image.Image:
+            im = Image.open(path).convert('RGBA')
+            if size is not None and im.size != size:
+                im = im.resize(size)
+            return im
+        return self.fetch((str(path), size), load)
+
+    def fetch(self, key: Tuple[str, Optional[Tuple[int, int]]], factory: Callable[[], Image.Image]) -> Image.Image:
+        """
+        获取缓存图片，未命中时调用 `factory` 生成并缓存
+        
+        Params:
+            `key`: 缓存键 `(名称, 尺寸)`
+            `factory`: 图片生成函数
+        Returns:
+            `Image.Image` 共享图片
+        """
+        with self._lock:
+            if (im := self._data.get(key)) is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return im
+            self.misses += 1
+        im = factory()
+        self.put(key, im)
+        return im
+
+    def put(self, key: Tuple[str, Optional[Tuple[int, int]]], im: Image.Image) -> None:
+        cost = im.width * im.height * 4
+        if cost > self.budget:
+            return
+        with self._lock:
+            if (old := self._data.pop(key, None)) is not None:
+                self.used -= old.width * old.height * 4
+            self._data[key] = im
+            self.used += cost
+            while self.used > self.budget or (self.maxsize and len(self._data) > self.maxsize):
+                _, old = self._data.popitem(last=False)
+                self.used -= old.width * old.height * 4
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.used = 0
+
+    def invalidate(self, path: Path) -> int:
+        """
+        移除指定图片的所有尺寸
+        
+        Params:
+            `path`: 图片路径
+        Returns:
+            `int` 移除数量
+        """
+        name = str(path)
+        with self._lock:
+            keys = [key for key in self._data if key[0] == name]
+            for key in keys:
+                im = self._data.pop(key)
+                self.used -= im.width * im.height * 4
+        return len(keys)
+
+    def status(self) -> str:
+        return (
+            f'{self.name}：{len(self._data)} 张，占用 {self.used / 1048576:.1f}/{self.budget / 1048576:.0f} MB，'
+            f'命中 {self.hits} 次，未命中 {self.misses} 次'
+        )
+
+
+def asset_budget() -> int:
+    """根据 `saveinmem` 配置计算素材缓存字节预算，`True` 为 256MB，数字为指定 MB"""
+    if maiconfig.saveinmem is True:
+        return 256 * 1048576
+    if not maiconfig.saveinmem:
+        return 0
+    return int(maiconfig.saveinmem) * 1048576
+
+
+assets = AssetCache(asset_budget())
+backgrounds = AssetCache(asset_budget(), 6, '背景缓存')
+"""完成的成绩图背景按尺寸缓存，单张可达 10MB 以上，单独限制数量以免挤占素材缓存"""
+
+
+def sprite(name: str, size: Optional[Tuple[int, int]] = None) -> Image.Image:
+    """
+    获取 `maimaidir` 下的素材
+    
+    Params:
+        `name`: 文件名
+        `size`: 缩放尺寸
+    Returns:
+        `Image.Image` RGBA 图片，不可修改
+    """
+    return assets.get(maimaidir / name, size)
+
+
+class FontRegistry:
+
+    def __init__(self) -> None:
+        """
+        字体缓存，按 `(路径, 字号)` 保存已加载的 `FreeTypeFont`，进程内共享
+        """
+        self._data: Dict[Tuple[str, int], ImageFont.FreeTypeFont] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, path: Union[Path, str], size: int) -> ImageFont.FreeTypeFont:
+        """
+        获取字体
+        
+        Params:
+            `path`: 字体路径
+            `size`: 字号
+        Returns:
+            `ImageFont.FreeTypeFont`
+        """
+        key = (str(path), size)
+        if (font := self._data.get(key)) is not None:
+            return font
+        with self._lock:
+            if (font := self._data.get(key)) is None:
+                font = self._data[key] = ImageFont.truetype(key[0], size)
+        return font
+
+    def preload(self, sizes: Optional[Dict[Path, Sequence[int]]] = None) -> int:
+        """
+        预先加载字体
+        
+        Params:
+            `sizes`: 字体路径与字号，为 `None` 时加载模板使用的全部字号
+        Returns:
+            `int` 已加载的字体数量
+        """
+        for path, _sizes in (sizes or template_font_sizes).items():
+            for size in _sizes:
+                try:
+                    self.get(path, size)
+                except OSError as e:
+                    log.warning(f'字体「{path.name}」加载失败：{type(e)}')
+                    break
+        return len(self._data)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+template_font_sizes: Dict[Path, Tuple[int, ...]] = {
+    SIYUAN: (12, 14, 17, 18, 20, 22, 24, 25, 27, 28, 30, 35, 65),
+    TBFONT: (10, 13, 15, 17, 18, 20, 22, 25, 28, 30, 35, 40, 42, 45),
+    SHANGGUMONO: (24,)
+}
+"""各绘图模板使用的字体字号"""
+
+fonts = FontRegistry()
 
 
 class DrawText:
@@ -14,8 +211,24 @@ class DrawText:
         self._img = image
         self._font = str(font)
 
+    def font(self, size: int) -> ImageFont.FreeTypeFont:
+        return fonts.get(self._font, size)
+
     def get_box(self, text: str, size: int) -> Tuple[float, float, float, float]:
-        return ImageFont.truetype(self._font, size).getbbox(text)
+        return self.font(size).getbbox(text)
+
+    def get_boxes(self, texts: Iterable[str], size: int) -> List[Tuple[float, float, float, float]]:
+        """
+        批量计算文字边界
+        
+        Params:
+            `texts`: 文字
+            `size`: 字号
+        Returns:
+            `List[Tuple[float, float, float, float]]`
+        """
+        font = self.font(size)
+        return [font.getbbox(text) for text in texts]
 
     def draw(
         self,
@@ -29,7 +242,7 @@ class DrawText:
         stroke_fill: Tuple[int, int, int, int] = (0, 0, 0, 0),
         multiline: bool = False
     ) -> None:
-        font = ImageFont.truetype(self._font, size)
+        font = self.font(size)
         if multiline:
             self._img.multiline_text(
                 (pos_x, pos_y), 
@@ -51,6 +264,19 @@ class DrawText:
                 stroke_fill=stroke_fill
             )
 
+    def draw_batch(self, items: Iterable[Union[Sequence[Any], Dict[str, Any]]]) -> None:
+        """
+        批量绘制文字，按提交顺序绘制
+        
+        Params:
+            `items`: 与 `draw` 参数一致的元组或字典，如 `(x, y, size, text, color, anchor)`
+        """
+        for item in items:
+            if isinstance(item, dict):
+                self.draw(**item)
+            else:
+                self.draw(*item)
+
 
 def tricolor_gradient(
     width: int, 
@@ -60,21 +286,48 @@ def tricolor_gradient(
     color3: Tuple[int, int, int] = (255, 255, 255)
 ) -> Image.Image:
     """绘制渐变色"""
-    array = np.zeros((height, width, 3), dtype=np.uint8)
+    y = np.arange(height, dtype=np.float64)[:, None]
+    top = y < height * 0.4
+    ratio = np.where(top, y / (height * 0.4), (y - height * 0.4) / (height * 0.6))
+    color = np.where(
+        top,
+        (1 - ratio) * np.array(color1) + ratio * np.array(color2),
+        (1 - ratio) * np.array(color2) + ratio * np.array(color3)
+    )
+    row = np.empty((height, 1, 4), dtype=np.uint8)
+    row[:, 0, :3] = np.clip(color, 0, 255)
+    row[:, 0, 3] = 255
+    array = np.ascontiguousarray(np.broadcast_to(row, (height, width, 4)))
     
-    for y in range(height):
-        if y < height * 0.4:
-            ratio = y / (height * 0.4)
-            color = (1 - ratio) * np.array(color1) + ratio * np.array(color2)
-        else:
-            ratio = (y - height * 0.4) / (height * 0.6)
-            color = (1 - ratio) * np.array(color2) + ratio * np.array(color3)
-        array[y, :] = np.clip(color, 0, 255)
-    
-    image = Image.fromarray(array).convert('RGBA')
+    image = Image.fromarray(array)
     return image
 
 
+def _draw_background(width: int, height: int) -> Image.Image:
+    im = tricolor_gradient(width, height)
+    im.alpha_composite(sprite('aurora.png', (1400, 220)))
+    im.alpha_composite(sprite('bg_shines.png'), (34, 0))
+    im.alpha_composite(sprite('rainbow.png'), (319, height - 643))
+    im.alpha_composite(sprite('rainbow_bottom.png', (1200, 200)), (100, height - 343))
+    pattern = sprite('pattern.png')
+    for h in range((height // 358) + 1):
+        im.alpha_composite(pattern, (0, (358 + 7) * h))
+    return im
+
+
+def background(width: int, height: int) -> Image.Image:
+    """
+    获取成绩图背景，包含渐变色、极光、光点、彩虹与底纹，完成的背景按尺寸缓存在 `backgrounds` 中
+    
+    Params:
+        `width`: 宽度
+        `height`: 高度
+    Returns:
+        `Image.Image` 背景副本，可直接绘制
+    """
+    return backgrounds.fetch(('<background>', (width, height)), lambda: _draw_background(width, height)).copy()
+
+
 def rounded_corners(
     image: Image.Image,
     radius: int, 
@@ -100,6 +353,87 @@ def rounded_corners(
     return new_im
 
 
+class CoverStore:
+
+    default: int = 11000
+    """缺省曲绘ID"""
+
+    def __init__(self) -> None:
+        """
+        曲绘库，保存曲绘ID到路径的映射，缩略图按 `(路径, 尺寸)` 保存在素材缓存中
+        """
+        self.paths: Dict[int, Path] = {}
+        self.mtime: Dict[int, float] = {}
+        self._scanned = False
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def refresh(self) -> int:
+        """
+        重新扫描曲绘文件夹，清除已修改或删除曲绘的缩略图
+        
+        Returns:
+            `int` 新增、修改或删除的曲绘数量
+        """
+        paths: Dict[int, Path] = {}
+        mtime: Dict[int, float] = {}
+        if coverdir.exists():
+            with os.scandir(coverdir) as it:
+                for entry in it:
+                    stem, ext = os.path.splitext(entry.name)
+                    if ext == '.png' and stem.isdigit():
+                        paths[int(stem)] = Path(entry.path)
+                        mtime[int(stem)] = entry.stat().st_mtime
+        changed = {_id for _id in mtime if self.mtime.get(_id) != mtime[_id]}
+        changed |= self.mtime.keys() - mtime.keys()
+        for _id in changed:
+            if _id in self.paths:
+                assets.invalidate(self.paths[_id])
+        self.paths, self.mtime = paths, mtime
+        self._scanned = True
+        return len(changed)
+
+    def path(self, music_id: Union[int, str]) -> Path:
+        """
+        获取曲绘路径，DX 谱面与宴会场谱面会依次尝试对应的标准谱面曲绘
+        
+        Params:
+            `music_id`: 谱面 ID
+        Returns:
+            `Path`
+        """
+        if not self._scanned:
+            self.refresh()
+        music_id = int(music_id)
+        if (_path := self.paths.get(music_id)) is not None:
+            return _path
+        if music_id > 100000:
+            music_id -= 100000
+            if (_path := self.paths.get(music_id)) is not None:
+                return _path
+        if 1000 < music_id < 10000 or 10000 < music_id <= 11000:
+            for _id in [music_id + 10000, music_id - 10000]:
+                if (_path := self.paths.get(_id)) is not None:
+                    return _path
+        return coverdir / f'{self.default}.png'
+
+    def get(self, music_id: Union[int, str], size: Optional[Tuple[int, int]] = None) -> Image.Image:
+        """
+        获取曲绘缩略图
+        
+        Params:
+            `music_id`: 谱面 ID
+            `size`: 缩放尺寸
+        Returns:
+            `Image.Image` RGBA 图片，不可修改
+        """
+        return assets.get(self.path(music_id), size)
+
+
+covers = CoverStore()
+
+
 def music_picture(music_id: Union[int, str]) -> Path:
     """
     获取谱面图片路径
@@ -109,22 +443,11 @@ def music_picture(music_id: Union[int, str]) -> Path:
     Returns:
         `Path`
     """
-    music_id = int(music_id)
-    if (_path := coverdir / f'{music_id}.png').exists():
-        return _path
-    if music_id > 100000:
-        music_id -= 100000
-        if (_path := coverdir / f'{music_id}.png').exists():
-            return _path
-    if 1000 < music_id < 10000 or 10000 < music_id <= 11000:
-        for _id in [music_id + 10000, music_id - 10000]:
-            if (_path := coverdir / f'{_id}.png').exists():
-                return _path
-    return coverdir / '11000.png'
+    return covers.path(music_id)
 
 
 def text_to_image(text: str) -> Image.Image:
-    font = ImageFont.truetype(str(SHANGGUMONO), 24)
+    font = fonts.get(SHANGGUMONO, 24)
     padding = 10
     margin = 4
     lines = text.strip().split('\n')
@@ -143,12 +466,61 @@ def text_to_image(text: str) -> Image.Image:
 
 
 def text_to_bytes_io(text: str) -> BytesIO:
-    bio = BytesIO()
-    text_to_image(text).save(bio, format='PNG')
+    bio = BytesIO(encode_image(text_to_image(text), 'text'))
     bio.seek(0)
     return bio
 
 
+def output_format(kind: str = 'default') -> str:
+    """
+    获取消息类型对应的图片格式，未配置时使用 `default` 的格式，均未配置时为 `PNG`
+    
+    Params:
+        `kind`: 消息类型
+    Returns:
+        `str` `PNG`、`JPEG` 或 `WEBP`
+    """
+    formats = maiconfig.maimaidximageformat
+    return formats.get(kind, formats.get('default', 'PNG')).upper()
+
+
+def _encode(im: Image.Image, format: str) -> bytes:
+    output = BytesIO()
+    if format == 'JPEG':
+        if im.mode != 'RGB':
+            im = im.convert('RGB')
+        im.save(output, format, quality=maiconfig.maimaidximagequality, optimize=True)
+    elif format == 'WEBP':
+        im.save(output, format, quality=maiconfig.maimaidximagequality, method=4)
+    else:
+        if maiconfig.maimaidximagequantize:
+            if im.mode not in ('RGB', 'RGBA'):
+                im = im.convert('RGBA')
+            im = im.quantize(256, Image.Quantize.FASTOCTREE)
+        im.save(output, format)
+    return output.getvalue()
+
+
+def encode_image(im: Image.Image, kind: str = 'default') -> bytes:
+    """
+    按配置编码图片，配置了 `maimaidximagemaxsize` 时逐步缩小图片直至不超过限制
+    
+    Params:
+        `im`: 图片
+        `kind`: 消息类型，用于选择图片格式
+    Returns:
+        `bytes` 图片数据
+    """
+    format = output_format(kind)
+    limit = maiconfig.maimaidximagemaxsize * 1024
+    data = _encode(im, format)
+    while limit and len(data) > limit and min(im.size) > 200:
+        scale = max(min((limit / len(data)) ** 0.5 * 0.95, 0.9), 0.5)
+        im = im.resize((int(im.width * scale), int(im.height * scale)), Image.Resampling.LANCZOS)
+        data = _encode(im, format)
+    return data
+
+
 def image_to_base64(img: Image.Image, format='PNG') -> str:
     output_buffer = BytesIO()
     img.save(output_buffer, format)
@@ -1,10 +1,16 @@
-from typing import Any, Dict
+from importlib.util import find_spec
+from typing import Any, Awaitable, Callable, Dict, Tuple
 
 import httpx
 
-from ..config import UUID, maiconfig
+from ..config import UUID, log, maiconfig, plate_to_dx_version
+from .maimaidx_cache import SingleFlight, TTLCache
 from .maimaidx_error import *
 from .maimaidx_model import *
+from .tool import loads
+
+UserKey = Tuple[Optional[int], Optional[str]]
+ALL_VERSION = frozenset(plate_to_dx_version.values())
 
 
 class MaimaiAPI:
@@ -22,6 +28,11 @@ class MaimaiAPI:
         self.token = None
         self.MaiProberProxyAPI = None
         self.MaiAliasProxyAPI = None
+        self._session: Dict[str, httpx.AsyncClient] = {}
+        self.cache: TTLCache[Any] = TTLCache(maiconfig.maimaidxcachettl, maiconfig.maimaidxcachesize)
+        self.flight = SingleFlight()
+        self.music_version: Dict[int, str] = {}
+        """曲目ID对应版本，用于从全版本成绩中筛选指定版本"""
 
     def load_token_proxy(self) -> None:
         self.MaiProberProxyAPI = self.MaiProberAPI if not maiconfig.maimaidxproberproxy else self.MaiProxyAPI + '/maimaidxprober'
@@ -30,6 +41,88 @@ class MaimaiAPI:
         if self.token:
             self.headers = {'developer-token': self.token}
 
+    def _client(self, host: str) -> httpx.AsyncClient:
+        """
+        获取指定上游的长连接客户端，未初始化时自动创建
+
+        Params:
+            `host`: 上游名称，`prober` 查分器 / `alias` 别名库 / `qq` 头像
+        Returns:
+            `httpx.AsyncClient`
+        """
+        session = self._session.get(host)
+        if session is None or session.is_closed:
+            http2 = maiconfig.maimaidxhttp2 and find_spec('h2') is not None
+            session = httpx.AsyncClient(
+                timeout=30,
+                http2=http2,
+                limits=httpx.Limits(
+                    max_connections=maiconfig.maimaidxmaxconnections,
+                    max_keepalive_connections=maiconfig.maimaidxmaxkeepalive
+                )
+            )
+            self._session[host] = session
+        return session
+
+    async def open(self) -> None:
+        """初始化各上游连接池"""
+        if maiconfig.maimaidxhttp2 and find_spec('h2') is None:
+            log.warning('未安装 `h2`，连接池将使用 HTTP/1.1，可使用 `pip install httpx[http2]` 安装')
+        for host in ['prober', 'alias', 'qq']:
+            self._client(host)
+
+    async def close(self) -> None:
+        """关闭所有连接池"""
+        for session in self._session.values():
+            await session.aclose()
+        self._session.clear()
+
+    def invalidate(self, *, qqid: Optional[int] = None, username: Optional[str] = None) -> int:
+        """
+        清除指定玩家的成绩缓存，均为空时清除所有缓存
+
+        Params:
+            `qqid`: QQ号
+            `username`: 用户名
+        Returns:
+            `int` 清除的条目数量
+        """
+        if qqid is None and username is None:
+            num = len(self.cache)
+            self.cache.clear()
+            return num
+        return self.cache.invalidate(
+            lambda key: (qqid is not None and key[1][0] == qqid) or (username is not None and key[1][1] == username)
+        )
+
+    async def cached(self, key: Tuple, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        优先读取缓存，未命中时合并相同的并发请求并写入缓存
+
+        Params:
+            `key`: 缓存键
+            `factory`: 返回请求协程的函数
+        Returns:
+            `Any` 请求结果
+        """
+        if (cached := self.cache.get(key)) is not None:
+            return cached
+
+        async def fetch() -> Any:
+            result = await factory()
+            self.cache.set(key, result)
+            return result
+
+        return await self.flight.do(key, fetch)
+
+    def status(self) -> str:
+        """缓存与请求合并统计"""
+        return (
+            f'成绩缓存：{len(self.cache)} 条，命中 {self.cache.hits} 次，未命中 {self.cache.misses} 次\n'
+            f'上游请求：{self.flight.calls} 次，合并重复请求 {self.flight.shared} 次，'
+            f'进行中 {self.flight.inflight} 个'
+        )
+
     async def _requestalias(self, method: str, endpoint: str, **kwargs) -> APIResult:
         """
         别名库通用请求
@@ -41,15 +134,15 @@ class MaimaiAPI:
         Returns:
             `Dict[str, Any]` 返回结果
         """
-        async with httpx.AsyncClient(timeout=30) as session:
-            res = await session.request(method, self.MaiAliasProxyAPI + endpoint, **kwargs)
-            if res.status_code == 200:
-                data = res.json()
-                return APIResult.model_validate(data)
-            elif res.status_code == 500:
-                raise ServerError
-            else:
-                raise UnknownError
+        session = self._client('alias')
+        res = await session.request(method, self.MaiAliasProxyAPI + endpoint, **kwargs)
+        if res.status_code == 200:
+            data = loads(res.content)
+            return APIResult.model_validate(data)
+        elif res.status_code == 500:
+            raise ServerError
+        else:
+            raise UnknownError
 
     async def _requestmai(
         self, 
@@ -67,37 +160,37 @@ class MaimaiAPI:
         Returns:
             `Dict[str, Any]` 返回结果
         """
-        async with httpx.AsyncClient(timeout=30) as session:
-            res = await session.request(
-                method, 
-                self.MaiProberProxyAPI + endpoint, 
-                headers=self.headers, 
-                **kwargs
-            )
-            if res.status_code == 200:
-                data = res.json()
-            elif res.status_code == 400:
-                error: Dict = res.json()
-                if 'message' in error:
-                    if error['message'] == 'no such user':
-                        raise UserNotFoundError
-                    elif error['message'] == 'user not exists':
-                        raise UserNotExistsError
-                    else:
-                        raise UserNotFoundError
-                elif 'msg' in error:
-                    if error['msg'] == '开发者token有误':
-                        raise TokenError
-                    elif error['msg'] == '开发者token被禁用':
-                        raise TokenDisableError
-                    else:
-                        raise TokenNotFoundError
+        session = self._client('prober')
+        res = await session.request(
+            method, 
+            self.MaiProberProxyAPI + endpoint, 
+            headers=self.headers, 
+            **kwargs
+        )
+        if res.status_code == 200:
+            data = loads(res.content)
+        elif res.status_code == 400:
+            error: Dict = res.json()
+            if 'message' in error:
+                if error['message'] == 'no such user':
+                    raise UserNotFoundError
+                elif error['message'] == 'user not exists':
+                    raise UserNotExistsError
                 else:
                     raise UserNotFoundError
-            elif res.status_code == 403:
-                raise UserDisabledQueryError
+            elif 'msg' in error:
+                if error['msg'] == '开发者token有误':
+                    raise TokenError
+                elif error['msg'] == '开发者token被禁用':
+                    raise TokenDisableError
+                else:
+                    raise TokenNotFoundError
             else:
-                raise UnknownError
+                raise UserNotFoundError
+        elif res.status_code == 403:
+            raise UserDisabledQueryError
+        else:
+            raise UnknownError
         return data
 
     async def music_data(self):
@@ -130,7 +223,10 @@ class MaimaiAPI:
             json['username'] = username
         json['b50'] = True
 
-        return UserInfo.model_validate(await self._requestmai('POST', '/query/player', json=json))
+        async def fetch() -> UserInfo:
+            return UserInfo.model_validate(await self._requestmai('POST', '/query/player', json=json))
+
+        return await self.cached(('b50', (qqid, username)), fetch)
 
     async def query_user_plate(
         self,
@@ -140,7 +236,7 @@ class MaimaiAPI:
         version: Optional[List[str]] = None
     ) -> List[PlayInfoDefault]:
         """
-        请求用户数据
+        请求用户数据，缓存中已有该玩家全版本成绩索引时直接从中筛选
 
         Params:
             `qqid`: 用户QQ
@@ -149,6 +245,11 @@ class MaimaiAPI:
         Returns:
             `List[PlayInfoDefault]` 数据列表
         """
+        versions = frozenset(version) if version else None
+        if versions and versions != ALL_VERSION and self.music_version \
+            and (store := self.cache.get(('records', (qqid, username)), count=False)) is not None and not store.dev:
+            self.cache.hit()
+            return [d for d in store if self.music_version.get(d.song_id) in versions]
         json = {}
         if qqid:
             json['qq'] = qqid
@@ -156,6 +257,7 @@ class MaimaiAPI:
             json['username'] = username
         if version:
             json['version'] = version
+
         result = await self._requestmai('POST', '/query/plate', json=json)
         return [PlayInfoDefault.model_validate(d) for d in result['verlist']]
 
@@ -215,15 +317,14 @@ class MaimaiAPI:
             return [PlayInfoDev.model_validate(d) for k, v in result.items() for d in v]
         return [PlayInfoDev.model_validate(d) for d in result[str(music_id)]]
 
-    async def rating_ranking(self) -> List[UserRanking]:
+    async def rating_ranking(self) -> List[Dict[str, Any]]:
         """
-        获取查分器排行榜
+        获取查分器排行榜，数据量较大，不做模型校验与排序，由 `Leaderboard` 建立快照
         
         Returns:
-            `List[UserRanking]` 按`ra`从高到低排序后的查分器排行模型列表
+            `List[Dict[str, Any]]` 包含 `username` 与 `ra` 的原始数据
         """
-        result = await self._requestmai('GET', '/rating_ranking')
-        return sorted([UserRanking.model_validate(u) for u in result], key=lambda x: x.ra, reverse=True)
+        return await self._requestmai('GET', '/rating_ranking')
 
     async def get_plate_json(self) -> Dict[str, List[int]]:
         """获取所有版本牌子完成需求"""
@@ -333,7 +434,7 @@ class MaimaiAPI:
 
     async def qqlogo(self, qqid: int = None, icon: str = None) -> Optional[bytes]:
         """获取QQ头像"""
-        session = httpx.AsyncClient(timeout=30)
+        session = self._client('qq')
         if qqid:
             params = {
                 'b': 'qq',
@@ -1,17 +1,20 @@
 import math
 import traceback
+from bisect import bisect_right
 from io import BytesIO
-from typing import Tuple, Union, overload
+from typing import Sequence, Tuple, Union, overload
 
+import numpy as np
 from nonebot.adapters.onebot.v11 import MessageSegment
 from PIL import Image, ImageDraw
 
 from ..config import *
-from .image import DrawText, image_to_base64, music_picture
+from .image import DrawText, assets, covers, image_to_base64, music_picture, sprite
 from .maimaidx_api_data import maiApi
 from .maimaidx_error import *
 from .maimaidx_model import ChartInfo, PlayInfoDefault, PlayInfoDev, UserInfo
 from .maimaidx_music import mai
+from .maimaidx_render import image_segment, render
 
 
 class ScoreBaseImage:
@@ -54,31 +57,30 @@ class ScoreBaseImage:
     @classmethod
     def _load_image(cls):
         cls._diff = [
-            Image.open(maimaidir / 'b50_score_basic.png'), 
-            Image.open(maimaidir / 'b50_score_advanced.png'), 
-            Image.open(maimaidir / 'b50_score_expert.png'), 
-            Image.open(maimaidir / 'b50_score_master.png'), 
-            Image.open(maimaidir / 'b50_score_remaster.png')
+            sprite('b50_score_basic.png'), 
+            sprite('b50_score_advanced.png'), 
+            sprite('b50_score_expert.png'), 
+            sprite('b50_score_master.png'), 
+            sprite('b50_score_remaster.png')
         ]
         cls._rise = [
-            Image.open(maimaidir / 'rise_score_basic.png'),
-            Image.open(maimaidir / 'rise_score_advanced.png'),
-            Image.open(maimaidir / 'rise_score_expert.png'),
-            Image.open(maimaidir / 'rise_score_master.png'),
-            Image.open(maimaidir / 'rise_score_remaster.png')
+            sprite('rise_score_basic.png'),
+            sprite('rise_score_advanced.png'),
+            sprite('rise_score_expert.png'),
+            sprite('rise_score_master.png'),
+            sprite('rise_score_remaster.png')
         ]
-        cls.title_bg = Image.open(maimaidir / 'title.png')
-        cls.title_lengthen_bg = Image.open(maimaidir / 'title-lengthen.png')
-        cls.design_bg = Image.open(maimaidir / 'design.png')
-        cls.aurora_bg = Image.open(maimaidir / 'aurora.png').convert('RGBA').resize((1400, 220))
-        cls.shines_bg = Image.open(maimaidir / 'bg_shines.png').convert('RGBA')
-        cls.pattern_bg = Image.open(maimaidir / 'pattern.png')
-        cls.rainbow_bg = Image.open(maimaidir / 'rainbow.png').convert('RGBA')
-        cls.rainbow_bottom_bg = Image.open(maimaidir / 'rainbow_bottom.png').convert('RGBA').resize((1200, 200))
+        cls.title_bg = sprite('title.png')
+        cls.title_lengthen_bg = sprite('title-lengthen.png')
+        cls.design_bg = sprite('design.png')
+        cls.aurora_bg = sprite('aurora.png', (1400, 220))
+        cls.shines_bg = sprite('bg_shines.png')
+        cls.pattern_bg = sprite('pattern.png')
+        cls.rainbow_bg = sprite('rainbow.png')
+        cls.rainbow_bottom_bg = sprite('rainbow_bottom.png', (1200, 200))
     
     def __init__(self, image: Image.Image = None) -> None:
-        if not maiconfig.saveinmem:
-            self._load_image()
+        self._load_image()
         
         self._im = image
         dr = ImageDraw.Draw(self._im)
@@ -112,44 +114,47 @@ class ScoreBaseImage:
             else:
                 x += 276
 
-            cover = Image.open(music_picture(info.song_id)).resize((75, 75))
-            version = Image.open(maimaidir / f'{info.type.upper()}.png').resize((37, 14))
+            cover = covers.get(info.song_id, (75, 75))
+            version = sprite(f'{info.type.upper()}.png', (37, 14))
             if info.rate.islower():
-                rate = Image.open(maimaidir / f'UI_TTR_Rank_{score_Rank_l[info.rate]}.png').resize((63, 28))
+                rate = sprite(f'UI_TTR_Rank_{score_Rank_l[info.rate]}.png', (63, 28))
             else:
-                rate = Image.open(maimaidir / f'UI_TTR_Rank_{info.rate}.png').resize((63, 28))
+                rate = sprite(f'UI_TTR_Rank_{info.rate}.png', (63, 28))
 
             self._im.alpha_composite(self._diff[info.level_index], (x, y))
             self._im.alpha_composite(cover, (x + 12, y + 12))
             self._im.alpha_composite(version, (x + 51, y + 91))
             self._im.alpha_composite(rate, (x + 92, y + 78))
             if info.fc:
-                fc = Image.open(maimaidir / f'UI_MSS_MBase_Icon_{fcl[info.fc]}.png').resize((34, 34))
+                fc = sprite(f'UI_MSS_MBase_Icon_{fcl[info.fc]}.png', (34, 34))
                 self._im.alpha_composite(fc, (x + 154, y + 77))
             if info.fs:
-                fs = Image.open(maimaidir / f'UI_MSS_MBase_Icon_{fsl[info.fs]}.png').resize((34, 34))
+                fs = sprite(f'UI_MSS_MBase_Icon_{fsl[info.fs]}.png', (34, 34))
                 self._im.alpha_composite(fs, (x + 185, y + 77))
             
             dxscore = sum(mai.total_list.by_id(str(info.song_id)).charts[info.level_index].notes) * 3
             dxnum = dxScore(info.dxScore / dxscore * 100)
             if dxnum:
                 self._im.alpha_composite(
-                    Image.open(maimaidir / f'UI_GAM_Gauge_DXScoreIcon_0{dxnum}.png').resize((47, 26)), (x + 217, y + 80)
+                    sprite(f'UI_GAM_Gauge_DXScoreIcon_0{dxnum}.png', (47, 26)), (x + 217, y + 80)
                 )
 
-            self._tb.draw(x + 26, y + 98, 13, info.song_id, self.id_color[info.level_index], anchor='mm')
             title = info.title
             if coloumWidth(title) > 18:
                 title = changeColumnWidth(title, 17) + '...'
-            self._sy.draw(x + 93, y + 14, 14, title, self.t_color[info.level_index], anchor='lm')
-            self._tb.draw(x + 93, y + 38, 30, f'{info.achievements:.4f}%', self.t_color[info.level_index], anchor='lm')
-            self._tb.draw(x + 219, y + 65, 15, f'{info.dxScore}/{dxscore}', self.t_color[info.level_index], anchor='mm')
-            self._tb.draw(x + 93, y + 65, 15, f'{info.ds} -> {info.ra}', self.t_color[info.level_index], anchor='lm')
+            color = self.t_color[info.level_index]
+            self._tb.draw_batch([
+                (x + 26, y + 98, 13, info.song_id, self.id_color[info.level_index], 'mm'),
+                (x + 93, y + 38, 30, f'{info.achievements:.4f}%', color, 'lm'),
+                (x + 219, y + 65, 15, f'{info.dxScore}/{dxscore}', color, 'mm'),
+                (x + 93, y + 65, 15, f'{info.ds} -> {info.ra}', color, 'lm')
+            ])
+            self._sy.draw(x + 93, y + 14, 14, title, color, anchor='lm')
 
 
 class DrawBest(ScoreBaseImage):
 
-    def __init__(self, UserInfo: UserInfo, qqid: Optional[Union[int, str]] = None) -> None:
+    def __init__(self, UserInfo: UserInfo, qqlogo: Optional[bytes] = None) -> None:
         super().__init__(Image.open(maimaidir / 'b50_bg.png').convert('RGBA'))
         self.userName = UserInfo.nickname
         self.plate = UserInfo.plate
@@ -157,7 +162,7 @@ class DrawBest(ScoreBaseImage):
         self.Rating = UserInfo.rating
         self.sdBest = UserInfo.charts.sd
         self.dxBest = UserInfo.charts.dx
-        self.qqid = qqid
+        self.qqlogo = qqlogo
 
     def _findRaPic(self) -> str:
         """
@@ -203,26 +208,26 @@ class DrawBest(ScoreBaseImage):
             num = f'{self.addRating + 1:02d}'
         return f'UI_DNM_DaniPlate_{num}.png'
 
-    async def draw(self) -> Image.Image:
+    def draw(self) -> Image.Image:
         
-        logo = Image.open(maimaidir / 'logo.png').resize((249, 120))
-        dx_rating = Image.open(maimaidir / self._findRaPic()).resize((186, 35))
-        Name = Image.open(maimaidir / 'Name.png')
-        MatchLevel = Image.open(maimaidir / self._findMatchLevel()).resize((80, 32))
-        ClassLevel = Image.open(maimaidir / 'UI_FBR_Class_00.png').resize((90, 54))
-        rating = Image.open(maimaidir / 'UI_CMN_Shougou_Rainbow.png').resize((270, 27))
+        logo = sprite('logo.png', (249, 120))
+        dx_rating = sprite(self._findRaPic(), (186, 35))
+        Name = sprite('Name.png')
+        MatchLevel = sprite(self._findMatchLevel(), (80, 32))
+        ClassLevel = sprite('UI_FBR_Class_00.png', (90, 54))
+        rating = sprite('UI_CMN_Shougou_Rainbow.png', (270, 27))
 
         self._im.alpha_composite(logo, (14, 60))
         if self.plate:
-            plate = Image.open(platedir / f'{self.plate}.png').resize((800, 130))
+            plate = assets.get(platedir / f'{self.plate}.png', (800, 130))
         else:
-            plate = Image.open(maimaidir / 'UI_Plate_300501.png').resize((800, 130))
+            plate = sprite('UI_Plate_300501.png', (800, 130))
         self._im.alpha_composite(plate, (300, 60))
-        icon = Image.open(maimaidir / 'UI_Icon_309503.png').resize((120, 120))
+        icon = sprite('UI_Icon_309503.png', (120, 120))
         self._im.alpha_composite(icon, (305, 65))
-        if self.qqid:
+        if self.qqlogo:
             try:
-                qqLogo = Image.open(BytesIO(await maiApi.qqlogo(qqid=self.qqid)))
+                qqLogo = Image.open(BytesIO(self.qqlogo))
                 self._im.alpha_composite(qqLogo.convert('RGBA').resize((120, 120)), (305, 65))
             except Exception:
                 pass
@@ -230,7 +235,7 @@ class DrawBest(ScoreBaseImage):
         Rating = f'{self.Rating:05d}'
         for n, i in enumerate(Rating):
             self._im.alpha_composite(
-                Image.open(maimaidir / f'UI_NUM_Drating_{i}.png').resize((17, 20)), (520 + 15 * n, 80)
+                sprite(f'UI_NUM_Drating_{i}.png', (17, 20)), (520 + 15 * n, 80)
             )
         self._im.alpha_composite(Name, (435, 115))
         self._im.alpha_composite(MatchLevel, (625, 120))
@@ -256,6 +261,16 @@ class DrawBest(ScoreBaseImage):
         return self._im
 
 
+def draw_best(userinfo: UserInfo, qqlogo: Optional[bytes] = None) -> Image.Image:
+    """绘制b50，供渲染执行器调用"""
+    return DrawBest(userinfo, qqlogo).draw()
+
+
+rateList: List[str] = list(score_Rank_l.values())
+_achievement_array = np.array(achievementList)
+_base_ra_array = np.array(BaseRaSpp)
+
+
 def dxScore(dx: int) -> int:
     """
     获取DX评分星星数量
@@ -355,59 +370,37 @@ def computeRa(
     onlyrate: bool = False, 
     israte: bool = False
 ) -> Union[int, Tuple[int, str]]:
-    if achievement < 50:
-        baseRa = 7.0
-        rate = 'D'
-    elif achievement < 60:
-        baseRa = 8.0
-        rate = 'C'
-    elif achievement < 70:
-        baseRa = 9.6
-        rate = 'B'
-    elif achievement < 75:
-        baseRa = 11.2
-        rate = 'BB'
-    elif achievement < 80:
-        baseRa = 12.0
-        rate = 'BBB'
-    elif achievement < 90:
-        baseRa = 13.6
-        rate = 'A'
-    elif achievement < 94:
-        baseRa = 15.2
-        rate = 'AA'
-    elif achievement < 97:
-        baseRa = 16.8
-        rate = 'AAA'
-    elif achievement < 98:
-        baseRa = 20.0
-        rate = 'S'
-    elif achievement < 99:
-        baseRa = 20.3
-        rate = 'Sp'
-    elif achievement < 99.5:
-        baseRa = 20.8
-        rate = 'SS'
-    elif achievement < 100:
-        baseRa = 21.1
-        rate = 'SSp'
-    elif achievement < 100.5:
-        baseRa = 21.6
-        rate = 'SSS'
-    else:
-        baseRa = 22.4
-        rate = 'SSSp'
+    rank = bisect_right(achievementList, achievement)
+    rate = rateList[rank]
 
+    if onlyrate:
+        return rate
+    data = math.floor(ds * (min(100.5, achievement) / 100) * BaseRaSpp[rank])
     if israte:
-        data = (math.floor(ds * (min(100.5, achievement) / 100) * baseRa), rate)
-    elif onlyrate:
-        data = rate
-    else:
-        data = math.floor(ds * (min(100.5, achievement) / 100) * baseRa)
-
+        return data, rate
     return data
 
 
+def computeRa_array(
+    ds: Union[float, Sequence[float], np.ndarray], 
+    achievement: Union[float, Sequence[float], np.ndarray]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    批量计算底分和评价，`ds` 与 `achievement` 按 NumPy 规则广播
+    
+    Params:
+        `ds`: 定数数组
+        `achievement`: 成绩数组
+    Returns:
+        (底分数组, 评价数组)，评价为 `rateList` 下标
+    """
+    ds = np.asarray(ds, dtype=np.float64)
+    achievement = np.asarray(achievement, dtype=np.float64)
+    rank = np.searchsorted(_achievement_array, achievement, side='right')
+    ra = np.floor(ds * (np.minimum(100.5, achievement) / 100) * _base_ra_array[rank]).astype(np.int64)
+    return ra, np.broadcast_to(rank, ra.shape)
+
+
 async def generate(qqid: Optional[int] = None, username: Optional[str] = None) -> Union[MessageSegment, str]:
     """
     生成b50
@@ -423,9 +416,14 @@ async def generate(qqid: Optional[int] = None, username: Optional[str] = None) -
         if username:
             qqid = None
         userinfo = await maiApi.query_user_b50(qqid=qqid, username=username)
-        draw_best = DrawBest(userinfo, qqid)
+        qqlogo = None
+        if qqid:
+            try:
+                qqlogo = await maiApi.qqlogo(qqid=qqid)
+            except Exception:
+                pass
         
-        msg = MessageSegment.image(image_to_base64(await draw_best.draw()))
+        msg = await render.image(draw_best, userinfo, qqlogo)
     except (UserNotFoundError, UserNotExistsError, UserDisabledQueryError) as e:
         msg = str(e)
     except Exception as e:
@@ -0,0 +1,130 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar('V')
+
+
+class TTLCache(Generic[V]):
+
+    def __init__(self, ttl: float, maxsize: int) -> None:
+        """
+        带过期时间的LRU缓存
+
+        Params:
+            `ttl`: 过期时间（秒），小于等于 `0` 时不缓存
+            `maxsize`: 最大条目数
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, Tuple[float, V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, count=False) is not None
+
+    def get(self, key: Hashable, *, count: bool = True) -> Optional[V]:
+        """
+        获取缓存，过期条目会被移除
+
+        Params:
+            `key`: 键
+            `count`: 是否计入命中统计
+        Returns:
+            `Optional[V]`
+        """
+        item = self._data.get(key)
+        if item is not None:
+            expire, value = item
+            if expire > time.monotonic():
+                self._data.move_to_end(key)
+                if count:
+                    self.hits += 1
+                return value
+            del self._data[key]
+        if count:
+            self.misses += 1
+        return None
+
+    def hit(self) -> None:
+        """记录一次命中，用于由其它缓存条目派生出结果的情况"""
+        self.hits += 1
+
+    def set(self, key: Hashable, value: V) -> None:
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Optional[V]:
+        item = self._data.pop(key, None)
+        return item[1] if item else None
+
+    def invalidate(self, predicate: Callable[[Any], bool]) -> int:
+        """
+        移除所有键满足条件的条目
+
+        Params:
+            `predicate`: 判断函数，参数为键
+        Returns:
+            `int` 移除数量
+        """
+        keys = [key for key in self._data if predicate(key)]
+        for key in keys:
+            del self._data[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class SingleFlight:
+
+    def __init__(self) -> None:
+        """合并相同的并发请求，同一时刻相同的键只会执行一次"""
+        self.calls = 0
+        """执行的请求次数"""
+        self.shared = 0
+        """被合并的请求次数"""
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[V]]) -> V:
+        """
+        执行请求，若已有相同的请求正在进行则等待其结果
+
+        请求在独立的任务中执行，发起请求的调用方被取消时不会影响其它等待者
+
+        Params:
+            `key`: 请求键
+            `factory`: 返回协程的函数
+        Returns:
+            `V` 请求结果
+        """
+        if (task := self._inflight.get(key)) is not None:
+            self.shared += 1
+            return await asyncio.shield(task)
+        task = asyncio.ensure_future(factory())
+        self._inflight[key] = task
+        self.calls += 1
+
+        def done(task: asyncio.Future) -> None:
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+            # 防止无等待者时出现 `exception was never retrieved`
+            if not task.cancelled():
+                task.exception()
+
+        task.add_done_callback(done)
+        return await asyncio.shield(task)
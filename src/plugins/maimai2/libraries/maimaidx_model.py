@@ -1,5 +1,5 @@
 from collections import namedtuple
-from typing import List, Optional, Union
+from typing import FrozenSet, List, Optional, Union
 
 from pydantic import BaseModel, Field
 
@@ -116,7 +116,7 @@ class GuessData(BaseModel):
     
     music: Music
     img: str
-    answer: List[str]
+    answer: FrozenSet[str]
     end: bool = False
 
 
@@ -1,116 +1,278 @@
 import asyncio
+import hashlib
 import json
 import random
+import time
+import unicodedata
+from bisect import bisect_left, bisect_right
 from collections import defaultdict
-from copy import deepcopy
-from typing import Tuple
+from typing import Any, Awaitable, Callable, FrozenSet, Iterable, Set, SupportsIndex, Tuple
 
 import numpy as np
 from PIL import Image
 
 from ..config import *
-from .image import image_to_base64, music_picture
+from .image import covers, image_to_base64, music_picture
 from .maimaidx_api_data import maiApi
 from .maimaidx_error import *
 from .maimaidx_model import *
-from .tool import openfile, writefile
-
-
-def cross(
-    checker: Union[List[str], List[float]], 
-    elem: Optional[Union[str, float, List[str], List[float], Tuple[float, float]]], 
-    diff: List[int]
-) -> Tuple[bool, List[int]]:
-    ret = False
-    diff_ret = []
-    if not elem or elem is Ellipsis:
-        return True, diff
-    if isinstance(elem, List):
-        for _j in (range(len(checker)) if diff is Ellipsis else diff):
-            if _j >= len(checker):
-                continue
-            __e = checker[_j]
-            if __e in elem:
-                diff_ret.append(_j)
-                ret = True
-    elif isinstance(elem, Tuple):
-        for _j in (range(len(checker)) if diff is Ellipsis else diff):
-            if _j >= len(checker):
+from .tool import Timer, openfile, writefile
+
+
+Predicate = Optional[Union[str, float, List[str], List[float], Tuple[float, float]]]
+
+
+class Column:
+
+    def __init__(self, values: Iterable[Any]) -> None:
+        """
+        倒排列索引，记录每个取值对应的行号，并保存有序取值用于范围查询
+
+        Params:
+            `values`: 按行号排列的取值
+        """
+        self.rows: Dict[Any, Set[int]] = defaultdict(set)
+        for row, value in enumerate(values):
+            self.rows[value].add(row)
+        self.keys = sorted(self.rows)
+
+    def match(self, elem: Predicate) -> Set[int]:
+        """
+        查询满足条件的行号，列表为包含，元组为闭区间，其余为相等
+
+        Params:
+            `elem`: 条件
+        Returns:
+            `Set[int]` 行号集合
+        """
+        if isinstance(elem, List):
+            rows = set()
+            for e in elem:
+                rows |= self.rows.get(e, set())
+            return rows
+        if isinstance(elem, Tuple):
+            rows = set()
+            for key in self.keys[bisect_left(self.keys, elem[0]):bisect_right(self.keys, elem[1])]:
+                rows |= self.rows[key]
+            return rows
+        return set(self.rows.get(elem, set()))
+
+
+class MusicQuery:
+
+    def __init__(self, music_list: List[Music]) -> None:
+        """
+        曲目查询引擎，将曲目按谱面展开为列并建立索引，查询时无需复制曲目
+
+        Params:
+            `music_list`: 曲目列表
+        """
+        self.music = list(music_list)
+        self.chart_song: List[int] = []
+        """谱面所属曲目行号"""
+        self.chart_diff: List[int] = []
+        """谱面难度"""
+        self.chart_charter: List[str] = []
+        for row, music in enumerate(self.music):
+            for index in range(len(music.level)):
+                self.chart_song.append(row)
+                self.chart_diff.append(index)
+                self.chart_charter.append(
+                    (music.charts[index].charter or '').lower() if index < len(music.charts) else ''
+                )
+        levels = [self.music[row].level[index] for row, index in zip(self.chart_song, self.chart_diff)]
+        self.level = Column(levels)
+        self.ds = Column(
+            self.music[row].ds[index] if index < len(self.music[row].ds) else None
+            for row, index in zip(self.chart_song, self.chart_diff)
+        )
+        self.ds.rows.pop(None, None)
+        self.ds.keys = sorted(self.ds.rows)
+        self.diff = Column(self.chart_diff)
+        self.genre = Column(music.basic_info.genre for music in self.music)
+        self.type = Column(music.type for music in self.music)
+        self.bpm = Column(music.basic_info.bpm for music in self.music)
+        self.version = Column(music.basic_info.version for music in self.music)
+        self.title = [music.title.lower() for music in self.music]
+        self.artist = [music.basic_info.artist.lower() for music in self.music]
+
+    def filter(
+        self,
+        *,
+        level: Predicate = ...,
+        ds: Predicate = ...,
+        title_search: Optional[str] = ...,
+        artist_search: Optional[str] = ...,
+        charter_search: Optional[str] = ...,
+        genre: Predicate = ...,
+        bpm: Predicate = ...,
+        type: Predicate = ...,
+        diff: List[int] = ...,
+        version: Predicate = ...
+    ) -> 'MusicList':
+        songs: Optional[Set[int]] = None
+        for column, elem in [
+            (self.genre, genre), 
+            (self.type, type), 
+            (self.bpm, bpm), 
+            (self.version, version)
+        ]:
+            if elem is Ellipsis:
                 continue
-            __e = checker[_j]
-            if elem[0] <= __e <= elem[1]:
-                diff_ret.append(_j)
-                ret = True
-    else:
-        for _j in (range(len(checker)) if diff is Ellipsis else diff):
-            if _j >= len(checker):
+            rows = column.match(elem)
+            songs = rows if songs is None else songs & rows
+            if not songs:
+                return MusicList()
+        if songs is None:
+            songs = set(range(len(self.music)))
+        if title_search is not Ellipsis:
+            keyword = title_search.lower()
+            songs = {row for row in songs if keyword in self.title[row]}
+        if artist_search is not Ellipsis:
+            keyword = artist_search.lower()
+            songs = {row for row in songs if keyword in self.artist[row]}
+
+        charts: Optional[Set[int]] = None
+        for column, elem in [(self.level, level), (self.ds, ds)]:
+            if not elem or elem is Ellipsis:
                 continue
-            __e = checker[_j]
-            if elem == __e:
-                diff_ret.append(_j)
-                ret = True
-    return ret, diff_ret
-
-
-def in_or_equal(
-    checker: Union[str, int], 
-    elem: Optional[Union[str, float, List[str], List[float], Tuple[float, float]]]
-) -> bool:
-    if elem is Ellipsis:
-        return True
-    if isinstance(elem, List):
-        return checker in elem
-    elif isinstance(elem, Tuple):
-        return elem[0] <= checker <= elem[1]
-    else:
-        return checker == elem
+            rows = column.match(elem)
+            charts = rows if charts is None else charts & rows
+        if charter_search and charter_search is not Ellipsis:
+            keyword = charter_search.lower()
+            rows = charts if charts is not None else range(len(self.chart_song))
+            charts = {row for row in rows if keyword in self.chart_charter[row]}
 
+        new_list = MusicList()
+        if charts is None:
+            for row in sorted(songs):
+                new_list.append(self.music[row].model_copy(update={'diff': diff}))
+            return new_list
 
-class MusicList(List[Music]):
-    
-    def by_id(self, music_id: Union[str, int]) -> Optional[Music]:
-        for music in self:
-            if music.id == str(music_id):
-                return music
-        return None
+        if diff is not Ellipsis:
+            charts &= self.diff.match(list(diff))
+        song_diff: Dict[int, Set[int]] = defaultdict(set)
+        for chart in charts:
+            if (row := self.chart_song[chart]) in songs:
+                song_diff[row].add(self.chart_diff[chart])
+        for row in sorted(song_diff):
+            if diff is Ellipsis:
+                diff2 = sorted(song_diff[row])
+            else:
+                diff2 = [_j for _j in diff if _j in song_diff[row]]
+            new_list.append(self.music[row].model_copy(update={'diff': diff2}))
+        return new_list
+
+
+class ChartTable:
+
+    def __init__(self, music_list: List[Music]) -> None:
+        """
+        谱面列式数据表，每行为一个谱面 `(song_id, level_index)`，用于向量化筛选与排序
+
+        Params:
+            `music_list`: 曲目列表
+        """
+        self.music = list(music_list)
+        rows = [(n, index) for n, music in enumerate(self.music) for index in range(len(music.ds))]
+        self.versions: List[str] = list(dict.fromkeys(music.basic_info.version for music in self.music))
+        """版本名称，下标为 `version` 列的编码"""
+        version_code = {v: n for n, v in enumerate(self.versions)}
+        level_code = {lv: n for n, lv in enumerate(levelList)}
+
+        def column(func: Callable[[Music, int], Any], dtype: type) -> np.ndarray:
+            return np.array([func(self.music[n], index) for n, index in rows], dtype=dtype)
+
+        self.row = np.array([n for n, _ in rows], dtype=np.int32)
+        """所属曲目在 `music` 中的下标"""
+        self.index: Dict[Tuple[int, int], int] = {
+            (int(self.music[n].id), index): row for row, (n, index) in enumerate(rows)
+        }
+        """`(曲目ID, 难度)` 对应的行号"""
+        self.song_id = column(lambda m, i: int(m.id), np.int64)
+        self.level_index = column(lambda m, i: i, np.int8)
+        self.ds = column(lambda m, i: m.ds[i], np.float64)
+        self.level = column(lambda m, i: level_code.get(m.level[i], -1), np.int16)
+        """等级，编码为 `levelList` 下标"""
+        self.type = column(lambda m, i: 1 if m.type == 'DX' else 0, np.int8)
+        """谱面类型，`0` 为 SD，`1` 为 DX"""
+        self.version = column(lambda m, i: version_code[m.basic_info.version], np.int16)
+        self.notes = column(lambda m, i: sum(m.charts[i].notes) if i < len(m.charts) else 0, np.int32)
+        self.fit_diff = column(
+            lambda m, i: m.stats[i].fit_diff 
+            if m.stats and i < len(m.stats) and m.stats[i] and m.stats[i].fit_diff is not None 
+            else np.nan, 
+            np.float64
+        )
+
+    def __len__(self) -> int:
+        return len(self.row)
+
+    def mask(
+        self,
+        *,
+        ds: Optional[Union[float, Tuple[float, float]]] = None,
+        level: Optional[Union[str, List[str]]] = None,
+        version: Optional[Union[str, List[str]]] = None,
+        type: Optional[str] = None,
+        standard: bool = True
+    ) -> np.ndarray:
+        """
+        按条件生成谱面筛选掩码，条件为空时不筛选
+
+        Params:
+            `ds`: 定数或定数闭区间
+            `level`: 等级
+            `version`: 版本
+            `type`: 谱面类型
+            `standard`: 是否排除宴会场谱面
+        Returns:
+            `np.ndarray` 布尔掩码
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if standard:
+            mask &= self.song_id < 100000
+        if ds is not None:
+            if isinstance(ds, Tuple):
+                mask &= (self.ds >= ds[0]) & (self.ds <= ds[1])
+            else:
+                mask &= self.ds == ds
+        if level:
+            levels = [level] if isinstance(level, str) else level
+            mask &= np.isin(self.level, [levelList.index(lv) for lv in levels if lv in levelList])
+        if version:
+            versions = [version] if isinstance(version, str) else version
+            mask &= np.isin(self.version, [self.versions.index(v) for v in versions if v in self.versions])
+        if type:
+            mask &= self.type == (1 if type == 'DX' else 0)
+        return mask
+
+    def ra_music(self, row: int) -> RaMusic:
+        music = self.music[self.row[row]]
+        index = int(self.level_index[row])
+        return RaMusic(
+            id=music.id, 
+            ds=music.ds[index], 
+            lv=str(index), 
+            lvp=music.level[index], 
+            type=music.type
+        )
 
-    def by_title(self, music_title: str) -> Optional[Music]:
-        for music in self:
-            if music.title == music_title:
-                return music
-        return None
-    
     def by_plan(
         self, 
         level: str
-    ) -> Dict[str, Union[PlanInfo, RaMusic, Dict[int, Union[PlanInfo, RaMusic]]]]:
-        lv = defaultdict(dict)
-        
-        def create_ra_music(music: Music, index: int) -> RaMusic:
-            return RaMusic(
-                id=music.id, 
-                ds=music.ds[index], 
-                lv=str(index), 
-                lvp=music.level[index], 
-                type=music.type
-            )
-        
-        for music in self:
-            if level not in music.level:
-                continue
-            if int(music.id) >= 100000:
-                continue
-            if music.level.count(level) > 1: # 同曲有相同等级
-                lv[music.id] = { 
-                    index: create_ra_music(music, index)
-                    for index, _lv in enumerate(music.level) 
-                    if _lv == level 
-                }
+    ) -> Dict[str, Union[RaMusic, Dict[int, RaMusic]]]:
+        lv: Dict[str, Union[RaMusic, Dict[int, RaMusic]]] = {}
+        for row in np.flatnonzero(self.mask(level=level)):
+            ra = self.ra_music(row)
+            if (prev := lv.get(ra.id)) is None:
+                lv[ra.id] = ra
+            elif isinstance(prev, RaMusic): # 同曲有相同等级
+                lv[ra.id] = {int(prev.lv): prev, int(ra.lv): ra}
             else:
-                index = music.level.index(level)
-                lv[music.id] = create_ra_music(music, index)
-        return dict(lv)
-    
+                prev[int(ra.lv)] = ra
+        return lv
+
     def by_level_list(self) -> Dict[str, Dict[str, List[RaMusic]]]:
         
         def level_range(lv: str) -> range:
@@ -123,28 +285,120 @@ class MusicList(List[Music]):
         _level = {
             lv: {f"{lv.rstrip('+')}.{i}": [] for i in level_range(lv)} for lv in levelList
         }
-        for music in self:
-            if int(music.id) >= 100000:
-                continue
-            for index, ds in enumerate(music.ds):
-                if ds < 7:
-                    continue
-                ra = RaMusic(
-                    id=music.id,
-                    ds=ds,
-                    lv=str(index),
-                    lvp=music.level[index],
-                    type=music.type
-                )
-                _level[music.level[index]][str(ds)].append(ra)
+        for row in np.flatnonzero(self.mask() & (self.ds >= 7)):
+            ra = self.ra_music(row)
+            _level[ra.lvp][str(ra.ds)].append(ra)
         return _level
+
+
+class MusicList(List[Music]):
+
+    _id_index: Optional[Dict[str, Music]] = None
+    _int_id_index: Optional[Dict[int, Music]] = None
+    _title_index: Optional[Dict[str, Music]] = None
+    _query: Optional[MusicQuery] = None
+    _chart_table: Optional[ChartTable] = None
+
+    def build_index(self) -> None:
+        """建立 `id`、`int(id)`、`title` 到曲目的索引"""
+        id_index: Dict[str, Music] = {}
+        int_id_index: Dict[int, Music] = {}
+        title_index: Dict[str, Music] = {}
+        for music in self:
+            id_index.setdefault(music.id, music)
+            int_id_index.setdefault(int(music.id), music)
+            title_index.setdefault(music.title, music)
+        self._id_index = id_index
+        self._int_id_index = int_id_index
+        self._title_index = title_index
+        self._query = MusicQuery(self)
+
+    def _drop_index(self) -> None:
+        self._id_index = self._int_id_index = self._title_index = None
+        self._query = None
+        self._chart_table = None
+
+    def _ensure_index(self) -> None:
+        if self._id_index is None:
+            self.build_index()
+
+    def append(self, music: Music) -> None:
+        super().append(music)
+        if self._id_index is not None:
+            self._id_index.setdefault(music.id, music)
+            self._int_id_index.setdefault(int(music.id), music)
+            self._title_index.setdefault(music.title, music)
+        self._query = None
+        self._chart_table = None
+
+    def extend(self, musics: Iterable[Music]) -> None:
+        super().extend(musics)
+        self._drop_index()
+
+    def insert(self, index: SupportsIndex, music: Music) -> None:
+        super().insert(index, music)
+        self._drop_index()
+
+    def remove(self, music: Music) -> None:
+        super().remove(music)
+        self._drop_index()
+
+    def pop(self, index: SupportsIndex = -1) -> Music:
+        music = super().pop(index)
+        self._drop_index()
+        return music
+
+    def clear(self) -> None:
+        super().clear()
+        self._drop_index()
+
+    def sort(self, *args, **kwargs) -> None:
+        super().sort(*args, **kwargs)
+        self._drop_index()
+
+    def reverse(self) -> None:
+        super().reverse()
+        self._drop_index()
+
+    def __setitem__(self, index, value) -> None:
+        super().__setitem__(index, value)
+        self._drop_index()
+
+    def __delitem__(self, index) -> None:
+        super().__delitem__(index)
+        self._drop_index()
+
+    def __iadd__(self, musics: Iterable[Music]) -> 'MusicList':
+        self.extend(musics)
+        return self
+
+    def by_id(self, music_id: Union[str, int]) -> Optional[Music]:
+        self._ensure_index()
+        return self._id_index.get(str(music_id))
+
+    def by_title(self, music_title: str) -> Optional[Music]:
+        self._ensure_index()
+        return self._title_index.get(music_title)
+    
+    @property
+    def chart_table(self) -> ChartTable:
+        if self._chart_table is None:
+            self._chart_table = ChartTable(self)
+        return self._chart_table
+
+    def by_plan(
+        self, 
+        level: str
+    ) -> Dict[str, Union[PlanInfo, RaMusic, Dict[int, Union[PlanInfo, RaMusic]]]]:
+        return self.chart_table.by_plan(level)
+    
+    def by_level_list(self) -> Dict[str, Dict[str, List[RaMusic]]]:
+        return self.chart_table.by_level_list()
     
     def by_id_list(self, music_id_list: List[int]) -> Optional[List[Music]]:
-        musicList = []
-        for music in self:
-            if int(music.id) in music_id_list:
-                musicList.append(music)
-        return musicList
+        self._ensure_index()
+        id_set = set(music_id_list)
+        return [music for song_id, music in self._int_id_index.items() if song_id in id_set]
     
     def random(self) -> Music:
         return random.choice(self)
@@ -163,63 +417,184 @@ class MusicList(List[Music]):
         diff: List[int] = ...,
         version: Union[str, List[str]] = ...
     ) -> 'MusicList':
-        new_list = MusicList()
-        for music in self:
-            diff2 = diff
-            music = deepcopy(music)
-            ret, diff2 = cross(music.level, level, diff2)
-            if not ret:
-                continue
-            ret, diff2 = cross(music.ds, ds, diff2)
-            if not ret:
-                continue
-            ret, diff2 = search_charts(music.charts, charter_search, diff2)
-            if not ret:
-                continue
-            if not in_or_equal(music.basic_info.genre, genre):
-                continue
-            if not in_or_equal(music.type, type):
-                continue
-            if not in_or_equal(music.basic_info.bpm, bpm):
-                continue
-            if not in_or_equal(music.basic_info.version, version):
-                continue
-            if title_search is not Ellipsis and title_search.lower() not in music.title.lower():
-                continue
-            if artist_search is not Ellipsis and artist_search.lower() not in music.basic_info.artist.lower():
-                continue
-            music.diff = diff2
-            new_list.append(music)
-        return new_list
+        if self._query is None:
+            self._query = MusicQuery(self)
+        return self._query.filter(
+            level=level,
+            ds=ds,
+            title_search=title_search,
+            artist_search=artist_search,
+            charter_search=charter_search,
+            genre=genre,
+            bpm=bpm,
+            type=type,
+            diff=diff,
+            version=version
+        )
+
+
+def normalize_alias(text: str) -> str:
+    """
+    别名归一化，统一全角半角、大小写并去除空白
+    
+    Params:
+        `text`: 原文本
+    Returns:
+        `str`
+    """
+    return ''.join(unicodedata.normalize('NFKC', str(text)).casefold().split())
+
+
+def alias_grams(text: str, n: int = 2) -> Set[str]:
+    """切分 `n` 元组，长度不足时返回自身"""
+    if len(text) <= n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
 
 
-def search_charts(checker: List[Chart], elem: str, diff: List[int]) -> Tuple[bool, List[int]]:
-    ret = False
-    diff_ret = []
-    if not elem or elem is Ellipsis:
-        return True, diff
-    for _j in (range(len(checker)) if diff is Ellipsis else diff):
-        if elem.lower() in checker[_j].charter.lower():
-            diff_ret.append(_j)
-            ret = True
-    return ret, diff_ret
+def alias_similarity(a: str, b: str) -> float:
+    """两个已归一化文本的二元组 Dice 相似度"""
+    if a == b:
+        return 1.0
+    ga, gb = alias_grams(a), alias_grams(b)
+    if not ga or not gb:
+        return 0.0
+    return 2 * len(ga & gb) / (len(ga) + len(gb))
 
 
 class AliasList(List[Alias]):
 
-    def by_id(self, music_id: Union[str, int]) -> Optional[List[Alias]]:
-        alias_music = []
+    _id_index: Optional[Dict[int, List[Alias]]] = None
+    _exact_index: Optional[Dict[str, List[Alias]]] = None
+    _prefix_trie: Optional[Dict[str, Any]] = None
+    _gram_index: Optional[Dict[str, Set[str]]] = None
+
+    def build_index(self) -> None:
+        """建立曲目ID、归一化别名、前缀树以及二元组倒排索引"""
+        self._id_index = defaultdict(list)
+        self._exact_index = defaultdict(list)
+        self._prefix_trie = {}
+        self._gram_index = defaultdict(set)
         for music in self:
-            if music.SongID == int(music_id):
-                alias_music.append(music)
-        return alias_music
+            self._id_index[music.SongID].append(music)
+            for name in music.Alias:
+                self._index_alias(music, name)
+
+    def _index_alias(self, music: Alias, name: str) -> None:
+        key = normalize_alias(name)
+        if not key:
+            return
+        entries = self._exact_index[key]
+        if music in entries:
+            return
+        entries.append(music)
+        if len(entries) > 1:
+            return
+        node = self._prefix_trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node[''] = key
+        for gram in alias_grams(key):
+            self._gram_index[gram].add(key)
+
+    def _ensure_index(self) -> None:
+        if self._exact_index is None:
+            self.build_index()
+
+    def append(self, music: Alias) -> None:
+        super().append(music)
+        if self._id_index is not None:
+            self._id_index[music.SongID].append(music)
+            for name in music.Alias:
+                self._index_alias(music, name)
+
+    def add_alias(self, music_id: Union[str, int], alias_name: str) -> bool:
+        """
+        为曲目增加别名并增量更新索引
+        
+        Params:
+            `music_id`: 曲目ID
+            `alias_name`: 别名
+        Returns:
+            `bool` 是否找到该曲目
+        """
+        self._ensure_index()
+        if not (musics := self._id_index.get(int(music_id))):
+            return False
+        musics[0].Alias.append(alias_name)
+        self._index_alias(musics[0], alias_name)
+        return True
+
+    def by_id(self, music_id: Union[str, int]) -> Optional[List[Alias]]:
+        self._ensure_index()
+        return list(self._id_index.get(int(music_id), []))
     
     def by_alias(self, music_alias: str) -> Optional[List[Alias]]:
-        alias_list = []
-        for music in self:
-            if music_alias in music.Alias:
-                alias_list.append(music)
-        return alias_list
+        self._ensure_index()
+        return list(self._exact_index.get(normalize_alias(music_alias), []))
+
+    def by_prefix(self, prefix: str, limit: int = 20) -> List[str]:
+        """
+        查询以指定前缀开头的归一化别名
+        
+        Params:
+            `prefix`: 前缀
+            `limit`: 最大数量
+        Returns:
+            `List[str]` 别名列表，按长度排序
+        """
+        self._ensure_index()
+        node = self._prefix_trie
+        for char in normalize_alias(prefix):
+            if (node := node.get(char)) is None:
+                return []
+        result: List[str] = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for char, child in node.items():
+                if char == '':
+                    result.append(child)
+                else:
+                    stack.append(child)
+        result.sort(key=len)
+        return result[:limit]
+
+    def fuzzy(self, music_alias: str, limit: int = 5, threshold: float = 0.4) -> List[Tuple[float, Alias]]:
+        """
+        模糊查询别名，按相似度从高到低排序，同一曲目只保留最高分
+        
+        Params:
+            `music_alias`: 别名
+            `limit`: 最大数量
+            `threshold`: 最低相似度
+        Returns:
+            `List[Tuple[float, Alias]]` (相似度, 别名数据)
+        """
+        self._ensure_index()
+        key = normalize_alias(music_alias)
+        if not key:
+            return []
+        grams = alias_grams(key)
+        scores: Dict[str, float] = defaultdict(float)
+        for gram in grams:
+            for name in self._gram_index.get(gram, ()):
+                scores[name] += 1
+        for name in scores:
+            scores[name] = 2 * scores[name] / (len(grams) + len(alias_grams(name)))
+        for name in self.by_prefix(key):
+            scores[name] = max(scores[name], 0.9 if name != key else 1.0)
+        
+        result: Dict[int, Tuple[float, Alias]] = {}
+        for name, score in sorted(scores.items(), key=lambda x: x[1], reverse=True):
+            if score < threshold:
+                break
+            for music in self._exact_index[name]:
+                if music.SongID not in result:
+                    result[music.SongID] = (round(score, 3), music)
+            if len(result) >= limit:
+                break
+        return list(result.values())[:limit]
 
 
 dataerror = dedent(f'''
@@ -236,32 +611,65 @@ aliaserror = dedent('''
 ''').strip()
 
 
-async def get_music_list() -> MusicList:
-    """获取所有数据"""
-    # MusicData
-    try:
-        try: 
-            music_data = await maiApi.music_data()
-            await writefile(music_file, music_data)
-        except asyncio.exceptions.TimeoutError:
-            log.error('maimaiDX曲库数据获取失败，请检查网络环境。已切换至本地暂存文件')
-            music_data = await openfile(music_file)
-    except FileNotFoundError:
-        log.error(dataerror)
-        raise FileNotFoundError
+plateerror = dedent('''
+    未找到牌子数据暂存文件，请检查网络环境后重启bot
+''').strip()
+
+
+async def load_snapshot(
+    name: str, 
+    fetch: Callable[[], Awaitable[Any]], 
+    file: Path, 
+    error: str, 
+    local: bool = False
+) -> Any:
+    """
+    获取数据并以紧凑格式写入暂存文件，`local` 为 `True` 或获取失败时读取暂存文件
     
-    # ChartStats
-    try:
+    Params:
+        `name`: 数据名称
+        `fetch`: 获取数据的函数
+        `file`: 暂存文件
+        `error`: 暂存文件不存在或为空时的提示
+        `local`: 是否直接读取暂存文件
+    Returns:
+        `Any`
+    """
+    start = time.perf_counter()
+    data = None
+    if not local:
+        try:
+            data = await fetch()
+        except Exception as e:
+            log.error(f'{name}获取失败：{type(e)}，已切换至本地暂存文件')
+        else:
+            try:
+                await writefile(file, data, None)
+            except Exception as e:
+                log.warning(f'{name}写入暂存文件失败：{type(e)}')
+    if data is None:
         try:
-            chart_stats = await maiApi.chart_stats()
-            await writefile(chart_file, chart_stats)
-        except asyncio.exceptions.TimeoutError:
-            log.error('maimaiDX数据获取错误，请检查网络环境，已切换至本地暂存文件')
-            chart_stats = await openfile(chart_file)
-    except FileNotFoundError:
-        log.error(charterror)
-        raise FileNotFoundError
+            data = await openfile(file)
+        except (FileNotFoundError, ValueError):
+            pass
+        if not data:
+            log.error(error)
+            raise FileNotFoundError(file)
+        local = True
+    log.info(f'已从{"本地暂存文件" if local else "网络"}获取{name}，耗时 {(time.perf_counter() - start) * 1000:.0f}ms')
+    return data
+
 
+def build_music_list(music_data: List[Dict[str, Any]], chart_stats: Dict[str, Any]) -> MusicList:
+    """
+    由曲目数据与单曲数据建立曲目列表及索引
+    
+    Params:
+        `music_data`: 曲目数据
+        `chart_stats`: 单曲数据
+    Returns:
+        `MusicList`
+    """
     total_list = MusicList()
     for music in music_data:
         if music['id'] in chart_stats['charts']:
@@ -273,45 +681,62 @@ async def get_music_list() -> MusicList:
         else:
             _stats = None
         total_list.append(Music(stats=_stats, **music))
-
+    total_list.build_index()
+    total_list.chart_table  # 谱面表按需建立，此处预先建立以免阻塞事件循环
     return total_list
 
 
-async def get_music_alias_list() -> AliasList:
-    """获取所有别名"""
+async def get_music_list(local: bool = False) -> MusicList:
+    """
+    并发获取曲目数据与单曲数据
+    
+    Params:
+        `local`: 是否直接读取暂存文件
+    Returns:
+        `MusicList`
+    """
+    music_data, chart_stats = await asyncio.gather(
+        load_snapshot('曲目数据', maiApi.music_data, music_file, dataerror, local),
+        load_snapshot('单曲数据', maiApi.chart_stats, chart_file, charterror, local)
+    )
+    return await asyncio.to_thread(build_music_list, music_data, chart_stats)
+
+
+async def build_alias_list(alias_data: List[Dict[str, Union[int, str, List[str]]]]) -> AliasList:
+    """
+    合并本地别名并建立别名列表，需在曲目数据加载后调用
+    
+    Params:
+        `alias_data`: 别名数据
+    Returns:
+        `AliasList`
+    """
     if local_alias_file.exists():
         local_alias_data = await openfile(local_alias_file)
     else:
         local_alias_data = {}
-    alias_data: List[Dict[str, Union[int, str, List[str]]]] = []
-    try:
-        alias_data = await maiApi.get_alias()
-        await writefile(alias_file, alias_data)
-    except asyncio.exceptions.TimeoutError:
-        log.error('获取别名超时，已切换至本地暂存文件')
-        alias_data = await openfile(alias_file)
-        if not alias_data:
-            log.error(aliaserror)
-            raise ValueError
-    except ServerError as e:
-        log.error(str(e) + '。已切换至本地暂存文件')
-        alias_data = await openfile(alias_file)
-    except UnknownError:
-        log.error('获取所有曲目别名信息错误，请检查网络环境。已切换至本地暂存文件')
-        alias_data = await openfile(alias_file)
-        if not alias_data:
-            log.error(aliaserror)
-            raise ValueError
-
     total_alias_list = AliasList()
     for _a in filter(lambda x: mai.total_list.by_id(x['SongID']), alias_data):
         if (song_id := str(_a['SongID'])) in local_alias_data:
             _a['Alias'].extend(local_alias_data[song_id])
         total_alias_list.append(Alias.model_validate(_a))
-
+    total_alias_list.build_index()
     return total_alias_list
 
 
+async def get_music_alias_list(local: bool = False) -> AliasList:
+    """
+    获取所有别名
+    
+    Params:
+        `local`: 是否直接读取暂存文件
+    Returns:
+        `AliasList`
+    """
+    alias_data = await load_snapshot('别名数据', maiApi.get_alias, alias_file, aliaserror, local)
+    return await build_alias_list(alias_data)
+
+
 async def update_local_alias(id: str, alias_name: str) -> bool:
     try:
         if local_alias_file.exists():
@@ -322,7 +747,7 @@ async def update_local_alias(id: str, alias_name: str) -> bool:
             local_alias_data[id] = []
         
         local_alias_data[id].append(alias_name.lower())
-        mai.total_alias_list.by_id(id)[0].Alias.append(alias_name.lower())
+        mai.total_alias_list.add_alias(id, alias_name.lower())
         await writefile(local_alias_file, local_alias_data)
         return True
     except Exception as e:
@@ -340,29 +765,86 @@ class MaiMusic:
     """牌子ID列表数据"""
     total_level_data: Dict[str, Dict[str, List[RaMusic]]]
     """等级列表数据"""
+    chart_table: ChartTable
+    """谱面列式数据表"""
     hot_music_ids: List = []
     """游玩次数超过1w次的曲目数据"""
     guess_data: List[Music]
     """猜歌数据"""
 
+    catalogue_hash: Optional[str] = None
+    """曲目、定数与等级数据的哈希"""
+
     def __init__(self) -> None:
         """封装所有曲目信息以及猜歌数据，便于更新"""
 
-    async def get_music(self) -> None:
-        """获取所有曲目数据"""
-        self.total_list = await get_music_list()
-        self.total_level_data = self.total_list.by_level_list()
+    async def load(self, local: bool = False) -> bool:
+        """
+        并发获取曲目、单曲、牌子与别名数据，并按依赖顺序重建索引
+        
+        Params:
+            `local`: 是否直接读取暂存文件
+        Returns:
+            `bool` 曲目、定数、等级或曲绘是否发生变化
+        """
+        timer = Timer('读取本地数据' if local else '获取网络数据')
+        music_list, _, alias_data = await asyncio.gather(
+            get_music_list(local),
+            self.get_plate_json(local),
+            load_snapshot('别名数据', maiApi.get_alias, alias_file, aliaserror, local)
+        )
+        timer.phase('获取与解析')
+        changed = self.set_music(music_list)
+        timer.phase('曲目索引')
+        self.total_alias_list = await build_alias_list(alias_data)
+        timer.phase('别名索引')
+        timer.done()
+        return changed
 
-    async def get_music_alias(self) -> None:
+    async def get_music(self, local: bool = False) -> bool:
+        """
+        获取所有曲目数据
+        
+        Params:
+            `local`: 是否直接读取暂存文件
+        Returns:
+            `bool` 曲目、定数、等级或曲绘是否发生变化
+        """
+        return self.set_music(await get_music_list(local))
+
+    def set_music(self, music_list: MusicList) -> bool:
+        """
+        替换曲目列表并重建谱面表与等级数据
+
+        Params:
+            `music_list`: 曲目列表
+        Returns:
+            `bool` 曲目、定数、等级或曲绘是否发生变化
+        """
+        self.total_list = music_list
+        self.chart_table = self.total_list.chart_table
+        self.total_level_data = self.chart_table.by_level_list()
+        maiApi.music_version = {int(music.id): music.basic_info.version for music in self.total_list}
+        catalogue_hash = hashlib.sha1(
+            repr([(music.id, music.ds, music.level) for music in self.total_list]).encode()
+        ).hexdigest()
+        changed = catalogue_hash != self.catalogue_hash
+        self.catalogue_hash = catalogue_hash
+        if cover_changed := covers.refresh():
+            log.info(f'曲绘库共「{len(covers)}」张曲绘，新增或修改「{cover_changed}」张')
+        return changed or bool(cover_changed)
+
+    async def get_music_alias(self, local: bool = False) -> None:
         """获取所有曲目别名"""
-        self.total_alias_list = await get_music_alias_list()
+        self.total_alias_list = await get_music_alias_list(local)
         
-    async def get_plate_json(self) -> None:
+    async def get_plate_json(self, local: bool = False) -> None:
         """获取所有牌子数据"""
-        self.total_plate_id_list = await maiApi.get_plate_json()
+        self.total_plate_id_list = await load_snapshot('牌子数据', maiApi.get_plate_json, plate_file, plateerror, local)
 
     def guess(self):
         """初始化猜歌数据"""
+        self.hot_music_ids = []
         for music in self.total_list:
             if music.stats:
                 count = 0
@@ -377,6 +859,166 @@ class MaiMusic:
 mai = MaiMusic()
 
 
+def frequency_weights(image: Image.Image) -> np.ndarray:
+    """
+    计算图像的频率权重，用于在图像中选择裁剪区域
+    
+    Params:
+        `image`: PIL.Image.Image, 输入图像
+    Returns:
+        `np.ndarray` 频率权重矩阵
+    """
+    gray_image = np.array(image.convert('L'))
+    freq = np.fft.fft2(gray_image)
+    freq_shift = np.fft.fftshift(freq)
+    magnitude = np.abs(freq_shift)
+    normalized_magnitude = magnitude / magnitude.max()
+    weights = normalized_magnitude ** 2
+    return weights
+
+
+class CropWeights:
+    
+    resolution: int = 48
+    """权重图边长"""
+    scales: Tuple[float, ...] = (0.15, 0.2, 0.25, 0.3, 0.35, 0.4)
+    """裁剪比例分段边界"""
+
+    def __init__(self) -> None:
+        """
+        猜曲绘裁切权重缓存
+        
+        每张曲绘按缩小后的分辨率计算频率权重，并按裁剪比例分段保存
+        阈值以上的格子（按权重降序）及其累积分布，开局时只需二分采样
+        """
+        self.covers: Dict[int, int] = {}
+        self.mtime = np.zeros(0, dtype=np.float64)
+        self.cells = np.zeros(0, dtype=np.uint16)
+        self.cdf = np.zeros(0, dtype=np.float32)
+        self.offset = np.zeros((0, len(self.scales)), dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.covers)
+
+    def compute(self, image: Image.Image) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        计算单张曲绘各裁剪比例分段的采样格子和累积分布
+        
+        Params:
+            `image`: 曲绘
+        Returns:
+            `List[Tuple[np.ndarray, np.ndarray]]` (格子编号, 累积分布)
+        """
+        r = self.resolution
+        weights = frequency_weights(image.convert('L').resize((r, r), Image.BILINEAR))
+        result = []
+        for lo, hi in zip(self.scales, self.scales[1:]):
+            side = r - int(np.ceil(hi * r)) + 1
+            flat = weights[:side, :side].ravel()
+            top_p = min(1.3 - np.power((lo + hi) / 2, 0.4), 0.95) * 100
+            valid = np.flatnonzero(flat >= np.percentile(flat, top_p))
+            order = np.argsort(-flat[valid], kind='stable')
+            valid = valid[order]
+            cdf = np.cumsum(flat[valid])
+            cdf /= cdf[-1]
+            # 编号转换为完整权重图中的格子编号
+            result.append(((valid // side * r + valid % side).astype(np.uint16), cdf.astype(np.float32)))
+        return result
+
+    def load(self, path: Path = guess_weight_file) -> bool:
+        """读取缓存文件"""
+        if not path.exists():
+            return False
+        try:
+            with np.load(path) as data:
+                if int(data['resolution']) != self.resolution or tuple(data['scales']) != self.scales:
+                    return False
+                self.covers = {int(c): n for n, c in enumerate(data['covers'])}
+                self.mtime = data['mtime']
+                self.cells = data['cells']
+                self.cdf = data['cdf']
+                self.offset = data['offset']
+        except Exception as e:
+            log.warning(f'读取猜曲绘权重缓存失败：{type(e)}')
+            return False
+        return True
+
+    def build(self, covers: Dict[int, Path], path: Path = guess_weight_file) -> int:
+        """
+        计算曲绘权重并写入缓存文件，未修改的曲绘沿用已有缓存
+        
+        Params:
+            `covers`: {曲绘ID: 曲绘路径}
+            `path`: 缓存文件
+        Returns:
+            `int` 重新计算的曲绘数量
+        """
+        if not self.covers:
+            self.load(path)
+        count = 0
+        segments: List[List[Tuple[np.ndarray, np.ndarray]]] = []
+        mtime: List[float] = []
+        for cover, cover_path in covers.items():
+            stat = cover_path.stat().st_mtime
+            if (n := self.covers.get(cover)) is not None and self.mtime[n] == stat:
+                bounds = self.offset[n]
+                segments.append([
+                    (self.cells[s:e], self.cdf[s:e]) for s, e in zip(bounds[:-1], bounds[1:])
+                ])
+            else:
+                with Image.open(cover_path) as im:
+                    segments.append(self.compute(im))
+                count += 1
+            mtime.append(stat)
+        
+        sizes = np.array([[len(c) for c, _ in seg] for seg in segments], dtype=np.int64).reshape(-1, len(self.scales) - 1)
+        ends = np.cumsum(sizes.ravel()).reshape(sizes.shape)
+        self.offset = np.concatenate([ends - sizes, ends[:, -1:]], axis=1)
+        self.cells = np.concatenate([c for seg in segments for c, _ in seg]) if segments else np.zeros(0, np.uint16)
+        self.cdf = np.concatenate([p for seg in segments for _, p in seg]) if segments else np.zeros(0, np.float32)
+        self.mtime = np.array(mtime, dtype=np.float64)
+        self.covers = {cover: n for n, cover in enumerate(covers)}
+        np.savez(
+            path, 
+            resolution=self.resolution, 
+            scales=np.array(self.scales), 
+            covers=np.array(list(covers), dtype=np.int64), 
+            mtime=self.mtime, 
+            cells=self.cells, 
+            cdf=self.cdf, 
+            offset=self.offset
+        )
+        return count
+
+    def sample(self, cover: int, scale: float) -> Optional[Tuple[float, float]]:
+        """
+        按权重采样裁剪区域左上角
+        
+        Params:
+            `cover`: 曲绘ID
+            `scale`: 裁剪比例
+        Returns:
+            `Optional[Tuple[float, float]]` 相对坐标 (x, y)，曲绘不在缓存中时返回 `None`
+        """
+        if (n := self.covers.get(cover)) is None:
+            return None
+        k = min(max(bisect_right(self.scales, scale) - 1, 0), len(self.scales) - 2)
+        start, end = int(self.offset[n, k]), int(self.offset[n, k + 1])
+        if start == end:
+            return None
+        i = min(int(np.searchsorted(self.cdf[start:end], random.random(), side='right')), end - start - 1)
+        y, x = divmod(int(self.cells[start + i]), self.resolution)
+        # 格子内随机偏移后可能越过分段上界，需保证裁剪框不超出曲绘
+        limit = max(1 - scale, 0)
+        return (
+            min((x + random.random()) / self.resolution, limit), 
+            min((y + random.random()) / self.resolution, limit)
+        )
+
+
+crop_weights = CropWeights()
+
+
 class Guess:
     
     Group: Dict[int, Union[GuessDefaultData, GuessPicData]] = {}
@@ -398,23 +1040,41 @@ class Guess:
     def startpic(self, gid: int):
         """开始猜曲绘"""
         self.Group[gid] = self.guesspicdata()
+
+    def answer_set(self, music: Music) -> FrozenSet[str]:
+        """
+        生成本轮的答案集合，包含曲目ID及所有别名的归一化文本
         
-    def calculate_frequency_weights(self, image: Image.Image) -> np.ndarray:
+        Params:
+            `music`: 曲目
+        Returns:
+            `FrozenSet[str]`
+        """
+        names = [music.id]
+        for _a in mai.total_alias_list.by_id(music.id):
+            names.extend(_a.Alias)
+        return frozenset(filter(None, map(normalize_alias, names)))
+
+    def check(self, gid: int, ans: str) -> bool:
         """
-        计算图像的频率权重，用于在图像中选择裁剪区域
+        判断答案是否正确，未命中时按配置的相似度进行容错
         
         Params:
-            `image`: PIL.Image.Image, 输入图像
+            `gid`: 群号
+            `ans`: 答案
         Returns:
-            `np.ndarray` 频率权重矩阵
+            `bool`
         """
-        gray_image = np.array(image.convert('L'))
-        freq = np.fft.fft2(gray_image)
-        freq_shift = np.fft.fftshift(freq)
-        magnitude = np.abs(freq_shift)
-        normalized_magnitude = magnitude / magnitude.max()
-        weights = normalized_magnitude ** 2
-        return weights
+        answer = self.Group[gid].answer
+        if (key := normalize_alias(ans)) in answer:
+            return True
+        if (fuzzy := maiconfig.maimaidxguessfuzzy) <= 0 or len(key) < 2:
+            return False
+        return any(alias_similarity(key, _a) >= fuzzy for _a in answer if not _a.isdigit())
+        
+    def calculate_frequency_weights(self, image: Image.Image) -> np.ndarray:
+        """计算图像的频率权重"""
+        return frequency_weights(image)
 
     def select_crop_region(
         self, 
@@ -435,15 +1095,29 @@ class Guess:
         top_left_x = chosen_index % valid_regions.shape[1]
         return top_left_x, top_left_y
     
+    async def prepare(self) -> None:
+        """预计算热门曲目的曲绘裁切权重"""
+        covers = {}
+        for music in mai.guess_data:
+            path = music_picture(music.id)
+            if path.stem.isdigit():
+                covers[int(path.stem)] = path
+        count = await asyncio.to_thread(crop_weights.build, covers)
+        log.info(f'猜曲绘权重缓存：共「{len(crop_weights)}」张曲绘，重新计算「{count}」张')
+
     def pic(self, music: Music) -> Image.Image:
         """裁切曲绘"""
-        im = Image.open(music_picture(music.id))
+        path = music_picture(music.id)
+        im = Image.open(path)
         w, h = im.size
-        weights = self.calculate_frequency_weights(im)
         scale = random.uniform(0.15, 0.4)  # 裁剪尺寸范围 可在此修改
         w2, h2 = int(w * scale), int(h * scale)
-        top_p = min(1.3 - np.power(scale, 0.4), 0.95) * 100
-        x, y = self.select_crop_region(weights, w2, h2, top_p)
+        if path.stem.isdigit() and (pos := crop_weights.sample(int(path.stem), scale)):
+            x, y = min(int(pos[0] * w), w - w2), min(int(pos[1] * h), h - h2)
+        else:
+            weights = self.calculate_frequency_weights(im)
+            top_p = min(1.3 - np.power(scale, 0.4), 0.95) * 100
+            x, y = self.select_crop_region(weights, w2, h2, top_p)
         im = im.crop((x, y, x + w2, y + h2))
         return im
 
@@ -451,9 +1125,7 @@ class Guess:
         """猜曲绘数据"""
         music = random.choice(mai.guess_data)
         pic = self.pic(music)
-        answer = mai.total_alias_list.by_id(music.id)[0].Alias
-        answer.append(music.id)
-        return GuessPicData(music=music, img=image_to_base64(pic), answer=answer, end=False)
+        return GuessPicData(music=music, img=image_to_base64(pic), answer=self.answer_set(music), end=False)
 
     def guessData(self) -> GuessDefaultData:
         """猜歌数据"""
@@ -468,13 +1140,11 @@ class Guess:
             f'{"没" if len(music.ds) == 4 else ""}有白谱',
             f'的 BPM 是 {music.basic_info.bpm}'
         ], 6)
-        answer = mai.total_alias_list.by_id(music.id)[0].Alias
-        answer.append(music.id)
         pic = self.pic(music)
         return GuessDefaultData(
             music=music, 
             img=image_to_base64(pic), 
-            answer=answer, 
+            answer=self.answer_set(music), 
             end=False, 
             options=guess_options
         )
@@ -1,71 +1,56 @@
-import copy
-
-from .image import rounded_corners
+from .image import encode_image, rounded_corners
 from .maimaidx_best_50 import *
 from .maimaidx_music import Music, mai
+from .maimaidx_progress import plate_scope
+from .maimaidx_record import Record, RecordKey, records
+from .maimaidx_update_plate import table_board, table_layout
 
 
-def newbestscore(song_id: str, lv: int, value: int, bestlist: List[ChartInfo]) -> int:
-    for v in bestlist:
-        if song_id == str(v.song_id) and lv == v.level_index:
-            if value >= v.ra:
-                return value - v.ra
-            else:
-                return 0
-    return value - bestlist[-1].ra
+def newbestscore(song_id: str, lv: int, value: int, best: Dict[Tuple[int, int], int], lowest: int) -> int:
+    """
+    计算谱面达到指定 rating 后 b50 的增加值
+    
+    Params:
+        `song_id`: 曲目ID
+        `lv`: 难度
+        `value`: 谱面 rating
+        `best`: b50 中各谱面 `(曲目ID, 难度)` 对应的 rating
+        `lowest`: b50 中的最低 rating
+    Returns:
+        `int`
+    """
+    if (ra := best.get((int(song_id), lv))) is not None:
+        return max(value - ra, 0)
+    return value - lowest
 
 
-async def draw_music_info(
-    music: Music, 
-    qqid: Optional[int] = None, 
-    user: Optional[UserInfo] = None
-) -> MessageSegment:
+def draw_music_info_image(music: Music, calc: bool, isfull: bool, bestlist: List[ChartInfo]) -> Image.Image:
     """
-    查看谱面
+    绘制谱面信息，供渲染执行器调用
     
     Params:
         `music`: 曲目模型
-        `qqid`: QQID
-        `user`: 用户模型
+        `calc`: 是否计算推分
+        `isfull`: b50 对应版本是否已满
+        `bestlist`: b50 对应版本成绩
     Returns:
-        `MessageSegment`
+        `Image.Image`
     """
-    calc = True
-    isfull = True
-    bestlist: List[ChartInfo] = []
-    try:
-        if qqid:
-            if user is None:
-                player = await maiApi.query_user_b50(qqid=qqid)
-            else:
-                player = user
-            if music.basic_info.version in list(plate_to_dx_version.values())[-1]:
-                bestlist = player.charts.dx
-                isfull = bool(len(bestlist) == 15)
-            else:
-                bestlist = player.charts.sd
-                isfull = bool(len(bestlist) == 35)
-        else:
-            calc = False
-    except (UserNotFoundError, UserNotExistsError, UserDisabledQueryError):
-        calc = False
-    except Exception:
-        calc = False
-
     im = Image.open(maimaidir / 'song_bg.png').convert('RGBA')
     dr = ImageDraw.Draw(im)
     mr = DrawText(dr, SIYUAN)
     tb = DrawText(dr, TBFONT)
 
     default_color = (124, 130, 255, 255)
+    best = {(v.song_id, v.level_index): v.ra for v in bestlist}
 
-    im.alpha_composite(Image.open(maimaidir / 'logo.png').resize((249, 120)), (65, 25))
+    im.alpha_composite(sprite('logo.png', (249, 120)), (65, 25))
     if music.basic_info.is_new:
-        im.alpha_composite(Image.open(maimaidir / 'UI_CMN_TabTitle_NewSong.png').resize((249, 120)), (940, 100))
-    songbg = Image.open(music_picture(music.id)).resize((280, 280))
+        im.alpha_composite(sprite('UI_CMN_TabTitle_NewSong.png', (249, 120)), (940, 100))
+    songbg = covers.get(music.id, (280, 280))
     im.alpha_composite(rounded_corners(songbg, 17, (True, False, False, True)), (110, 180))
-    im.alpha_composite(Image.open(maimaidir / f'{music.basic_info.version}.png').resize((182, 90)), (800, 370))
-    im.alpha_composite(Image.open(maimaidir / f'{music.type}.png').resize((80, 30)), (410, 375))
+    im.alpha_composite(sprite(f'{music.basic_info.version}.png', (182, 90)), (800, 370))
+    im.alpha_composite(sprite(f'{music.type}.png', (80, 30)), (410, 375))
 
     title = music.title
     if coloumWidth(title) > 40:
@@ -110,7 +95,7 @@ async def draw_music_info(
                     size = 20
                     rating = f'{value}(+{value})'
                 elif value > bestlist[-1].ra:
-                    new = newbestscore(music.id, num, value, bestlist)
+                    new = newbestscore(music.id, num, value, best, bestlist[-1].ra)
                     if new == 0:
                         rating = value
                     else:
@@ -120,118 +105,157 @@ async def draw_music_info(
                     rating = value
                 tb.draw(536 + 101 * _n, 1030 + 47 * (num - 2), size, rating, default_color, 'mm')
     mr.draw(600, 1212, 22, f'Designed by xingdian. Generated by cangyao BOT', default_color, 'mm')
-    return MessageSegment.image(image_to_base64(im))
+    return im
 
 
-async def draw_music_play_data(qqid: int, music_id: str) -> Union[str, MessageSegment]:
+async def draw_music_info(
+    music: Music, 
+    qqid: Optional[int] = None, 
+    user: Optional[UserInfo] = None
+) -> MessageSegment:
     """
-    谱面游玩
+    查看谱面
     
     Params:
+        `music`: 曲目模型
         `qqid`: QQID
-        `music_id`: 曲目ID
+        `user`: 用户模型
     Returns:
-        `Union[str, MessageSegment]`
+        `MessageSegment`
     """
+    calc = True
+    isfull = True
+    bestlist: List[ChartInfo] = []
     try:
-        diff: List[Union[None, PlayInfoDev, PlayInfoDefault]]
-        if maiconfig.maimaidxtoken:
-            data = await maiApi.query_user_post_dev(qqid=qqid, music_id=music_id)
-            if not data:
-                raise MusicNotPlayError
-
-            music = mai.total_list.by_id(music_id)
-            diff = [None for _ in music.ds]
-            for _d in data:
-                diff[_d.level_index] = _d
-            dev = True
+        if qqid:
+            if user is None:
+                player = await maiApi.query_user_b50(qqid=qqid)
+            else:
+                player = user
+            if music.basic_info.version in list(plate_to_dx_version.values())[-1]:
+                bestlist = player.charts.dx
+                isfull = bool(len(bestlist) == 15)
+            else:
+                bestlist = player.charts.sd
+                isfull = bool(len(bestlist) == 35)
         else:
-            version = list(set(_v for _v in plate_to_dx_version.values()))
-            data = await maiApi.query_user_plate(qqid=qqid, version=version)
+            calc = False
+    except (UserNotFoundError, UserNotExistsError, UserDisabledQueryError):
+        calc = False
+    except Exception:
+        calc = False
 
-            music = mai.total_list.by_id(music_id)
-            _temp = [None for _ in music.ds]
-            diff = copy.deepcopy(_temp)
+    return await render.image(draw_music_info_image, music, calc, isfull, bestlist)
 
-            for _d in data:
-                if _d.song_id == int(music_id):
-                    diff[_d.level_index] = _d
-            if diff == _temp:
-                raise MusicNotPlayError
-            dev = False
 
-        im = Image.open(maimaidir / 'info_bg.png').convert('RGBA')
+def draw_music_play_image(
+    music: Music, 
+    diff: List[Union[None, PlayInfoDev, PlayInfoDefault]], 
+    dev: bool
+) -> Image.Image:
+    """
+    绘制谱面游玩成绩，供渲染执行器调用
     
-        dr = ImageDraw.Draw(im)
-        tb = DrawText(dr, TBFONT)
-        mr = DrawText(dr, SIYUAN)
-
-        im.alpha_composite(Image.open(maimaidir / 'logo.png').resize((249, 120)), (0, 34))
-        cover = Image.open(music_picture(music_id))
-        im.alpha_composite(cover.resize((300, 300)), (100, 260))
-        im.alpha_composite(Image.open(maimaidir / f'info-{category[music.basic_info.genre]}.png'), (100, 260))
-        im.alpha_composite(Image.open(maimaidir / f'{music.basic_info.version}.png').resize((183, 90)), (295, 205))
-        im.alpha_composite(Image.open(maimaidir / f'{music.type}.png').resize((55, 20)), (350, 560))
-        
-        color = (124, 129, 255, 255)
-        artist = music.basic_info.artist
-        if coloumWidth(artist) > 58:
-            artist = changeColumnWidth(artist, 57) + '...'
-        mr.draw(255, 595, 12, artist, color, 'mm')
-        title = music.title
-        if coloumWidth(title) > 38:
-            title = changeColumnWidth(title, 37) + '...'
-        mr.draw(255, 622, 18, title, color, 'mm')
-        tb.draw(160, 720, 22, music.id, color, 'mm')
-        tb.draw(380, 720, 22, music.basic_info.bpm, color, 'mm')
-
-        y = 100
-        for num, info in enumerate(diff):
-            im.alpha_composite(Image.open(maimaidir / f'd-{num}.png'), (650, 235 + y * num))
-            if info:
-                im.alpha_composite(Image.open(maimaidir / 'ra-dx.png'), (850, 272 + y * num))
-                if dev:
-                    dxscore = info.dxScore
-                    _dxscore = sum(music.charts[num].notes) * 3
-                    dxnum = dxScore(dxscore / _dxscore * 100)
-                    rating, rate = info.ra, score_Rank_l[info.rate]
-                    if dxnum != 0:
-                        im.alpha_composite(
-                            Image.open(maimaidir / f'UI_GAM_Gauge_DXScoreIcon_0{dxnum}.png').resize((32, 19)), 
-                            (851, 296 + y * num)
-                        )
-                    tb.draw(916, 304 + y * num, 13, f'{dxscore}/{_dxscore}', color, 'mm')
-                else:
-                    rating, rate = computeRa(music.ds[num], info.achievements, israte=True)
-                
-                im.alpha_composite(Image.open(maimaidir / 'fcfs.png'), (965, 265 + y * num))
-                if info.fc:
-                    im.alpha_composite(
-                        Image.open(maimaidir / f'UI_CHR_PlayBonus_{fcl[info.fc]}.png').resize((65, 65)), 
-                        (960, 261 + y * num)
-                    )
-                if info.fs:
+    Params:
+        `music`: 曲目模型
+        `diff`: 各难度成绩
+        `dev`: 是否为开发者接口数据
+    Returns:
+        `Image.Image`
+    """
+    im = Image.open(maimaidir / 'info_bg.png').convert('RGBA')
+
+    dr = ImageDraw.Draw(im)
+    tb = DrawText(dr, TBFONT)
+    mr = DrawText(dr, SIYUAN)
+
+    im.alpha_composite(sprite('logo.png', (249, 120)), (0, 34))
+    im.alpha_composite(covers.get(music.id, (300, 300)), (100, 260))
+    im.alpha_composite(sprite(f'info-{category[music.basic_info.genre]}.png'), (100, 260))
+    im.alpha_composite(sprite(f'{music.basic_info.version}.png', (183, 90)), (295, 205))
+    im.alpha_composite(sprite(f'{music.type}.png', (55, 20)), (350, 560))
+    
+    color = (124, 129, 255, 255)
+    artist = music.basic_info.artist
+    if coloumWidth(artist) > 58:
+        artist = changeColumnWidth(artist, 57) + '...'
+    mr.draw(255, 595, 12, artist, color, 'mm')
+    title = music.title
+    if coloumWidth(title) > 38:
+        title = changeColumnWidth(title, 37) + '...'
+    mr.draw(255, 622, 18, title, color, 'mm')
+    tb.draw(160, 720, 22, music.id, color, 'mm')
+    tb.draw(380, 720, 22, music.basic_info.bpm, color, 'mm')
+
+    y = 100
+    for num, info in enumerate(diff):
+        im.alpha_composite(sprite(f'd-{num}.png'), (650, 235 + y * num))
+        if info:
+            im.alpha_composite(sprite('ra-dx.png'), (850, 272 + y * num))
+            if dev:
+                dxscore = info.dxScore
+                _dxscore = sum(music.charts[num].notes) * 3
+                dxnum = dxScore(dxscore / _dxscore * 100)
+                rating, rate = info.ra, score_Rank_l[info.rate]
+                if dxnum != 0:
                     im.alpha_composite(
-                        Image.open(maimaidir / f'UI_CHR_PlayBonus_{fsl[info.fs]}.png').resize((65, 65)), 
-                        (1025, 261 + y * num)
+                        sprite(f'UI_GAM_Gauge_DXScoreIcon_0{dxnum}.png', (32, 19)), 
+                        (851, 296 + y * num)
                     )
-                im.alpha_composite(Image.open(maimaidir / 'ra.png'), (1350, 405 + y * num))
+                tb.draw(916, 304 + y * num, 13, f'{dxscore}/{_dxscore}', color, 'mm')
+            else:
+                rating, rate = computeRa(music.ds[num], info.achievements, israte=True)
+            
+            im.alpha_composite(sprite('fcfs.png'), (965, 265 + y * num))
+            if info.fc:
+                im.alpha_composite(
+                    sprite(f'UI_CHR_PlayBonus_{fcl[info.fc]}.png', (65, 65)), 
+                    (960, 261 + y * num)
+                )
+            if info.fs:
                 im.alpha_composite(
-                    Image.open(maimaidir / f'UI_TTR_Rank_{rate}.png').resize((100, 45)), 
-                    (737, 272 + y * num)
+                    sprite(f'UI_CHR_PlayBonus_{fsl[info.fs]}.png', (65, 65)), 
+                    (1025, 261 + y * num)
                 )
+            im.alpha_composite(sprite('ra.png'), (1350, 405 + y * num))
+            im.alpha_composite(
+                sprite(f'UI_TTR_Rank_{rate}.png', (100, 45)), 
+                (737, 272 + y * num)
+            )
+
+            tb.draw(510, 292 + y * num, 42, f'{info.achievements:.4f}%', color, 'lm')
+            tb.draw(685, 248 + y * num, 25, music.ds[num], anchor='mm')
+            tb.draw(915, 283 + y * num, 18, rating, color, 'mm')
+        else:
+            tb.draw(685, 248 + y * num, 25, music.ds[num], anchor='mm')
+            mr.draw(800, 302 + y * num, 30, '未游玩', color, 'mm')
+    if len(diff) == 4:
+        mr.draw(800, 302 + y * 4, 30, '没有该难度', color, 'mm')
 
-                tb.draw(510, 292 + y * num, 42, f'{info.achievements:.4f}%', color, 'lm')
-                tb.draw(685, 248 + y * num, 25, music.ds[num], anchor='mm')
-                tb.draw(915, 283 + y * num, 18, rating, color, 'mm')
-            else:
-                tb.draw(685, 248 + y * num, 25, music.ds[num], anchor='mm')
-                mr.draw(800, 302 + y * num, 30, '未游玩', color, 'mm')
-        if len(diff) == 4:
-            mr.draw(800, 302 + y * 4, 30, '没有该难度', color, 'mm')
+    mr.draw(600, 827, 22, f'Designed by xingdian. Generated by cangyao BOT', color, 'mm')
+    return im
+
+
+async def draw_music_play_data(qqid: int, music_id: str) -> Union[str, MessageSegment]:
+    """
+    谱面游玩
+    
+    Params:
+        `qqid`: QQID
+        `music_id`: 曲目ID
+    Returns:
+        `Union[str, MessageSegment]`
+    """
+    try:
+        music = mai.total_list.by_id(music_id)
+        diff: List[Union[None, PlayInfoDev, PlayInfoDefault]] = await records.song(
+            music_id, len(music.ds), qqid=qqid
+        )
+        if not any(diff):
+            raise MusicNotPlayError
+        dev = bool(maiconfig.maimaidxtoken)
 
-        mr.draw(600, 827, 22, f'Designed by xingdian. Generated by cangyao BOT', color, 'mm')
-        msg = MessageSegment.image(image_to_base64(im))
+        msg = await render.image(draw_music_play_image, music, diff, dev)
         
     except (UserNotFoundError, UserNotExistsError, UserDisabledQueryError, MusicNotPlayError) as e:
         msg = str(e)
@@ -262,11 +286,82 @@ def draw_rating(rating: str, path: Path) -> MessageSegment:
     Returns:
         `MessageSegment`
     """
-    im = Image.open(path)
+    im = table_board(path)
     dr = ImageDraw.Draw(im)
     sy = DrawText(dr, SIYUAN)
     sy.draw(700, 100, 65, f'Level.{rating}   定数表', (124, 129, 255, 255), 'mm', 5, (255, 255, 255, 255))
-    return MessageSegment.image(image_to_base64(im))
+    return image_segment(encode_image(im, 'table'))
+
+
+def draw_rating_table_image(
+    plays: Dict[RecordKey, Record], 
+    statistics: Dict[str, int], 
+    rating: str, 
+    isfc: bool = False
+) -> Image.Image:
+    """
+    绘制定数表，供渲染执行器调用
+    
+    Params:
+        `plays`: 该等级谱面 `(曲目ID, 难度)` 对应的成绩
+        `statistics`: 该等级各评价、FC、FS 的达成数量
+        `rating`: 定数
+        `isfc`: 是否绘制fc成绩
+    Returns:
+        `Image.Image`
+    """
+    achievements_fc_list: List[Union[float, List[float]]] = []
+    lvlist = mai.total_level_data[rating]
+    lvnum = sum([len(v) for v in lvlist.values()])
+    layout = table_layout('rating', rating)
+    
+    rating_bg = sprite('rating_bg.png')
+    unfinished_bg = sprite('unfinished_bg.png')
+    complete_bg = sprite('complete_bg.png')
+    
+    im = table_board(ratingdir / f'{rating}.png')
+    dr = ImageDraw.Draw(im)
+    sy = DrawText(dr, SIYUAN)
+    tb = DrawText(dr, TBFONT)
+    
+    im.alpha_composite(rating_bg, (600, 25))
+    sy.draw(305, 60, 65, f'Level.{rating}', (124, 129, 255, 255), 'mm', 5, (255, 255, 255, 255))
+    sy.draw(305, 130, 65, '定数表', (124, 129, 255, 255), 'mm', 5, (255, 255, 255, 255))
+    tb.draw(700, 130, 45, lvnum, (124, 129, 255, 255), 'mm', 5, (255, 255, 255, 255))
+    
+    y = 22
+    for n, v in enumerate(statistics):
+        if n % 8 == 0:
+            x = 824
+            y += 56
+        else:
+            x += 64
+        tb.draw(x, y, 20, statistics[v], (124, 129, 255, 255), 'mm', 2, (255, 255, 255, 255))
+    
+    overlay: List[Tuple[Image.Image, Tuple[int, int]]] = []
+    for music, x, y in layout.cells:
+        if (play := plays.get((int(music.id), int(music.lv)))) is None:
+            continue
+        if not isfc:
+            score = play.achievements
+            achievements_fc_list.append(score)
+            rate = computeRa(music.ds, score, onlyrate=True)
+            overlay.append((complete_bg if score >= 100 else unfinished_bg, (x, y)))
+            overlay.append((sprite(f'UI_TTR_Rank_{rate}.png', (78, 35)), (x - 2, y + 13)))
+        elif _fc := play.fc:
+            achievements_fc_list.append(combo_rank.index(_fc))
+            overlay.append((complete_bg, (x, y)))
+            overlay.append((sprite(f'UI_MSS_MBase_Icon_{fcl[_fc]}.png', (50, 50)), (x + 13, y + 6)))
+    for source, pos in overlay:
+        im.alpha_composite(source, pos)
+
+    if len(achievements_fc_list) == lvnum:
+        r = calc_achievements_fc(achievements_fc_list, lvnum, isfc)
+        if r != -1:
+            pic = fcl[combo_rank[r]] if isfc else score_Rank_l[score_Rank[-6:][r]]
+            im.alpha_composite(sprite(f'UI_MSS_Allclear_Icon_{pic}.png'), (40, 40))
+    
+    return im
 
 
 async def draw_rating_table(qqid: int, rating: str, isfc: bool = False) -> Union[MessageSegment, str]:
@@ -281,123 +376,10 @@ async def draw_rating_table(qqid: int, rating: str, isfc: bool = False) -> Union
         `Union[MessageSegment, str]`
     """
     try:
-        version = list(set(_v for _v in plate_to_dx_version.values()))
-        obj = await maiApi.query_user_plate(qqid=qqid, version=version)
-        
-        statistics = {
-            'clear': 0,
-            'sync':  0,
-            's':     0,
-            'sp':    0,
-            'ss':    0,
-            'ssp':   0,
-            'sss':   0,
-            'sssp':  0,
-            'fc':    0,
-            'fcp':   0,
-            'ap':    0,
-            'app':   0,
-            'fs':    0,
-            'fsp':   0,
-            'fsd':   0,
-            'fsdp':  0,
-        }
-        fromid = {}
-        
-        sp = score_Rank[-6:]
-        for _d in obj:
-            if _d.level != rating:
-                continue
-            if (id := str(_d.song_id)) not in fromid:
-                fromid[id] = {}
-            fromid[id][str(_d.level_index)] = {
-                'achievements': _d.achievements,
-                'fc': _d.fc,
-                'level': _d.level
-            }
-            rate = computeRa(_d.ds, _d.achievements, onlyrate=True).lower()
-            if _d.achievements >= 80:
-                statistics['clear'] += 1
-            if rate in sp:
-                r_index = sp.index(rate)
-                for _r in range(r_index + 1):
-                    statistics[sp[_r]] += 1
-            if _d.fc:
-                fc_index = combo_rank.index(_d.fc)
-                for _f in range(fc_index + 1):
-                    statistics[combo_rank[_f]] += 1
-            if _d.fs:
-                if _d.fs != 'sync':
-                    fs_index = sync_rank.index(_d.fs)
-                    for _s in range(fs_index + 1):
-                        statistics[sync_rank[_s]] += 1
-                else:
-                    statistics[_d.fs] += 1
-
-        achievements_fc_list: List[Union[float, List[float]]] = []
-        lvlist = mai.total_level_data[rating]
-        lvnum = sum([len(v) for v in lvlist.values()])
-        
-        rating_bg = Image.open(maimaidir / 'rating_bg.png')
-        unfinished_bg = Image.open(maimaidir / 'unfinished_bg.png')
-        complete_bg = Image.open(maimaidir / 'complete_bg.png')
-        
-        bg = ratingdir / f'{rating}.png'
-        
-        im = Image.open(bg).convert('RGBA')
-        dr = ImageDraw.Draw(im)
-        sy = DrawText(dr, SIYUAN)
-        tb = DrawText(dr, TBFONT)
-        
-        im.alpha_composite(rating_bg, (600, 25))
-        sy.draw(305, 60, 65, f'Level.{rating}', (124, 129, 255, 255), 'mm', 5, (255, 255, 255, 255))
-        sy.draw(305, 130, 65, '定数表', (124, 129, 255, 255), 'mm', 5, (255, 255, 255, 255))
-        tb.draw(700, 130, 45, lvnum, (124, 129, 255, 255), 'mm', 5, (255, 255, 255, 255))
-        
-        y = 22
-        for n, v in enumerate(statistics):
-            if n % 8 == 0:
-                x = 824
-                y += 56
-            else:
-                x += 64
-            tb.draw(x, y, 20, statistics[v], (124, 129, 255, 255), 'mm', 2, (255, 255, 255, 255))
-        
-        y = 118
-        for ra in lvlist:
-            x = 158
-            y += 20
-            for num, music in enumerate(lvlist[ra]):
-                if num % 14 == 0:
-                    x = 158
-                    y += 85
-                else:
-                    x += 85
-                if music.id in fromid and music.lv in fromid[music.id]:
-                    if not isfc:
-                        score = fromid[music.id][music.lv]['achievements']
-                        achievements_fc_list.append(score)
-                        rate = computeRa(music.ds, score, onlyrate=True)
-                        rank = Image.open(maimaidir / f'UI_TTR_Rank_{rate}.png').resize((78, 35))
-                        if score >= 100:
-                            im.alpha_composite(complete_bg, (x + 2, y - 18))
-                        else:
-                            im.alpha_composite(unfinished_bg, (x + 2, y - 18))
-                        im.alpha_composite(rank, (x, y - 5))
-                        continue
-                    if _fc := fromid[music.id][music.lv]['fc']:
-                        achievements_fc_list.append(combo_rank.index(_fc))
-                        fc = Image.open(maimaidir / f'UI_MSS_MBase_Icon_{fcl[_fc]}.png').resize((50, 50))
-                        im.alpha_composite(complete_bg, (x + 2, y - 18))
-                        im.alpha_composite(fc, (x + 15, y - 12))
-
-        if len(achievements_fc_list) == lvnum:
-            r = calc_achievements_fc(achievements_fc_list, lvnum, isfc)
-            if r != -1:
-                pic = fcl[combo_rank[r]] if isfc else score_Rank_l[score_Rank[-6:][r]]
-                im.alpha_composite(Image.open(maimaidir / f'UI_MSS_Allclear_Icon_{pic}.png'), (40, 40))
-        
-        msg = MessageSegment.image(image_to_base64(im))
+        progress = (await records.player(qqid=qqid)).progress
+        scope = progress.table.mask(level=rating)
+        plays = {(_d.song_id, _d.level_index): _d for _d in progress.plays(scope)}
+        msg = await render.image(draw_rating_table_image, plays, progress.statistics(scope), rating, isfc)
     except (UserNotFoundError, UserNotExistsError, UserDisabledQueryError) as e:
         msg = str(e)
     except Exception as e:
@@ -406,6 +388,84 @@ async def draw_rating_table(qqid: int, rating: str, isfc: bool = False) -> Union
     return msg
 
 
+def draw_plate_table_image(
+    plays: Dict[RecordKey, Record], 
+    finished_num: int, 
+    version: str, 
+    plan: str
+) -> Image.Image:
+    """
+    绘制完成表，供渲染执行器调用
+    
+    Params:
+        `plays`: 已达成计划的谱面 `(曲目ID, 难度)` 对应的成绩
+        `finished_num`: 所有难度均已达成计划的曲目数量
+        `version`: 版本
+        `plan`: 计划
+    Returns:
+        `Image.Image`
+    """
+    ver, _ver = version_map.get(version, ([plate_to_dx_version.get(version)], version))
+    plate_total_num = len(mai.total_plate_id_list[_ver])
+    layout = table_layout('plate', version)
+    number = 4 if version not in ['霸', '舞'] else 5
+    
+    finished_bg = [sprite(f't-{_}.png') for _ in range(4)]
+    complete_bg = sprite('complete_bg_2.png')
+
+    im = table_board(platedir / f'{version}.png')
+    draw = ImageDraw.Draw(im)
+    tr = DrawText(draw, TBFONT)
+    mr = DrawText(draw, SIYUAN)
+    
+    im.alpha_composite(sprite('plate_num.png'), (185, 20))
+    im.alpha_composite(
+        assets.get(platedir / f'{version}{"極" if plan == "极" else plan}.png', (1000, 161)), 
+        (200, 35)
+    )
+    
+    def icon(play: PlayInfoDefault) -> Tuple[Image.Image, Tuple[int, int]]:
+        """MASTER 谱面达成后显示的图标及相对位置"""
+        if plan in ['将', '者']:
+            rate = computeRa(play.ds, play.achievements, onlyrate=True)
+            return sprite(f'UI_TTR_Rank_{rate}.png', (102, 46)), (-1, 15)
+        if plan == '舞舞':
+            return sprite(f'UI_CHR_PlayBonus_{fsl[play.fs]}.png', (75, 75)), (13, 3)
+        return sprite(f'UI_CHR_PlayBonus_{fcl[play.fc]}.png', (75, 75)), (13, 3)
+    
+    lv: List[int] = [0 for _ in range(number)]
+    overlay: List[Tuple[Image.Image, Tuple[int, int]]] = []
+    for _id, x, y in layout.cells:
+        f: List[int] = []
+        for n in range(number):
+            if (play := plays.get((int(_id), n))) is None:
+                continue
+            if n == 3:
+                source, (dx, dy) = icon(play)
+                overlay.append((complete_bg, (x, y)))
+                overlay.append((source, (x + dx, y + dy)))
+            lv[n] += 1
+            f.append(n)
+        for n in f:
+            overlay.append((finished_bg[n], (x + 5 + 25 * n, y + 67)))
+    for source, pos in overlay:
+        im.alpha_composite(source, pos)
+    
+    color = ScoreBaseImage.id_color.copy()
+    color.insert(0, (124, 129, 255, 255))
+    for num in range(len(lv) + 1):
+        if num == 0:
+            _v = f'{finished_num}/{plate_total_num}'
+        else:
+            _v = lv[num - 1]
+        if _v == plate_total_num:
+            mr.draw(390 + 200 * num, 270, 35, '完成', color[num], 'rm', 4, (255, 255, 255, 255))
+        else:
+            tr.draw(390 + 200 * num, 270, 40, _v, color[num], 'rm', 4, (255, 255, 255, 255))
+    
+    return im
+
+
 async def draw_plate_table(qqid: int, version: str, plan: str) -> Union[MessageSegment, str]:
     """
     绘制完成表
@@ -420,184 +480,11 @@ async def draw_plate_table(qqid: int, version: str, plan: str) -> Union[MessageS
     try:
         if version in platecn:
             version = platecn[version]
-        ver, _ver = version_map.get(version, ([plate_to_dx_version[version]], version))
-  
-        music_id_list = mai.total_plate_id_list[_ver]
-        music = mai.total_list.by_id_list(music_id_list)
-        plate_total_num = len(music_id_list)
-        playerdata: List[PlayInfoDefault] = []
-        
-        obj = await maiApi.query_user_plate(qqid=qqid, version=ver)
-        # if not obj:
-        #     return MessageSegment.image(Image.open(platedir / f'{version}.png'))
-        for _d in obj:
-            if _d.song_id not in music_id_list:
-                continue
-            _music = mai.total_list.by_id(_d.song_id)
-            _d.table_level = _music.level
-            _d.ds = _music.ds[_d.level_index]
-            playerdata.append(_d)
-
-        ra: Dict[str, Dict[str, List[Optional[PlayInfoDefault]]]] = {}
-        """
-        {
-            "14+": {
-                "365": [None, None, None, PlayInfoDefault, None],
-                ...
-            },
-            "14": {
-                ...
-            }
-        }
-        """
-        music.sort(key=lambda x: x.ds[3], reverse=True)
-        number = 4 if version not in ['霸', '舞'] else 5
-        for _m in music:
-            if _m.level[3] not in ra:
-                ra[_m.level[3]] = {}
-            ra[_m.level[3]][_m.id] = [None for _ in range(number)]
-        for _d in playerdata:
-            if number == 4 and _d.level_index == 4:
-                continue
-            ra[_d.table_level[3]][str(_d.song_id)][_d.level_index] = _d
-        
-        finished_bg = [Image.open(maimaidir / f't-{_}.png') for _ in range(4)]
-        unfinished_bg = Image.open(maimaidir / 'unfinished_bg_2.png')
-        complete_bg = Image.open(maimaidir / 'complete_bg_2.png')
-
-        im = Image.open(platedir / f'{version}.png')
-        draw = ImageDraw.Draw(im)
-        tr = DrawText(draw, TBFONT)
-        mr = DrawText(draw, SIYUAN)
-        
-        im.alpha_composite(Image.open(maimaidir / 'plate_num.png'), (185, 20))
-        im.alpha_composite(
-            Image.open(platedir / f'{version}{"極" if plan == "极" else plan}.png').resize((1000, 161)), 
-            (200, 35)
-        )
-        lv: List[set[int]] = [set() for _ in range(number)]
-        y = 245
-        # if plan == '者':
-        #     for level in ra:
-        #         x = 200
-        #         y += 15
-        #         for num, _id in enumerate(ra[level]):
-        #             if num % 10 == 0:
-        #                 x = 200
-        #                 y += 115
-        #             else:
-        #                 x += 115
-        #             f: List[int] = []
-        #             for num, play in enumerate(ra[level][_id]):
-        #                 if play.achievements or not play.achievements >= 80: continue
-        #                 fc = Image.open(maimaidir / f'UI_MSS_MBase_Icon_{fcl[play.fc]}.png')
-        #                 im.alpha_composite(fc, (x, y))
-        #                 f.append(n)
-        #             for n in f:
-        #                 im.alpha_composite(finished_bg[n], (x + 5 + 25 * n, y + 67))
-        if plan == '极' or plan == '極':
-            for level in ra:
-                x = 200
-                y += 15
-                for num, _id in enumerate(ra[level]):
-                    if num % 10 == 0:
-                        x = 200
-                        y += 115
-                    else:
-                        x += 115
-                    f: List[int] = []
-                    for n, play in enumerate(ra[level][_id]):
-                        if play is None or not play.fc: continue
-                        if n == 3:
-                            im.alpha_composite(complete_bg, (x, y))
-                            fc = Image.open(maimaidir / f'UI_CHR_PlayBonus_{fcl[play.fc]}.png').resize((75, 75))
-                            im.alpha_composite(fc, (x + 13, y + 3))
-                        lv[n].add(play.song_id)
-                        f.append(n)
-                    for n in f:
-                        im.alpha_composite(finished_bg[n], (x + 5 + 25 * n, y + 67))
-        if plan == '将':
-            for level in ra:
-                x = 200
-                y += 15
-                for num, _id in enumerate(ra[level]):
-                    if num % 10 == 0:
-                        x = 200
-                        y += 115
-                    else:
-                        x += 115
-                    f: List[int] = []
-                    for n, play in enumerate(ra[level][_id]):
-                        if play is None or play.achievements < 100: continue
-                        if n == 3:
-                            im.alpha_composite(complete_bg if play.achievements >= 100 else unfinished_bg, (x, y))
-                            rate = computeRa(play.ds, play.achievements, onlyrate=True)
-                            rank = Image.open(maimaidir / f'UI_TTR_Rank_{rate}.png').resize((102, 46))
-                            im.alpha_composite(rank, (x - 1, y + 15))
-                        lv[n].add(play.song_id)
-                        f.append(n)
-                    for n in f:
-                        im.alpha_composite(finished_bg[n], (x + 5 + 25 * n, y + 67))
-        if plan == '神':
-            _fc = ['ap', 'app']
-            for level in ra:
-                x = 200
-                y += 15
-                for num, _id in enumerate(ra[level]):
-                    if num % 10 == 0:
-                        x = 200
-                        y += 115
-                    else:
-                        x += 115
-                    f: List[int] = []
-                    for n, play in enumerate(ra[level][_id]):
-                        if play is None or play.fc not in _fc: continue
-                        if n == 3:
-                            im.alpha_composite(complete_bg, (x, y))
-                            ap = Image.open(maimaidir / f'UI_CHR_PlayBonus_{fcl[play.fc]}.png').resize((75, 75))
-                            im.alpha_composite(ap, (x + 13, y + 3))
-                        lv[n].add(play.song_id)
-                        f.append(n)
-                    for n in f:
-                        im.alpha_composite(finished_bg[n], (x + 5 + 25 * n, y + 67))
-        if plan == '舞舞':
-            fs = ['fsd', 'fdx', 'fsdp', 'fdxp']
-            for level in ra:
-                x = 200
-                y += 15
-                for num, _id in enumerate(ra[level]):
-                    if num % 10 == 0:
-                        x = 200
-                        y += 115
-                    else:
-                        x += 115
-                    f: List[int] = []
-                    for n, play in enumerate(ra[level][_id]):
-                        if play is None or play.fs not in fs:
-                            continue
-                        if n == 3:
-                            im.alpha_composite(complete_bg, (x, y))
-                            fsd = Image.open(maimaidir / f'UI_CHR_PlayBonus_{fsl[play.fs]}.png').resize((75, 75))
-                            im.alpha_composite(fsd, (x + 13, y + 3))
-                        lv[n].add(play.song_id)
-                        f.append(n)
-                    for n in f:
-                        im.alpha_composite(finished_bg[n], (x + 5 + 25 * n, y + 67))
-        
-        color = ScoreBaseImage.id_color.copy()
-        color.insert(0, (124, 129, 255, 255))
-        for num in range(len(lv) + 1):
-            if num == 0:
-                v = set.intersection(*lv)
-                _v = f'{len(v)}/{plate_total_num}'
-            else:
-                _v = len(lv[num - 1])
-            if _v == plate_total_num:
-                mr.draw(390 + 200 * num, 270, 35, '完成', color[num], 'rm', 4, (255, 255, 255, 255))
-            else:
-                tr.draw(390 + 200 * num, 270, 40, _v, color[num], 'rm', 4, (255, 255, 255, 255))
-        
-        msg = MessageSegment.image(image_to_base64(im))
+        progress = (await records.player(qqid=qqid)).progress
+        scope = plate_scope(version)
+        plays = {(_d.song_id, _d.level_index): _d for _d in progress.plays(scope & progress.completed(plan))}
+        finished_num = progress.finished_songs(scope, plan)
+        msg = await render.image(draw_plate_table_image, plays, finished_num, version, plan)
     except (UserNotFoundError, UserNotExistsError, UserDisabledQueryError) as e:
         msg = str(e)
     except Exception as e:
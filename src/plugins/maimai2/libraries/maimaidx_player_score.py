@@ -1,8 +1,10 @@
+import asyncio
+import math
 import random
 import time
 import traceback
-from typing import Callable
 
+import numpy as np
 import pyecharts.options as opts
 from nonebot.adapters.onebot.v11 import MessageSegment
 from pyecharts.charts import Pie
@@ -10,25 +12,203 @@ from pyecharts.charts import Pie
 from ..config import *
 from .image import *
 from .maimaidx_api_data import *
-from .maimaidx_best_50 import ScoreBaseImage, changeColumnWidth, coloumWidth, computeRa
-from .maimaidx_model import PlanInfo, PlayInfoDefault, PlayInfoDev, RaMusic
-from .maimaidx_music import Music, mai
-from .tool import run_chrome_to_base64
-
-Filter = Tuple[
-    List[PlayInfoDefault],
-    List[PlayInfoDefault],
-    List[PlayInfoDefault],
-    List[PlayInfoDefault],
-    List[PlayInfoDefault]
+from .maimaidx_best_50 import (
+    ScoreBaseImage,
+    changeColumnWidth,
+    coloumWidth,
+    computeRa,
+    computeRa_array,
+    rateList,
+)
+from .maimaidx_cache import TTLCache
+from .maimaidx_model import PlayInfoDefault, PlayInfoDev, RaMusic
+from .maimaidx_music import ChartTable, Music, mai
+from .maimaidx_progress import PlayerProgress, plate_scope
+from .maimaidx_ranking import leaderboard
+from .maimaidx_record import records
+from .maimaidx_render import image_segment, render
+from .tool import browser
+
+chart_palette: List[Tuple[int, int, int, int]] = [
+    (84, 112, 198, 255),
+    (145, 204, 117, 255),
+    (250, 200, 88, 255),
+    (238, 102, 102, 255),
+    (115, 192, 222, 255),
+    (59, 162, 114, 255),
+    (252, 132, 82, 255),
+    (154, 96, 180, 255),
+    (234, 124, 204, 255)
 ]
-Condition = Callable[[PlayInfoDefault], bool]
+"""饼图配色，与 ECharts 默认配色一致"""
+
+PieSeries = Tuple[str, List[Tuple[str, float]], float, float]
+"""(系列名, [(名称, 数值)], 内半径, 外半径)"""
+
+
+def _pie_labels(
+    dr: ImageDraw.ImageDraw, 
+    labels: List[Tuple[float, float, float, float, str, Tuple[int, int, int, int]]], 
+    right: bool, 
+    cx: int, 
+    cy: int, 
+    top: int, 
+    bottom: int, 
+    scale: int
+) -> None:
+    """
+    绘制一侧的扇区标签，标签按纵坐标排序后依次下移避免重叠
+    
+    Params:
+        `labels`: [(期望纵坐标, 扇区中线角度, 扇区外半径, 引线起点距离, 文字, 颜色)]
+        `right`: 是否位于右侧
+        `cx`: 圆心横坐标
+        `cy`: 圆心纵坐标
+        `top`: 标签区域上边界
+        `bottom`: 标签区域下边界
+        `scale`: 像素倍率
+    """
+    if not labels:
+        return
+    tb = DrawText(dr, TBFONT)
+    pad = 4 * scale
+    box_h = 20 * scale + pad * 2
+    labels.sort(key=lambda x: x[0])
+    gap = min(6 * scale, (bottom - top - box_h * len(labels)) / max(len(labels) - 1, 1))
+    ys: List[float] = []
+    for label in labels:
+        y = max(label[0] - box_h / 2, top)
+        if ys:
+            y = max(y, ys[-1] + box_h + gap)
+        ys.append(y)
+    if (overflow := ys[-1] + box_h - bottom) > 0:
+        ys[-1] -= overflow
+        for n in range(len(ys) - 2, -1, -1):
+            ys[n] = min(ys[n], ys[n + 1] - box_h - gap)
+    for (_, mid, radius, start, text, color), y in zip(labels, ys):
+        width = tb.get_box(text, 14 * scale)[2] + pad * 2
+        elbow = cx + (300 if right else -300) * scale
+        x0 = elbow + 10 * scale if right else elbow - 10 * scale - width
+        dr.line([
+            (cx + start * math.cos(mid), cy + start * math.sin(mid)), 
+            (cx + radius * math.cos(mid), cy + radius * math.sin(mid)), 
+            (elbow, y + box_h / 2), 
+            (x0 if right else x0 + width, y + box_h / 2)
+        ], color, 2 * scale)
+        dr.rounded_rectangle(
+            (x0, y, x0 + width, y + box_h), 4 * scale, (238, 238, 238, 255), (170, 170, 170, 255), scale
+        )
+        tb.draw(x0 + pad, y + box_h / 2, 14 * scale, text, (51, 51, 51, 255), 'lm')
+
+
+def draw_pie_chart(title: str, series: List[PieSeries], scale: int = 2) -> Image.Image:
+    """
+    绘制饼图，扇区从正上方开始顺时针排列，供渲染执行器调用
+    
+    Params:
+        `title`: 标题
+        `series`: 各系列数据
+        `scale`: 像素倍率
+    Returns:
+        `Image.Image`
+    """
+    width, height = 1000 * scale, 800 * scale
+    cx, cy = width // 2, height // 2
+    im = Image.new('RGBA', (width, height), (255, 255, 255, 255))
+    
+    ss = 3
+    outer = max(_[3] for _ in series) * scale
+    size = int(outer * 2 * ss)
+    layer = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    ld = ImageDraw.Draw(layer)
+    labels: Dict[bool, List[Tuple[float, float, float, float, str, Tuple[int, int, int, int]]]] = {True: [], False: []}
+    for name, data, inner_r, outer_r in series:
+        total = sum(v for _, v in data)
+        if not total:
+            continue
+        box = [size / 2 - outer_r * scale * ss, size / 2 - outer_r * scale * ss,
+               size / 2 + outer_r * scale * ss, size / 2 + outer_r * scale * ss]
+        ring = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+        rd = ImageDraw.Draw(ring)
+        start = -90.0
+        for n, (label, value) in enumerate(data):
+            if not value:
+                continue
+            angle = value / total * 360
+            color = chart_palette[n % len(chart_palette)]
+            rd.pieslice(box, start, start + angle, color)
+            mid = math.radians(start + angle / 2)
+            labels[math.cos(mid) >= 0].append((
+                cy + 330 * scale * math.sin(mid), 
+                mid, 
+                (max(_[3] for _ in series) + 15) * scale, 
+                (outer_r - 10) * scale, 
+                f'{label}: {value:g}  {value / total * 100:.2f}%', 
+                color
+            ))
+            start += angle
+        if inner_r:
+            r = inner_r * scale * ss
+            rd.ellipse([size / 2 - r, size / 2 - r, size / 2 + r, size / 2 + r], (0, 0, 0, 0))
+        layer.alpha_composite(ring)
+    layer = layer.resize((size // ss, size // ss), Image.Resampling.LANCZOS)
+    im.alpha_composite(layer, (cx - size // ss // 2, cy - size // ss // 2))
+    
+    dr = ImageDraw.Draw(im)
+    for right in labels:
+        _pie_labels(dr, labels[right], right, cx, cy, 80 * scale, height - 80 * scale, scale)
+    
+    mr = DrawText(dr, SIYUAN)
+    mr.draw(cx, 30 * scale, 18 * scale, title, (44, 52, 60, 255), 'mt')
+    
+    y = 10 * scale
+    legend: Dict[str, Tuple[int, int, int, int]] = {}
+    for _, data, _, _ in series:
+        for n, (label, _) in enumerate(data):
+            legend.setdefault(label, chart_palette[n % len(chart_palette)])
+    for label, color in legend.items():
+        dr.rounded_rectangle((15 * scale, y, 40 * scale, y + 14 * scale), 3 * scale, color)
+        mr.draw(45 * scale, y + 7 * scale, 12 * scale, label, (51, 51, 51, 255), 'lm')
+        y += 24 * scale
+    return im
+
+
+_global_chart_cache: TTLCache[bytes] = TTLCache(86400, 256)
+"""曲目游玩详情图缓存，键中包含统计数据，统计数据更新后自动失效"""
 
 
 async def music_global_data(music: Music, level_index: int) -> MessageSegment:
     """
     绘制曲目游玩详情
     
+    Params:
+        `music`: :class:Music
+        `level_index`: 难度
+    Returns:
+        `MessageSegment`
+    """
+    if maiconfig.maimaidxhtmlchart:
+        return await music_global_html(music, level_index)
+    stats = music.stats[level_index]
+    key = (music.id, level_index, tuple(stats.fc_dist or ()), tuple(stats.dist or ()))
+    if (data := _global_chart_cache.get(key)) is None:
+        fc_data_pair = list(zip([c.upper() if c else 'Not FC' for c in [''] + comboRank], stats.fc_dist or []))
+        acc_data_pair = list(zip([s.upper() for s in scoreRank], stats.dist or []))
+        data, _ = await render.submit(
+            draw_pie_chart, 
+            (
+                f'{music.id} {music.title} 「{diffs[level_index]}」', 
+                [('全连等级', fc_data_pair, 0, 120), ('达成率等级', acc_data_pair, 200, 280)]
+            )
+        )
+        _global_chart_cache.set(key, data)
+    return image_segment(data)
+
+
+async def music_global_html(music: Music, level_index: int) -> MessageSegment:
+    """
+    使用 pyecharts 与浏览器绘制曲目游玩详情
+    
     Params:
         `music`: :class:Music
         `level_index`: 难度
@@ -84,22 +264,12 @@ async def music_global_data(music: Music, level_index: int) -> MessageSegment:
     pie.add('达成率等级', acc_data_pair, radius=['50%', '70%'], is_clockwise=True, label_opts=labelopts)
     pie.set_global_opts(title_opts=titleopts, legend_opts=legendopts)
     pie.set_series_opts(tooltip_opts=opts.TooltipOpts(trigger='item', formatter='{a} <br/>{b}: {c} ({d}%)'))
-    pie.render(str(pie_html_file))
-    base64 = await run_chrome_to_base64()
+    base64 = await browser.snapshot(pie.render_embed(), static)
 
     return MessageSegment.image(base64)
 
 
 class DrawScore(ScoreBaseImage):
-    
-    def __init__(self, image: Image.Image = None) -> None:
-        super().__init__(image)
-        self._im.alpha_composite(self.aurora_bg)
-        self._im.alpha_composite(self.shines_bg, (34, 0))
-        self._im.alpha_composite(self.rainbow_bg, (319, self._im.size[1] - 643))
-        self._im.alpha_composite(self.rainbow_bottom_bg, (100, self._im.size[1] - 343))
-        for h in range((self._im.size[1] // 358) + 1):
-            self._im.alpha_composite(self.pattern_bg, (0, (358 + 7) * h))
 
     def whilepic(self, data: List[RaMusic], y: int = 200):
         """
@@ -117,7 +287,7 @@ class DrawScore(ScoreBaseImage):
                 y += dy if n != 0 else 0
             else:
                 x += 65
-            cover = Image.open(music_picture(v.id)).resize((55, 55))
+            cover = covers.get(v.id, (55, 55))
             self._im.alpha_composite(cover, (x, y))
             self._im.alpha_composite(self.id_diff[int(v.lv)], (x, y + 45))
             self._tb.draw(x + 27, y + 50, 10, v.id, self.t_color[int(v.lv)], 'mm')
@@ -136,13 +306,13 @@ class DrawScore(ScoreBaseImage):
             x = 200 if isdx else 700
             y += 140 if index != 0 else 0
             
-            rate = Image.open(maimaidir / f'UI_TTR_Rank_{_d.rate}.png').resize((63, 28))
+            rate = sprite(f'UI_TTR_Rank_{_d.rate}.png', (63, 28))
             
             self._im.alpha_composite(self._rise[_d.level_index], (x + 30, y))
-            self._im.alpha_composite(Image.open(music_picture(_d.song_id)).resize((80, 80)), (x + 55, y + 40))
-            self._im.alpha_composite(Image.open(maimaidir / f'{_d.type.upper()}.png').resize((60, 22)), (x + 240, y + 114))
+            self._im.alpha_composite(covers.get(_d.song_id, (80, 80)), (x + 55, y + 40))
+            self._im.alpha_composite(sprite(f'{_d.type.upper()}.png', (60, 22)), (x + 240, y + 114))
             if _d.oldrate:
-                oldrate = Image.open(maimaidir / f'UI_TTR_Rank_{_d.oldrate}.png').resize((63, 28))
+                oldrate = sprite(f'UI_TTR_Rank_{_d.oldrate}.png', (63, 28))
                 self._im.alpha_composite(oldrate, (x + 145, y + 82))
             self._im.alpha_composite(rate, (x + 305, y + 82))
             
@@ -174,7 +344,7 @@ class DrawScore(ScoreBaseImage):
         Returns:
             `Image.Image`
         """
-        title_bg = self.title_bg.copy().resize((273, 80))
+        title_bg = sprite('title.png', (273, 80))
         self._im.alpha_composite(title_bg, (314, 30))
         self._sy.draw(450, 68, 18, '旧版本谱面推荐', self.text_color, 'mm')
         self.whilerisepic(sd, sd_score, True)
@@ -183,7 +353,7 @@ class DrawScore(ScoreBaseImage):
         self.whilerisepic(dx, dx_score, False)
         
         height = self._im.size[1]
-        self._im.alpha_composite(self.design_bg.resize((800, 72)), (300, height - 110))
+        self._im.alpha_composite(sprite('design.png', (800, 72)), (300, height - 110))
         self._sy.draw(700, height - 76, 18, f'Designed by xingdian. Generated by cangyao BOT', self.text_color, 'mm')
         return self._im
 
@@ -304,8 +474,54 @@ class DrawScore(ScoreBaseImage):
         return self._im
 
 
+class RiseIndex:
+
+    def __init__(self, table: ChartTable) -> None:
+        """
+        上分推荐索引，预先计算每个谱面达到最后四个评价线时的底分，按新旧版本分组并按底分升序排列
+
+        Params:
+            `table`: 谱面表
+        """
+        self.table = table
+        self.target = np.array(achievementList[-4:])
+        versions = list(plate_to_dx_version.values())
+        self.parts: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        """`SD`、`DX` 对应的 (底分, 行号, 评价线下标)"""
+        for type, version in (('SD', versions[:-1]), ('DX', versions[-1])):
+            rows = np.flatnonzero(table.mask(version=version))
+            ra, _ = computeRa_array(table.ds[rows, None], self.target[None, :])
+            # 同底分按行号、评价线排列，同一谱面先出现的为较低的评价线
+            order = np.argsort(ra, axis=None, kind='stable')
+            self.parts[type] = (ra.ravel()[order], rows[order // len(self.target)], order % len(self.target))
+
+    def search(self, type: str, low: int, high: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        二分查找底分在闭区间 `[low, high]` 内的 (底分, 行号, 评价线下标)
+
+        Params:
+            `type`: `SD` 或 `DX`
+            `low`: 最低底分
+            `high`: 最高底分
+        """
+        ra, rows, target = self.parts[type]
+        start, end = np.searchsorted(ra, low, 'left'), np.searchsorted(ra, high, 'right')
+        return ra[start:end], rows[start:end], target[start:end]
+
+
+_rise_index: Optional[RiseIndex] = None
+
+
+def rise_index() -> RiseIndex:
+    """获取上分推荐索引，曲目数据更新后重新建立"""
+    global _rise_index
+    if _rise_index is None or _rise_index.table is not mai.chart_table:
+        _rise_index = RiseIndex(mai.chart_table)
+    return _rise_index
+
+
 def get_rise_score_list(
-    old_records: Dict[int, Dict[str, Union[int, float]]],
+    progress: PlayerProgress,
     type: str, 
     info: List[ChartInfo], 
     level: Optional[str] = None, 
@@ -315,6 +531,7 @@ def get_rise_score_list(
     随机获取加分曲目
     
     Params:
+        `progress`: 玩家进度表
         `type`: 版本
         `info`: 游玩成绩列表
         `level`: 等级
@@ -333,55 +550,61 @@ def get_rise_score_list(
         ss_ds = round((ra + score) / 20.8, 1)
     sssp_ds = round(ra / 22.4, 1)
     ds = (sssp_ds + 0.1, ss_ds + 0.1)
-    version = list(plate_to_dx_version.values())[-1] if type == 'DX' else list(plate_to_dx_version.values())[:-1]
-    musiclist = mai.total_list.filter(level=level, ds=ds, version=version)
-    for _m in musiclist:
-        if (song_id := int(_m.id)) in ignore:
-            continue
-        if song_id >= 100000:
-            continue
-        for index in _m.diff:
-            for r in achievementList[-4:]:
-                basera, rate = computeRa(_m.ds[index], r, israte=True)
-                if basera <= ra:
-                    continue
-                if score and basera - score < ra:
-                    continue
-                if song_id in old_records and old_records[song_id]['level_index'] == index:
-                    oldra, oldrate = computeRa(_m.ds[index], old_records[song_id]['achievements'], israte=True)
-                    if oldra >= basera:
-                        continue
-                    ss = RiseScore(
-                        song_id=song_id,
-                        title=_m.title,
-                        type=_m.type,
-                        level_index=index,
-                        ds=_m.ds[index],
-                        ra=basera,
-                        rate=rate,
-                        achievements=r,
-                        oldra=oldra,
-                        oldrate=oldrate,
-                        oldachievements=old_records[song_id]['achievements']
-                    )
-                else:
-                    ss = RiseScore(
-                        song_id=song_id,
-                        title=_m.title,
-                        type=_m.type,
-                        level_index=index,
-                        ds=_m.ds[index],
-                        ra=basera,
-                        rate=rate,
-                        achievements=r
-                    )
-                music.append(ss)
-                break
-    if not music:
+    
+    index = rise_index()
+    table = index.table
+    high, _ = computeRa_array(ds[1], 100.5)
+    basera, rows, target = index.search(type, ra + score if score else ra + 1, int(high))
+    chart_ds = table.ds[rows]
+    valid = (chart_ds >= ds[0]) & (chart_ds <= ds[1]) & ~np.isin(table.song_id[rows], ignore)
+    if level:
+        valid &= table.level[rows] == levelList.index(level)
+    valid &= ~progress.played[rows] | (progress.ra[rows] < basera)
+    # 每个谱面取满足条件的最低评价线
+    rows, first = np.unique(rows[valid], return_index=True)
+    basera, target = basera[valid][first], target[valid][first]
+    rank = np.searchsorted(achievementList, index.target[target], side='right')
+    if not len(rows):
         return music, 0
-    new = random.sample(music, min(len(music), 5))
-    new.sort(key=lambda x: x.song_id, reverse=True)
-    return new, ra
+    
+    candidates = list(zip(rows.tolist(), basera.tolist(), target.tolist(), rank.tolist()))
+    for row, _ra, j, _rank in random.sample(candidates, min(len(candidates), 5)):
+        _m = table.music[table.row[row]]
+        level_index = int(table.level_index[row])
+        ss = RiseScore(
+            song_id=int(table.song_id[row]),
+            title=_m.title,
+            type=_m.type,
+            level_index=level_index,
+            ds=_m.ds[level_index],
+            ra=_ra,
+            rate=rateList[_rank],
+            achievements=achievementList[-4:][j]
+        )
+        if progress.played[row]:
+            ss.oldra = int(progress.ra[row])
+            ss.oldrate = rateList[progress.rank[row]]
+            ss.oldachievements = float(progress.achievements[row])
+        music.append(ss)
+    music.sort(key=lambda x: x.song_id, reverse=True)
+    return music, ra
+
+
+def draw_rise_score(sd: List[RiseScore], sd_score: int, dx: List[RiseScore], dx_score: int) -> Image.Image:
+    """
+    绘制上分推荐，供渲染执行器调用
+    
+    Params:
+        `sd`: `旧版本谱面`
+        `sd_score`: `旧版本最低分`
+        `sd`: `新版本谱面`
+        `dx_score`: `新版本最低分`
+    Returns:
+        `Image.Image`
+    """
+    height = max(len(sd), len(dx)) * 140 + 110 + 150
+    im = DrawScore(background(1400, height)).draw_rise(sd, sd_score, dx, dx_score)
+    return im.crop((200, 0, 1200, height))
 
 
 async def rise_score_data(
@@ -402,31 +625,18 @@ async def rise_score_data(
         `Union[Image.Image, str]`
     """
     try:
-        user = await maiApi.query_user_b50(qqid=qqid, username=username)
-        records = await maiApi.query_user_plate(qqid=qqid, username=username, version=list(plate_to_dx_version.values()))
-        old_records: Dict[int, Dict[str, Union[int, float]]] = {
-            m.song_id: {
-                'level_index': m.level_index,
-                'achievements': m.achievements
-            } for m in records
-        }
+        user, store = await asyncio.gather(
+            maiApi.query_user_b50(qqid=qqid, username=username),
+            records.player(qqid=qqid, username=username)
+        )
         
-        sd, sd_low_score = get_rise_score_list(old_records, 'SD', user.charts.sd, level, score)
-        dx, dx_low_score = get_rise_score_list(old_records, 'DX', user.charts.dx, level, score)
+        sd, sd_low_score = get_rise_score_list(store.progress, 'SD', user.charts.sd, level, score)
+        dx, dx_low_score = get_rise_score_list(store.progress, 'DX', user.charts.dx, level, score)
         
         if not sd and not dx:
             return '没有推荐的铺面'
         
-        lensd, lendx = len(sd), len(dx)
-        
-        h = max(lensd, lendx)
-        height = h * 140 + 110 + 150
-        image = tricolor_gradient(1400, height)
-        
-        ds = DrawScore(image)
-        im = ds.draw_rise(sd, sd_low_score, dx, dx_low_score)
-        
-        msg = MessageSegment.image(image_to_base64(im.crop((200, 0, 1200, height))))
+        msg = await render.image(draw_rise_score, sd, sd_low_score, dx, dx_low_score)
     except (UserNotFoundError, UserNotExistsError, UserDisabledQueryError) as e:
         msg = str(e)
     except Exception as e:
@@ -439,29 +649,33 @@ async def rise_score_data(
 def plate_message(
     result: str, 
     plan: str, 
-    music_list: List[PlayInfoDefault], 
-    played: List[Tuple[int, int]]
+    rows: np.ndarray, 
+    progress: PlayerProgress
 ) -> Union[MessageSegment, str]:
     """
     Params:
         `result`: 结果
         `plan`: 目标
-        `music_list`: 谱面列表
-        `played`: 已游玩谱面
+        `rows`: 谱面行号
+        `progress`: 玩家进度表
     Returns:
         `Union[MessageSegment, str]`
     """
-    for n, m in enumerate(music_list):
+    table = progress.table
+    for n, row in enumerate(rows.tolist()):
         self_record = ''
-        if (m.song_id, m.level_index) in played:
+        if (m := progress.records[row]) is not None:
             if plan in ['将', '者']:
                 self_record = f'{m.achievements}%'
             if plan in ['極', '极', '神']:
                 self_record = m.fc
             if plan in '舞舞':
                 self_record = m.fs
-        result += f'No.{n + 1:02d} {f"「{m.song_id}」":>7} {f"「{diffs[m.level_index]}」":>11} 「{m.ds}」 {m.title}  {self_record}\n'
-    if len(music_list) > 10:
+        song_id = int(table.song_id[row])
+        level_index = int(table.level_index[row])
+        title = table.music[table.row[row]].title
+        result += f'No.{n + 1:02d} {f"「{song_id}」":>7} {f"「{diffs[level_index]}」":>11} 「{table.ds[row]}」 {title}  {self_record}\n'
+    if len(rows) > 10:
         result = MessageSegment.image(text_to_bytes_io((result.strip())))
     return result
 
@@ -485,98 +699,42 @@ async def player_plate_data(
     """
     if version in platecn:
         version = platecn[version]
-    ver, _ver = version_map.get(version, ([plate_to_dx_version.get(version)], version))
     
     try:
-        verlist = await maiApi.query_user_plate(qqid=qqid, username=username, version=ver)
+        store = await records.player(qqid=qqid, username=username)
     except (UserNotFoundError, UserNotExistsError, UserDisabledQueryError) as e:
         return str(e)
     
-    if plan in ['将', '者']:
-        achievement = 100 if plan == '将' else 80
-        callable_: Condition = lambda x: x.achievements < achievement
-    elif plan in ['極', '极']:
-        callable_: Condition = lambda x: not x.fc
-    elif plan == '舞舞':
-        callable_: Condition = lambda x: x.fs not in ['fsd', 'fsdp']
-    elif plan  == '神':
-        callable_: Condition = lambda x: x.fc not in ['ap', 'app']
-    else:
-        raise ValueError
+    progress = store.progress
+    table = progress.table
+    rows = np.flatnonzero(plate_scope(version) & ~progress.completed(plan))
+    basic, advanced, expert, master, re_master = np.bincount(table.level_index[rows], minlength=5).tolist()
     
-    unfinished_model_list: Filter = ([], [], [], [], [])
-    unfinished: List[Tuple[int, int]] = []
-    played: List[Tuple[int, int]] = []
-    remaster: List[int] = []
-    
-    # 已游玩未完成曲目
-    plate_id_list = mai.total_plate_id_list[_ver]
-    if _ver in ['舞', '霸']:
-        remaster = mai.total_plate_id_list['舞ReMASTER']
-        for music in verlist:
-            if music.song_id not in plate_id_list:
-                continue
-            if music.level_index == 4 and music.song_id not in remaster:
-                continue
-            if callable_(music):
-                unfinished.append((music.song_id, music.level_index))
-            played.append((music.song_id, music.level_index))
-    else:
-        for music in verlist:
-            if music.song_id not in plate_id_list:
-                continue
-            if callable_(music):
-                unfinished.append((music.song_id, music.level_index))
-            played.append((music.song_id, music.level_index))
-    
-    # 未游玩未完成曲目
-    for music in mai.total_list:
-        if int(music.id) not in plate_id_list:
-            continue
-        info = PlayInfoDefault(
-            achievements=0,
-            level='',
-            level_index=0,
-            title=music.title,
-            type=music.type,
-            id=int(music.id)
-        )
-        range_ = range(5 if version in ['舞', '霸'] and int(music.id) in remaster else 4)
-        for level_index in range_:
-            if (m := (info.song_id, level_index)) not in played or m in unfinished:
-                _info = info.model_copy()
-                _info.level = music.level[level_index]
-                _info.ds = music.ds[level_index]
-                _info.level_index = level_index
-                unfinished_model_list[level_index].append(_info)
-
-    basic, advanced, expert, master, re_master = unfinished_model_list
-    
-    ramain = basic + advanced + expert + master + re_master
-    ramain.sort(key=lambda x: x.ds, reverse=True)
-    difficult = [_m for _m in ramain if _m.ds > 13.6]
+    # 按定数降序，同定数按难度、曲目顺序排列
+    ramain = rows[np.lexsort((rows, table.level_index[rows], -table.ds[rows]))]
+    difficult = ramain[table.ds[ramain] > 13.6]
 
     appellation = username if username else '您'
     result = dedent(f'''\
         {appellation}的「{version}{plan}」剩余进度如下：
-        Basic剩余「{len(basic)}」首
-        Advanced剩余「{len(advanced)}」首
-        Expert剩余「{len(expert)}」首
-        Master剩余「{len(master)}」首
+        Basic剩余「{basic}」首
+        Advanced剩余「{advanced}」首
+        Expert剩余「{expert}」首
+        Master剩余「{master}」首
     ''')
     if version in ['舞', '霸']:
-        result += f'Re:Master剩余「{len(re_master)}」首\n'
+        result += f'Re:Master剩余「{re_master}」首\n'
     
     if len(difficult) > 0:
         if len(difficult) < 60:
             result += '剩余定数大于13.6的曲目：\n'
-            result = plate_message(result, plan, difficult, played)
+            result = plate_message(result, plan, difficult, progress)
         else:
             result += f'还有{len(difficult)}首大于13.6定数的曲目，加油推分捏！\n'
     elif len(ramain) > 0:
         if len(ramain) < 60:
             result += '剩余曲目：\n'
-            result = plate_message(result, plan, ramain, played)
+            result = plate_message(result, plan, ramain, progress)
         else:
             result += '已经没有定数大于13.6的曲目了，加油清谱捏！\n'
     else:
@@ -584,6 +742,55 @@ async def player_plate_data(
     return result
 
 
+def draw_level_process(
+    category: str,
+    completed: Union[List[PlayInfoDefault], List[PlayInfoDev]],
+    unfinished: Union[List[PlayInfoDefault], List[PlayInfoDev]],
+    notplayed: List[RaMusic],
+    plan: str,
+    page: int = 1,
+    end_page: int = 1
+) -> Image.Image:
+    """
+    绘制谱面等级进度，供渲染执行器调用
+    
+    Params:
+        `category`: `类别`
+        `completed`: `已完成谱面`
+        `unfinished`: `未完成谱面`
+        `notplayed`: `未游玩谱面`
+        `plan`: `评价等级`
+        `page`: `页数`
+        `end_page`: `总页数`
+    Returns:
+        `Image.Image`
+    """
+    if category == 'default':
+        completed_len = 60 if len(unfinished) == 0 and len(notplayed) == 0 else 30
+        clen = len(completed[:completed_len])
+        completed_y = (clen // 5 + (0 if clen % 5 == 0 else 1)) * 109 + 140
+        ulen = len(unfinished[:30])
+        unfinished_y = (ulen // 5 + (0 if ulen % 5 == 0 else 1)) * 109 + 140
+        nlen = len(notplayed[:100])
+        notstarted_y = (nlen // 20 + (0 if nlen % 20 == 0 else 1)) * 65 + 140
+        image = background(1400, 150 + completed_y + unfinished_y + notstarted_y)
+        dp = DrawScore(image)
+        return dp.draw_plan(completed, completed_y, unfinished, unfinished_y, notplayed, plan, completed_len)
+    elif category == 'completed' or category == 'unfinished':
+        data = completed if category == 'completed' else unfinished
+        topage = len(data[(page - 1) * 80: page * 80])
+        plc = (topage // 5 + (0 if topage % 5 == 0 else 1)) * 109
+        image = background(1400, 240 + plc + 120)
+        dp = DrawScore(image)
+        return dp.draw_category(category, data, page, end_page)
+    else:
+        lennotstarted = len(notplayed)
+        pln = (lennotstarted // 20 + (0 if lennotstarted % 20 == 0 else 1)) * 65
+        image = background(1400, 240 + pln + 120)
+        dp = DrawScore(image)
+        return dp.draw_category(category, notplayed)
+
+
 async def level_process_data(
     qqid: int, 
     username: Optional[str], 
@@ -604,117 +811,28 @@ async def level_process_data(
         `Union[MessageSegment, str]`
     """
     try:
-        if maiApi.token:
-            devobj = await maiApi.query_user_get_dev(qqid=qqid, username=username)
-            obj = devobj.records
-        else:
-            version = list(set(_v for _v in list(plate_to_dx_version.values())))
-            obj = await maiApi.query_user_plate(qqid=qqid, username=username, version=version)
-        music = mai.total_list.by_plan(level)
-
-        planlist = [0, 0, 0]
-        plannum = 0
-        if plan.lower() in scoreRank:
-            plannum = 0
-            planlist[0] = achievementList[scoreRank.index(plan.lower()) - 1]
-        elif plan.lower() in comboRank:
-            plannum = 1
-            planlist[1] = comboRank.index(plan.lower())
-        elif plan.lower() in syncRank:
-            plannum = 2
-            planlist[2] = syncRank.index(plan.lower())
-        else:
-            raise
-        
-        plan_value = planlist[plannum]
+        store = await records.player(qqid=qqid, username=username)
+        progress = store.progress
+        table = progress.table
+        scope = table.mask(level=level)
+        done = progress.completed(plan)
         
-        def is_completed(plannum: int, _d: Union[PlayInfoDefault, PlayInfoDev]) -> bool:
-            if plannum == 0:
-                return _d.achievements >= plan_value
-            elif plannum == 1:
-                return bool(_d.fc and combo_rank.index(_d.fc) >= plan_value)
-            elif plannum == 2:
-                return bool(_d.fs and (
-                    sync_rank.index(_d.fs) >= plan_value 
-                    if _d.fs in sync_rank else sync_rank_p.index(_d.fs) >= plan_value
-                ))
-            return False
-        
-        for _d in obj:
-            if isinstance(_d, PlayInfoDefault):
-                _m = mai.total_list.by_id(_d.song_id)
-                ds: float = _m.ds[_d.level_index]
-                a: float = _d.achievements
-                ra, rate = computeRa(ds, a, israte=True)
-                _d.ra = ra
-                _d.rate = rate
-            if (song_id := str(_d.song_id)) in music and _d.level == level:
-                if isinstance(music[song_id], Dict):
-                    music[song_id][_d.level_index] = PlanInfo()
-                    _p = music[song_id][_d.level_index]
-                else:
-                    music[song_id] = PlanInfo()
-                    _p = music[song_id]
-                
-                if is_completed(plannum, _d):
-                    _p.completed = _d
-                else:
-                    _p.unfinished = _d
-
-        notplayed: List[RaMusic] = []
-        completed: Union[List[PlayInfoDefault], List[PlayInfoDev]] = []
-        unfinished: Union[List[PlayInfoDefault], List[PlayInfoDev]] = []
-        for m in music:
-            play = music[m]
-            if isinstance(play, Dict):
-                for index, p in play.items():
-                    if isinstance(p, RaMusic):
-                        notplayed.append(p)
-                    elif p.completed:
-                        completed.append(p.completed)
-                    elif p.unfinished:
-                        unfinished.append(p.unfinished)
-            elif isinstance(play, PlanInfo):
-                if play.completed:
-                    completed.append(play.completed)
-                if play.unfinished:
-                    unfinished.append(play.unfinished)
-            else:
-                notplayed.append(play)
-        completed.sort(key=lambda x: x.achievements if plannum == 0 else x.fc if plannum == 1 else x.fs, reverse=True)
-        unfinished.sort(key=lambda x: x.achievements if plannum == 0 else x.fc if plannum == 1 else x.fs, reverse=True)
-        notplayed.sort(key=lambda x: x.ds, reverse=True)
-
-        if category == 'default':
-            completed_len = 60 if len(unfinished) == 0 and len(notplayed) == 0 else 30
-            clen = len(completed[:completed_len])
-            completed_y = (clen // 5 + (0 if clen % 5 == 0 else 1)) * 109 + 140
-            ulen = len(unfinished[:30])
-            unfinished_y = (ulen // 5 + (0 if ulen % 5 == 0 else 1)) * 109 + 140
-            nlen = len(notplayed[:100])
-            notstarted_y = (nlen // 20 + (0 if nlen % 20 == 0 else 1)) * 65 + 140
-            image = tricolor_gradient(1400, 150 + completed_y + unfinished_y + notstarted_y)
-            dp = DrawScore(image)
-            im = dp.draw_plan(completed, completed_y, unfinished, unfinished_y, notplayed, plan, completed_len)
-        elif category == 'completed' or category == 'unfinished':
+        completed = progress.plays(scope & done, plan)
+        unfinished = progress.plays(scope & ~done, plan)
+        notplayed_rows = np.flatnonzero(scope & ~progress.played)
+        notplayed_rows = notplayed_rows[np.argsort(-table.ds[notplayed_rows], kind='stable')]
+        notplayed: List[RaMusic] = [table.ra_music(row) for row in notplayed_rows.tolist()]
+
+        end_page_num = 1
+        if category == 'completed' or category == 'unfinished':
             data = completed if category == 'completed' else unfinished
-            lendata = len(data)
-            end_page_num = lendata // 80 + 1
+            end_page_num = len(data) // 80 + 1
             if page > end_page_num:
                 return f'超出页数，您的成绩共计「{end_page_num}」页，请重新输入'
-            topage = len(data[(page - 1) * 80: page * 80])
-            plc = (topage // 5 + (0 if topage % 5 == 0 else 1)) * 109
-            image = tricolor_gradient(1400, 240 + plc + 120)
-            dp = DrawScore(image)
-            im = dp.draw_category(category, data, page, end_page_num)
-        else:
-            lennotstarted = len(notplayed)
-            pln = (lennotstarted // 20 + (0 if lennotstarted % 20 == 0 else 1)) * 65
-            image = tricolor_gradient(1400, 240 + pln + 120)
-            dp = DrawScore(image)
-            im = dp.draw_category(category, notplayed)
         
-        msg = MessageSegment.image(image_to_base64(im))
+        msg = await render.image(
+            draw_level_process, category, completed, unfinished, notplayed, plan, page, end_page_num
+        )
     except (UserNotFoundError, UserNotExistsError, UserDisabledQueryError) as e:
         msg = str(e)
     except Exception as e:
@@ -723,6 +841,41 @@ async def level_process_data(
     return msg
 
 
+def draw_level_achievement_list(
+    rating: Union[str, float], 
+    data: Union[List[PlayInfoDefault], List[PlayInfoDev]], 
+    page: int = 1, 
+    end_page: int = 1
+) -> Image.Image:
+    """
+    绘制分数列表，供渲染执行器调用
+    
+    Params:
+        `rating`: `定数`
+        `data`: `数据`
+        `page`: `页数`
+        `end_page`: `总页数`
+    Returns:
+        `Image.Image`
+    """
+    topage = len(data[(page - 1) * 80: page * 80])
+    line = topage // 5 + (0 if topage % 5 == 0 else 1)
+    if page < end_page:
+        plc = line * 109 + 140 * 4
+    elif topage <= 20:
+        plc = 4 * 109 + 140
+    elif topage <= 40:
+        plc = line * 109 + 140 * 2
+    elif topage <= 60:
+        plc = line * 109 + 140 * 3
+    else:
+        plc = line * 109 + 140 * 4
+    
+    image = background(1400, 150 + plc)
+    sc = DrawScore(image)
+    return sc.draw_scorelist(rating, data, page, end_page)
+
+
 async def level_achievement_list_data(
     qqid: int, 
     username: Optional[str], 
@@ -742,47 +895,24 @@ async def level_achievement_list_data(
         `Union[MessageSegment, str]
     """
     try:
-        data: Union[List[PlayInfoDefault], List[PlayInfoDev]] = []
-        if maiconfig.maimaidxtoken:
-            obj = await maiApi.query_user_get_dev(qqid=qqid, username=username)
-            data = obj.records
-        else:
-            version = list(set(_v for _v in list(plate_to_dx_version.values())))
-            obj = await maiApi.query_user_plate(qqid=qqid, username=username, version=version)
-            for _d in obj:
-                music = mai.total_list.by_id(_d.song_id)
-                _d.ds = music.ds[_d.level_index]
-                _d.ra, _d.rate = computeRa(_d.ds, _d.achievements, israte=True)
-            data = obj
-
+        store = await records.player(qqid=qqid, username=username)
+        progress = store.progress
         if isinstance(rating, str):
-            newdata = sorted(list(filter(lambda x: x.level == rating, data)), key=lambda z: z.achievements, reverse=True)
+            scope = progress.table.mask(level=rating, standard=False)
         else:
-            newdata = sorted(list(filter(lambda x: x.ds == rating, data)), key=lambda z: z.achievements, reverse=True)
+            scope = progress.table.mask(ds=rating, standard=False)
+        rows = np.flatnonzero(scope & progress.played)
+        rows = rows[np.argsort(-progress.achievements[rows], kind='stable')]
+        newdata = [progress.play(row) for row in rows.tolist()]
         
         lendata = len(newdata)
         end_page_num = lendata // 80 + 1
         if page > end_page_num:
             return f'超出页数，您的成绩共计「{end_page_num}」页，请重新输入'
         
-        topage = len(newdata[(page - 1) * 80: page * 80])
-        line = topage // 5 + (0 if topage % 5 == 0 else 1)
-        if page < end_page_num:
-            plc = line * 109 + 140 * 4
-        elif topage <= 20:
-            plc = 4 * 109 + 140
-        elif topage <= 40:
-            plc = line * 109 + 140 * 2
-        elif topage <= 60:
-            plc = line * 109 + 140 * 3
-        else:
-            plc = line * 109 + 140 * 4
-        
-        image = tricolor_gradient(1400, 150 + plc)
-
-        sc = DrawScore(image)
-        im = sc.draw_scorelist(rating, newdata, page, end_page_num)
-        msg = MessageSegment.image(image_to_base64(im))
+        msg = await render.image(
+            draw_level_achievement_list, rating, newdata, page, end_page_num
+        )
     except (UserNotFoundError, UserNotExistsError, UserDisabledQueryError) as e:
         msg = str(e)
     except Exception as e:
@@ -802,24 +932,20 @@ async def rating_ranking_data(name: Optional[str], page: Optional[int]) -> Union
         `Union[MessageSegment, str]`
     """
     try:
-        rank_data = await maiApi.rating_ranking()
-
-        _time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+        board = await leaderboard.snapshot()
         if name != '':
-            if name in [r.username.lower() for r in rank_data]:
-                rank_index = [r.username.lower() for r in rank_data].index(name) + 1
-                nickname = rank_data[rank_index - 1].username
-                data = f'截止至 {_time}\n玩家 {nickname} 在查分器已注册用户ra排行第{rank_index}'
+            if (rank := board.rank(name)) is not None:
+                rank_index, nickname, _ = rank
+                data = f'截止至 {board.timestamp}\n玩家 {nickname} 在查分器已注册用户ra排行第{rank_index}'
             else:
                 data = '未找到该玩家'
         else:
-            user_num = len(rank_data)
-            msg = f'截止至 {_time}，查分器已注册用户ra排行：\n'
+            user_num = len(board)
+            msg = f'截止至 {board.timestamp}，查分器已注册用户ra排行：\n'
             if page * 50 > user_num:
                 page = user_num // 50 + 1
-            end = page * 50 if page * 50 < user_num else user_num
-            for i, ranker in enumerate(rank_data[(page - 1) * 50:end]):
-                msg += f'No.{i + 1 + (page - 1) * 50:02d}.「{ranker.ra}」 {ranker.username} \n'
+            for num, username, ra in board.page(page):
+                msg += f'No.{num:02d}.「{ra}」 {username} \n'
             msg += f'第「{page}」页，共「{user_num // 50 + 1}」页'
             data = MessageSegment.image(text_to_bytes_io((msg.strip())))
     except Exception as e:
@@ -0,0 +1,198 @@
+from typing import Iterable, Tuple
+
+import numpy as np
+
+from ..config import *
+from .maimaidx_best_50 import computeRa_array, rateList
+from .maimaidx_model import PlayInfoDefault, PlayInfoDev
+from .maimaidx_music import ChartTable, mai
+
+Rule = Tuple[str, float]
+"""(列名, 最低值)"""
+
+fc_code: Dict[str, int] = {'fc': 1, 'fcp': 2, 'ap': 3, 'app': 4}
+"""FC 编码，`0` 为无"""
+fs_code: Dict[str, int] = {'sync': 1, 'fs': 2, 'fsp': 3, 'fsd': 4, 'fdx': 4, 'fsdp': 5, 'fdxp': 5}
+"""FS 编码，`0` 为无"""
+
+
+def plan_rule(plan: str) -> Rule:
+    """
+    获取目标对应的达成条件
+
+    Params:
+        `plan`: 牌子目标 `将`、`极`、`神`、`舞舞`、`者`，或评价、FC、FS 等级
+    Returns:
+        `Rule` 对应列的值不小于最低值即为达成
+    """
+    plan = plan.lower()
+    if plan in ['将', '者']:
+        return 'achievements', 100 if plan == '将' else 80
+    if plan in ['極', '极']:
+        return 'fc', fc_code['fc']
+    if plan == '神':
+        return 'fc', fc_code['ap']
+    if plan == '舞舞':
+        return 'fs', fs_code['fsd']
+    if plan in scoreRank:
+        index = scoreRank.index(plan)
+        return 'achievements', achievementList[index - 1] if index else 0
+    if plan in comboRank:
+        return 'fc', fc_code[combo_rank[comboRank.index(plan)]]
+    if plan in syncRank:
+        return 'fs', fs_code[sync_rank[syncRank.index(plan)]]
+    raise ValueError(f'未知的目标：{plan}')
+
+
+def plate_scope(version: str) -> np.ndarray:
+    """
+    获取牌子所需谱面的掩码，`舞`、`霸` 包含 Re:MASTER 谱面
+
+    Params:
+        `version`: 版本
+    Returns:
+        `np.ndarray` 按 `mai.chart_table` 行排列的布尔掩码
+    """
+    _, _ver = version_map.get(version, ([plate_to_dx_version.get(version)], version))
+    table = mai.chart_table
+    mask = np.isin(table.song_id, mai.total_plate_id_list[_ver])
+    if _ver in ['舞', '霸']:
+        remaster = np.isin(table.song_id, mai.total_plate_id_list['舞ReMASTER'])
+        return mask & ((table.level_index < 4) | ((table.level_index == 4) & remaster))
+    return mask & (table.level_index < 4)
+
+
+class PlayerProgress:
+
+    def __init__(self, table: ChartTable, records: Iterable[Union[PlayInfoDefault, PlayInfoDev]]) -> None:
+        """
+        玩家进度表，按谱面表的行保存成绩列，并缓存各目标的达成掩码
+
+        Params:
+            `table`: 谱面表
+            `records`: 成绩列表
+        """
+        self.table = table
+        size = len(table)
+        self.played = np.zeros(size, dtype=bool)
+        self.achievements = np.zeros(size, dtype=np.float64)
+        self.fc = np.zeros(size, dtype=np.int8)
+        """FC，编码见 `fc_code`"""
+        self.fs = np.zeros(size, dtype=np.int8)
+        """FS，编码见 `fs_code`"""
+        self.ra = np.zeros(size, dtype=np.int64)
+        self.rank = np.zeros(size, dtype=np.int8)
+        """评价，编码为 `rateList` 下标"""
+        self.records: List[Optional[Union[PlayInfoDefault, PlayInfoDev]]] = [None] * size
+        self.done: Dict[Rule, np.ndarray] = {}
+        """已计算的目标达成掩码"""
+        self.update(records)
+
+    def _reach(self, rule: Rule, rows: Union[slice, np.ndarray]) -> np.ndarray:
+        column, value = rule
+        return self.played[rows] & (getattr(self, column)[rows] >= value)
+
+    def update(self, records: Iterable[Union[PlayInfoDefault, PlayInfoDev]]) -> int:
+        """
+        写入成绩，只重新计算变动行的评价与已缓存的目标掩码
+
+        Params:
+            `records`: 成绩列表
+        Returns:
+            `int` 写入的谱面数量
+        """
+        rows: List[int] = []
+        for record in records:
+            if (row := self.table.index.get((record.song_id, record.level_index))) is None:
+                continue
+            self.records[row] = record
+            self.achievements[row] = record.achievements
+            self.fc[row] = fc_code.get(record.fc, 0)
+            self.fs[row] = fs_code.get(record.fs, 0)
+            rows.append(row)
+        if not rows:
+            return 0
+        index = np.array(rows, dtype=np.intp)
+        self.played[index] = True
+        self.ra[index], self.rank[index] = computeRa_array(self.table.ds[index], self.achievements[index])
+        for rule, mask in self.done.items():
+            mask[index] = self._reach(rule, index)
+        return len(rows)
+
+    def completed(self, plan: str) -> np.ndarray:
+        """
+        获取已达成目标的谱面掩码
+
+        Params:
+            `plan`: 目标，见 `plan_rule`
+        Returns:
+            `np.ndarray`
+        """
+        rule = plan_rule(plan)
+        if (mask := self.done.get(rule)) is None:
+            mask = self.done[rule] = self._reach(rule, slice(None))
+        return mask
+
+    def play(self, row: int) -> Union[PlayInfoDefault, PlayInfoDev]:
+        """获取指定行的成绩，非开发者接口成绩返回补全定数、底分和评价的副本，不修改缓存中的成绩"""
+        record = self.records[row]
+        if isinstance(record, PlayInfoDefault):
+            record = record.model_copy(update={
+                'ds': float(self.table.ds[row]),
+                'ra': int(self.ra[row]),
+                'rate': rateList[self.rank[row]]
+            })
+        return record
+
+    def plays(self, mask: np.ndarray, plan: Optional[str] = None) -> List[Union[PlayInfoDefault, PlayInfoDev]]:
+        """
+        获取掩码内已游玩谱面的成绩
+
+        Params:
+            `mask`: 谱面掩码
+            `plan`: 目标，不为空时按目标对应的列降序排列
+        Returns:
+            `List[Union[PlayInfoDefault, PlayInfoDev]]`
+        """
+        rows = np.flatnonzero(mask & self.played)
+        if plan is not None:
+            column, _ = plan_rule(plan)
+            rows = rows[np.argsort(-getattr(self, column)[rows], kind='stable')]
+        return [self.play(row) for row in rows.tolist()]
+
+    def finished_songs(self, scope: np.ndarray, plan: str) -> int:
+        """
+        获取范围内所有谱面均已达成目标的曲目数量
+
+        Params:
+            `scope`: 谱面掩码
+            `plan`: 目标
+        Returns:
+            `int`
+        """
+        songs = np.unique(self.table.song_id[scope])
+        unfinished = np.unique(self.table.song_id[scope & ~self.completed(plan)])
+        return len(songs) - len(unfinished)
+
+    def statistics(self, scope: np.ndarray) -> Dict[str, int]:
+        """
+        统计范围内各评价、FC、FS 的达成数量，高等级同时计入低等级
+
+        Params:
+            `scope`: 谱面掩码
+        Returns:
+            `Dict[str, int]`
+        """
+        scope = scope & self.played
+        rank, fc, fs = self.rank[scope], self.fc[scope], self.fs[scope]
+        statistics = {
+            'clear': int(np.count_nonzero(self.achievements[scope] >= 80)),
+            'sync': int(np.count_nonzero(fs == fs_code['sync']))
+        }
+        for rate in score_Rank[-6:]:
+            statistics[rate] = int(np.count_nonzero(rank >= score_Rank.index(rate)))
+        for combo in combo_rank:
+            statistics[combo] = int(np.count_nonzero(fc >= fc_code[combo]))
+        for sync in sync_rank:
+            statistics[sync] = int(np.count_nonzero(fs >= fs_code[sync]))
+        return statistics
@@ -0,0 +1,110 @@
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import log, maiconfig
+from .maimaidx_api_data import maiApi
+from .maimaidx_cache import SingleFlight
+
+DEFAULT_MAX_AGE: int = 600
+"""未启用定时刷新时快照的有效期（秒）"""
+
+
+class Leaderboard:
+
+    def __init__(self) -> None:
+        """
+        查分器排行榜快照，按 `ra` 降序保存用户名与 `ra`，并建立用户名到排名的索引，
+        由定时任务按 `maimaidxrankinginterval` 刷新，为 `0` 时在查询时按 `DEFAULT_MAX_AGE` 刷新
+        """
+        self.usernames: List[str] = []
+        self.ratings: np.ndarray = np.zeros(0, dtype=np.int64)
+        self.index: Dict[str, int] = {}
+        """小写用户名对应的下标，重名时保留排名靠前的用户"""
+        self.updated: float = 0
+        """快照时间"""
+        self.flight = SingleFlight()
+
+    def __len__(self) -> int:
+        return len(self.usernames)
+
+    @property
+    def max_age(self) -> int:
+        """快照有效期，为定时刷新间隔的两倍，未启用定时刷新时为 `DEFAULT_MAX_AGE`"""
+        if maiconfig.maimaidxrankinginterval > 0:
+            return maiconfig.maimaidxrankinginterval * 2
+        return DEFAULT_MAX_AGE
+
+    @property
+    def timestamp(self) -> str:
+        """快照时间文本"""
+        return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.updated))
+
+    async def refresh(self) -> None:
+        """重新获取排行榜并建立快照，合并并发的刷新"""
+
+        async def fetch() -> None:
+            start = time.perf_counter()
+            data = await maiApi.rating_ranking()
+            ratings = np.fromiter((user['ra'] for user in data), dtype=np.int64, count=len(data))
+            order = np.argsort(-ratings, kind='stable')
+            usernames: List[str] = [data[n]['username'] for n in order.tolist()]
+            index: Dict[str, int] = {}
+            for n, username in enumerate(usernames):
+                index.setdefault(username.lower(), n)
+            self.usernames, self.ratings, self.index = usernames, ratings[order], index
+            self.updated = time.time()
+            log.debug(f'排行榜快照已更新：{len(usernames)} 名用户，耗时 {(time.perf_counter() - start) * 1000:.0f}ms')
+
+        await self.flight.do(('ranking',), fetch)
+
+    async def snapshot(self) -> 'Leaderboard':
+        """
+        获取排行榜快照，没有快照或定时刷新失效导致快照过旧时重新获取，
+        获取失败时继续使用已有快照
+
+        Returns:
+            `Leaderboard`
+        """
+        if not self.updated or time.time() - self.updated > self.max_age:
+            try:
+                await self.refresh()
+            except Exception as e:
+                if not self.updated:
+                    raise
+                log.warning(f'排行榜刷新失败，使用 {self.timestamp} 的快照：{type(e)}')
+        return self
+
+    def rank(self, username: str) -> Optional[Tuple[int, str, int]]:
+        """
+        查询用户排名
+
+        Params:
+            `username`: 用户名，不区分大小写
+        Returns:
+            `Optional[Tuple[int, str, int]]` (排名, 用户名, `ra`)，未找到时返回 `None`
+        """
+        if (n := self.index.get(username.lower())) is None:
+            return None
+        return n + 1, self.usernames[n], int(self.ratings[n])
+
+    def page(self, page: int, size: int = 50) -> List[Tuple[int, str, int]]:
+        """
+        获取指定页的排名
+
+        Params:
+            `page`: 页数
+            `size`: 每页数量
+        Returns:
+            `List[Tuple[int, str, int]]` (排名, 用户名, `ra`)
+        """
+        start = (page - 1) * size
+        end = min(start + size, len(self))
+        return [
+            (n + 1, username, ra)
+            for n, username, ra in zip(range(start, end), self.usernames[start:end], self.ratings[start:end].tolist())
+        ]
+
+
+leaderboard = Leaderboard()
@@ -0,0 +1,124 @@
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from .maimaidx_api_data import ALL_VERSION, maiApi
+from .maimaidx_model import PlayInfoDefault, PlayInfoDev
+from .maimaidx_music import mai
+from .maimaidx_progress import PlayerProgress
+
+Record = Union[PlayInfoDefault, PlayInfoDev]
+RecordKey = Tuple[int, int]
+"""(曲目ID, 难度)"""
+
+
+class PlayerRecords:
+
+    def __init__(self, records: Iterable[Record], dev: bool) -> None:
+        """
+        玩家成绩索引，按 `(曲目ID, 难度)` 保存成绩
+
+        Params:
+            `records`: 成绩列表
+            `dev`: 是否为开发者接口成绩
+        """
+        self.dev = dev
+        self.data: Dict[RecordKey, Record] = {}
+        self._progress: Optional[PlayerProgress] = None
+        self.update(records)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __iter__(self):
+        return iter(self.data.values())
+
+    def update(self, records: Iterable[Record]) -> None:
+        """写入或覆盖成绩，已建立的进度表同步更新对应谱面"""
+        records = list(records)
+        for record in records:
+            self.data[(record.song_id, record.level_index)] = record
+        if self._progress is not None:
+            self._progress.update(records)
+
+    @property
+    def progress(self) -> PlayerProgress:
+        """玩家进度表，首次访问或曲目数据更新后重新建立"""
+        if self._progress is None or self._progress.table is not mai.chart_table:
+            self._progress = PlayerProgress(mai.chart_table, self)
+        return self._progress
+
+    def get(self, song_id: Union[int, str], level_index: int) -> Optional[Record]:
+        return self.data.get((int(song_id), level_index))
+
+    def song(self, song_id: Union[int, str], count: int) -> List[Optional[Record]]:
+        """
+        获取指定曲目各难度的成绩
+
+        Params:
+            `song_id`: 曲目ID
+            `count`: 难度数量
+        Returns:
+            `List[Optional[Record]]` 未游玩的难度为 `None`
+        """
+        song_id = int(song_id)
+        return [self.data.get((song_id, level_index)) for level_index in range(count)]
+
+
+class RecordStore:
+
+    def __init__(self) -> None:
+        """
+        玩家成绩库，每个玩家的全部成绩只下载一次并建立索引，
+        索引保存在 `maiApi` 的成绩缓存中，与其它接口共用缓存有效期、请求合并及清除
+        """
+
+    async def player(self, *, qqid: Optional[int] = None, username: Optional[str] = None) -> PlayerRecords:
+        """
+        获取玩家成绩索引，配置了开发者 `token` 时使用开发者接口，否则使用全版本牌子接口
+
+        Params:
+            `qqid`: QQ号
+            `username`: 用户名
+        Returns:
+            `PlayerRecords`
+        """
+
+        async def fetch() -> PlayerRecords:
+            if maiApi.token:
+                data = await maiApi.query_user_get_dev(qqid=qqid, username=username)
+                return PlayerRecords(data.records or [], True)
+            data = await maiApi.query_user_plate(qqid=qqid, username=username, version=list(ALL_VERSION))
+            return PlayerRecords(data, False)
+
+        return await maiApi.cached(('records', (qqid, username)), fetch)
+
+    async def song(
+        self,
+        music_id: Union[int, str],
+        count: int,
+        *,
+        qqid: Optional[int] = None,
+        username: Optional[str] = None
+    ) -> List[Optional[Record]]:
+        """
+        获取玩家指定曲目各难度的成绩
+
+        配置了开发者 `token` 时只请求该曲目的成绩，并更新已缓存的成绩索引
+
+        Params:
+            `music_id`: 曲目ID
+            `count`: 难度数量
+            `qqid`: QQ号
+            `username`: 用户名
+        Returns:
+            `List[Optional[Record]]` 未游玩的难度为 `None`
+        """
+        if maiApi.token:
+            data = await maiApi.query_user_post_dev(qqid=qqid, username=username, music_id=music_id)
+            if (store := maiApi.cache.get(('records', (qqid, username)), count=False)) is not None:
+                store.update(data)
+            return PlayerRecords(data, True).song(music_id, count)
+        store = await self.player(qqid=qqid, username=username)
+        return store.song(music_id, count)
+
+
+records = RecordStore()
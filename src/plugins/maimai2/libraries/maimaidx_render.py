@@ -0,0 +1,349 @@
+import asyncio
+import base64
+import hashlib
+import importlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from io import BytesIO
+from typing import Any, Callable, Dict, NamedTuple, Tuple, Type
+
+import nonebot
+from nonebot.adapters.onebot.v11 import MessageSegment
+from PIL import Image
+from pydantic import BaseModel
+
+from ..config import *
+from .image import encode_image
+from .maimaidx_model import Music
+
+
+class MusicRef(NamedTuple):
+    """传递给渲染进程的曲目引用，在渲染进程中按 `id` 还原为曲目"""
+    id: str
+
+
+class ModelSpec(NamedTuple):
+    """传递给渲染进程的模型数据，在渲染进程中重新校验为模型"""
+    module: str
+    name: str
+    data: Dict[str, Any]
+
+
+def encode_arg(obj: Any) -> Any:
+    """
+    将绘制参数中的曲目与模型转换为纯数据
+
+    Params:
+        `obj`: 参数
+    Returns:
+        `Any`
+    """
+    if isinstance(obj, Music):
+        return MusicRef(obj.id)
+    if isinstance(obj, BaseModel):
+        return ModelSpec(type(obj).__module__, type(obj).__qualname__, obj.model_dump(by_alias=True))
+    if isinstance(obj, list):
+        return [encode_arg(o) for o in obj]
+    if type(obj) is tuple:
+        return tuple(encode_arg(o) for o in obj)
+    if isinstance(obj, dict):
+        return {k: encode_arg(v) for k, v in obj.items()}
+    return obj
+
+
+def decode_arg(obj: Any) -> Any:
+    """还原 `encode_arg` 转换的参数，在渲染进程中调用"""
+    if isinstance(obj, MusicRef):
+        from .maimaidx_music import mai
+        if (music := mai.total_list.by_id(obj.id)) is None:
+            raise KeyError(f'渲染进程中未找到曲目「{obj.id}」')
+        return music
+    if isinstance(obj, ModelSpec):
+        model: Type[BaseModel] = getattr(importlib.import_module(obj.module), obj.name)
+        return model.model_validate(obj.data)
+    if isinstance(obj, list):
+        return [decode_arg(o) for o in obj]
+    if type(obj) is tuple:
+        return tuple(decode_arg(o) for o in obj)
+    if isinstance(obj, dict):
+        return {k: decode_arg(v) for k, v in obj.items()}
+    return obj
+
+
+_worker_ready = False
+
+
+def _prepare_worker() -> None:
+    """渲染进程准备，加载字体、常驻背景图片以及本地暂存文件中的曲目与牌子数据，每个进程只执行一次"""
+    global _worker_ready
+    if _worker_ready:
+        return
+    _worker_ready = True
+    from .image import fonts
+    from .maimaidx_best_50 import ScoreBaseImage
+    from .maimaidx_music import build_music_list, mai
+    from .tool import loads
+    fonts.preload()
+    if maiconfig.saveinmem and ScoreBaseImage.title_bg is None:
+        try:
+            ScoreBaseImage._load_image()
+        except Exception as e:
+            log.warning(f'渲染进程加载图片失败：{type(e)}')
+    try:
+        mai.set_music(build_music_list(loads(music_file.read_bytes()), loads(chart_file.read_bytes())))
+        mai.total_plate_id_list = loads(plate_file.read_bytes())
+    except Exception as e:
+        log.error(f'渲染进程加载曲目数据失败：{type(e)}')
+
+
+message_type: Dict[str, str] = {
+    'draw_best': 'score',
+    'draw_rise_score': 'score',
+    'draw_level_process': 'score',
+    'draw_level_achievement_list': 'score',
+    'draw_music_info_image': 'info',
+    'draw_music_play_image': 'info',
+    'draw_pie_chart': 'info',
+    'draw_rating_table_image': 'table',
+    'draw_plate_table_image': 'table'
+}
+"""绘制函数对应的消息类型，用于在 `maimaidximageformat` 中选择图片格式"""
+
+
+def _render(
+    func: Callable[..., Image.Image], 
+    args: Tuple[Any, ...], 
+    kwargs: Dict[str, Any], 
+    kind: Optional[str]
+) -> Tuple[bytes, float]:
+    """
+    在渲染进程中绘制并编码图片，`kind` 为 `None` 时按默认参数保存为 PNG
+
+    Returns:
+        `Tuple[bytes, float]` (图片数据, 绘制耗时)
+    """
+    start = time.perf_counter()
+    im = func(*args, **kwargs)
+    if kind is None:
+        output = BytesIO()
+        im.save(output, 'PNG')
+        data = output.getvalue()
+    else:
+        data = encode_image(im, kind)
+    return data, time.perf_counter() - start
+
+
+def _render_spec(
+    func: Callable[..., Image.Image], 
+    args: Tuple[Any, ...], 
+    kwargs: Dict[str, Any], 
+    kind: Optional[str]
+) -> Tuple[bytes, float]:
+    """在渲染进程中还原参数后绘制，参数由 `encode_arg` 转换"""
+    _prepare_worker()
+    return _render(func, decode_arg(args), decode_arg(kwargs), kind)
+
+
+_image_suffix: Dict[bytes, str] = {b'\x89PNG': '.png', b'\xff\xd8\xff': '.jpg', b'RIFF': '.webp'}
+
+
+def image_segment(data: bytes) -> MessageSegment:
+    """
+    按 `maimaidximagetransfer` 配置生成图片消息段
+
+    `bytes` 直接发送图片数据，`base64` 发送 base64 字符串，
+    `file` 写入临时文件夹后发送文件路径，仅适用于协议端与 BOT 位于同一台机器的情况
+
+    Params:
+        `data`: 图片数据
+    Returns:
+        `MessageSegment`
+    """
+    transfer = maiconfig.maimaidximagetransfer
+    if transfer == 'base64':
+        return MessageSegment.image('base64://' + base64.b64encode(data).decode())
+    if transfer == 'file':
+        suffix = next((v for k, v in _image_suffix.items() if data.startswith(k)), '.png')
+        image_temp_dir.mkdir(parents=True, exist_ok=True)
+        expire = time.time() - 600
+        with os.scandir(image_temp_dir) as it:
+            for entry in it:
+                if entry.is_file() and entry.stat().st_mtime < expire:
+                    os.remove(entry.path)
+        file = image_temp_dir / (hashlib.md5(data).hexdigest() + suffix)
+        file.write_bytes(data)
+        return MessageSegment.image(file.resolve())
+    return MessageSegment.image(data)
+
+
+class JobStats:
+
+    __slots__ = ('count', 'total', 'max', 'last', 'wait', 'size')
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.wait = 0.0
+        """累计排队耗时"""
+        self.size = 0
+        """累计图片大小"""
+
+    def add(self, cost: float, wait: float, size: int) -> None:
+        self.count += 1
+        self.size += size
+        self.total += cost
+        self.max = max(self.max, cost)
+        self.last = cost
+        self.wait += wait
+
+
+class RenderPool:
+
+    def __init__(self) -> None:
+        """
+        图片渲染执行器
+
+        绘制函数需为模块级同步函数并返回 `Image.Image`，在工作进程中完成绘制与编码，
+        返回按 `maimaidximageformat` 编码的图片数据，曲目与模型参数以纯数据传递。配置 `maimaidxrenderworkers` 为 `0` 时使用线程池
+        """
+        self.executor: Optional[Executor] = None
+        self.process = False
+        self.pending = 0
+        """排队及执行中的任务数"""
+        self.stats: Dict[str, JobStats] = {}
+
+    @property
+    def workers(self) -> int:
+        return max(maiconfig.maimaidxrenderworkers, 1)
+
+    def start(self) -> None:
+        """启动执行器，需在曲目数据写入暂存文件后调用，工作进程从暂存文件加载数据"""
+        if self.executor is not None:
+            return
+        if maiconfig.maimaidxrenderworkers > 0:
+            methods = multiprocessing.get_all_start_methods()
+            # 不使用 fork，避免子进程继承其它线程持有的锁；子进程先初始化 nonebot 才能导入本插件
+            self.executor = ProcessPoolExecutor(
+                self.workers,
+                multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn'),
+                initializer=partial(nonebot.init, **{**driver.config.model_dump(), 'driver': '~none'})
+            )
+            for _ in range(self.workers):
+                self.executor.submit(_prepare_worker)
+            self.process = True
+        else:
+            self.executor = ThreadPoolExecutor(self.workers, 'maimaidx-render')
+            self.process = False
+        log.info(f'渲染执行器已启动：{"进程" if self.process else "线程"}数「{self.workers}」')
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def restart(self) -> None:
+        """重启执行器，曲目数据更新后调用，旧执行器完成已提交的任务后退出"""
+        executor, self.executor = self.executor, None
+        self.start()
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    async def submit(
+        self, 
+        func: Callable[..., Image.Image], 
+        args: Tuple[Any, ...] = (), 
+        kwargs: Optional[Dict[str, Any]] = None, 
+        kind: Optional[str] = None,
+        lossless: bool = False
+    ) -> Tuple[bytes, float]:
+        """
+        提交绘制任务
+
+        Params:
+            `func`: 绘制函数
+            `args`: 位置参数
+            `kwargs`: 关键字参数
+            `kind`: 消息类型，为 `None` 时按 `message_type` 选择
+            `lossless`: 是否忽略输出配置直接保存为 PNG，用于写入本地的图片
+        Returns:
+            `Tuple[bytes, float]` (图片数据, 绘制耗时)
+        """
+        if self.executor is None:
+            self.start()
+        kwargs = kwargs or {}
+        if lossless:
+            kind = None
+        else:
+            kind = kind or message_type.get(func.__name__, 'default')
+        target = _render
+        if self.process:
+            target, args, kwargs = _render_spec, encode_arg(args), encode_arg(kwargs)
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        start = time.perf_counter()
+        executor = self.executor
+        try:
+            try:
+                data, cost = await loop.run_in_executor(executor, target, func, args, kwargs, kind)
+            except BrokenProcessPool:
+                if self.executor is executor:
+                    log.warning('渲染进程异常退出，正在重启渲染执行器')
+                    self.restart()
+                data, cost = await loop.run_in_executor(self.executor, target, func, args, kwargs, kind)
+        finally:
+            self.pending -= 1
+        elapsed = time.perf_counter() - start
+        self.stats.setdefault(func.__name__, JobStats()).add(cost, max(elapsed - cost, 0), len(data))
+        log.debug(f'{func.__name__} 绘制完成，耗时 {cost * 1000:.0f}ms，大小 {len(data) / 1024:.0f}KB')
+        return data, cost
+
+    async def run(self, func: Callable[..., Image.Image], *args: Any, **kwargs: Any) -> bytes:
+        """
+        提交绘制任务
+
+        Params:
+            `func`: 绘制函数
+            `args`: 位置参数
+            `kwargs`: 关键字参数
+        Returns:
+            `bytes` 图片数据
+        """
+        data, _ = await self.submit(func, args, kwargs)
+        return data
+
+    async def image(self, func: Callable[..., Image.Image], *args: Any, **kwargs: Any) -> MessageSegment:
+        """
+        提交绘制任务并生成图片消息段
+
+        Params:
+            `func`: 绘制函数
+            `args`: 位置参数
+            `kwargs`: 关键字参数
+        Returns:
+            `MessageSegment`
+        """
+        data, _ = await self.submit(func, args, kwargs)
+        return image_segment(data)
+
+    def status(self) -> str:
+        """执行器状态"""
+        msg = (
+            f'渲染执行器：{"进程" if self.process else "线程"}数「{self.workers}」，'
+            f'当前队列「{self.pending}」\n'
+        )
+        for name, job in sorted(self.stats.items(), key=lambda x: x[1].total, reverse=True):
+            msg += (
+                f'{name}：{job.count}次，平均{job.total / job.count * 1000:.0f}ms，'
+                f'最长{job.max * 1000:.0f}ms，平均排队{job.wait / job.count * 1000:.0f}ms，'
+                f'平均大小{job.size / job.count / 1024:.0f}KB\n'
+            )
+        return msg.strip()
+
+
+render = RenderPool()
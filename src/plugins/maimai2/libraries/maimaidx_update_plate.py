@@ -1,210 +1,405 @@
-import copy
+import asyncio
+import hashlib
 import time
+from typing import Any, Callable
 
 import aiofiles
 
-from .image import tricolor_gradient
+from .image import background
 from .maimaidx_best_50 import *
+from .maimaidx_model import RaMusic
 from .maimaidx_music import Music, mai
+from .maimaidx_render import render
+from .tool import openfile, writefile
+
+
+def _cover_stamp(music_id: Union[int, str]) -> Tuple[str, float]:
+    """曲绘文件名与修改时间，曲绘更新后对应的表格需要重新生成"""
+    path = covers.path(music_id)
+    return path.name, covers.mtime.get(int(path.stem), 0)
+
+
+def table_hash(data: Any) -> str:
+    """
+    计算表格内容哈希
+    
+    Params:
+        `data`: 表格内容，需为可稳定 `repr` 的数据
+    Returns:
+        `str`
+    """
+    return hashlib.sha1(repr(data).encode()).hexdigest()
+
+
+async def load_table_manifest() -> Dict[str, Dict[str, str]]:
+    """读取已生成表格的内容哈希"""
+    manifest = {'rating': {}, 'plate': {}}
+    if table_manifest_file.exists():
+        try:
+            manifest.update(await openfile(table_manifest_file))
+        except Exception as e:
+            log.warning(f'表格哈希文件读取失败：{type(e)}')
+    return manifest
+
+
+async def render_tables(
+    name: str, 
+    manifest: Dict[str, str], 
+    jobs: Dict[str, Tuple[str, Path, Callable[..., Image.Image], Tuple[Any, ...]]]
+) -> str:
+    """
+    并行生成内容已变化或文件缺失的表格，并更新 `manifest`
+    
+    Params:
+        `name`: 表格名称
+        `manifest`: 该类表格的内容哈希
+        `jobs`: 表格名与 (内容哈希, 文件路径, 绘制函数, 参数)
+    Returns:
+        `str` 生成结果
+    """
+    stale = {
+        key: job for key, job in jobs.items() 
+        if manifest.get(key) != job[0] or not job[1].exists()
+    }
+    if not stale:
+        log.info(f'{name}均为最新，无需更新')
+        return f'{name}均为最新，无需更新'
+
+    async def _render(key: str, digest: str, path: Path, func: Callable[..., Image.Image], args: Tuple[Any, ...]):
+        data, cost = await render.submit(func, args, lossless=True)
+        async with aiofiles.open(path, 'wb') as f:
+            await f.write(data)
+        manifest[key] = digest
+        log.info(f'{key} {name}更新完成，耗时：{cost:.2f}s')
+        return cost
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*[_render(key, *job) for key, job in stale.items()], return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    failed = [key for key, result in zip(stale, results) if isinstance(result, BaseException)]
+    for key, result in zip(stale, results):
+        if isinstance(result, BaseException):
+            log.opt(exception=result).error(f'{key} {name}更新失败')
+    msg = f'{name}更新完成，共更新「{len(stale) - len(failed)}/{len(jobs)}」张，耗时{elapsed:.2f}s'
+    if failed:
+        msg += f'\n更新失败：{"，".join(failed)}'
+    log.info(msg)
+    return msg
+
+
+class TableLayout:
+
+    def __init__(self, height: int) -> None:
+        """
+        表格布局，底图与玩家成绩叠加层共用同一份坐标
+        
+        Params:
+            `height`: 底图高度
+        """
+        self.height = height
+        self.labels: List[Tuple[str, int]] = []
+        """等级标签 (等级, 纵坐标)"""
+        self.cells: List[Tuple[Any, int, int]] = []
+        """格子 (谱面或曲目ID, 横坐标, 纵坐标)，坐标为曲绘左上角"""
+
+
+def rating_table_layout(lv: str, lvlist: Dict[str, List[RaMusic]]) -> TableLayout:
+    """
+    计算定数表布局
+    
+    Params:
+        `lv`: 等级
+        `lvlist`: 各定数的谱面
+    Returns:
+        `TableLayout`
+    """
+    lines = 0
+    for _lv in lvlist:
+        musicnum = len(lvlist[_lv])
+        if musicnum == 0:
+            r = 1
+        else:
+            remainder = musicnum % 14
+            r = (musicnum // 14) + (1 if remainder else 0)
+        lines += r
+
+    if '+' in lv:
+        f = 4
+    elif lv == '6':
+        f = 10
+    else:
+        f = 6
+
+    linesheight = 85 * lines
+    """
+    `85` 为曲绘高度 `80` + 间隔 `5`
+    `lines` 为行数
+    """
+    
+    layout = TableLayout(325 + f * 20 + linesheight)
+    """
+    `325` 为顶部文字和底部图片高度 + 上下间隔高度
+    `f * 20` 为等级数量 `f` * 等级间隔 `20`
+    `linesheight` 为各等级曲绘和间隔总和高度
+    """
+    y = 100
+    for _lv in lvlist: 
+        x = 160
+        y += 20
+        layout.labels.append((_lv, y))
+        for num, music in enumerate(lvlist[_lv]):
+            if num % 14 == 0:
+                x = 160
+                y += 85
+            else:
+                x += 85
+            layout.cells.append((music, x, y))
+        if not lvlist[_lv]:
+            y += 85
+    return layout
+
+
+def plate_table_ids(version: str) -> Optional[Dict[str, List[str]]]:
+    """
+    获取完成表各等级已排序的曲目ID
+    
+    Params:
+        `version`: 版本
+    Returns:
+        `Optional[Dict[str, List[str]]]` 未找到牌子数据时返回 `None`
+    """
+    ver, _ver = version_map.get(version, ([plate_to_dx_version.get(version)], version))
+    if (music_id_list := mai.total_plate_id_list.get(_ver)) is None:
+        return None
+    music = mai.total_list.by_id_list(music_id_list)
+    ralv: Dict[str, List[Music]] = {_: [] for _ in reversed(levelList)}
+    for m in music:
+        ralv[m.level[3]].append(m)
+    for r in ralv:
+        if version in ['霸', '舞']:
+            ralv[r].sort(key=lambda x: x.ds[-1], reverse=True)
+        else:
+            ralv[r].sort(key=lambda x: x.ds[3], reverse=True)
+    return {r: [m.id for m in ralv[r]] for r in ralv}
+
+
+def plate_table_layout(ralv: Dict[str, List[str]]) -> TableLayout:
+    """
+    计算完成表布局
+    
+    Params:
+        `ralv`: 各等级已排序的曲目ID
+    Returns:
+        `TableLayout`
+    """
+    lines = 0
+    interval = 0
+    for _ in ralv:
+        musicnum = len(ralv[_])
+        if musicnum == 0:
+            continue
+        interval += 1
+        remainder = musicnum % 10
+        lines += (musicnum // 10) + (1 if remainder else 0)
+    
+    linesheight = 115 * lines + (interval - 1) * 15
+    """
+    `linesheight`: 各等级曲绘和间隔总和高度
+    
+        - `115` 为曲绘高度 `100` + 间隔 `15`
+        - `lines` 为行数
+        - `interval` 为各等级间隔行数
+        - `(interval - 1) * 15` 为各等级间隔高度，各等级之间间隔为 `30`，所以只加 `15`
+    """
+    layout = TableLayout(150 + linesheight + 360)
+    """
+    `150` 为底部图片 `design` 高度 + 上下间隔高度
+    `linesheight` 为各等级曲绘和间隔总和高度
+    `360` 为顶部图片 `` 高度 + 上下间隔高度
+    """
+    y = 245
+    for r in ralv:
+        if ralv[r]:
+            y += 15
+            layout.labels.append((r, y))
+        x = 200
+        for num, music_id in enumerate(ralv[r]):
+            if num % 10 == 0:
+                x = 200
+                y += 115
+            else:
+                x += 115
+            layout.cells.append((music_id, x, y))
+    return layout
+
+
+_layouts: Dict[Tuple[str, str], Tuple[Optional[str], TableLayout]] = {}
+
+
+def table_layout(table: str, name: str) -> TableLayout:
+    """
+    获取缓存的表格布局，曲目数据更新后重新计算
+    
+    Params:
+        `table`: `rating` 或 `plate`
+        `name`: 等级或版本
+    Returns:
+        `TableLayout`
+    """
+    key = (table, name)
+    if (cached := _layouts.get(key)) is not None and cached[0] == mai.catalogue_hash:
+        return cached[1]
+    if table == 'rating':
+        layout = rating_table_layout(name, mai.total_level_data[name])
+    else:
+        if (ralv := plate_table_ids(name)) is None:
+            raise KeyError(name)
+        layout = plate_table_layout(ralv)
+    _layouts[key] = (mai.catalogue_hash, layout)
+    return layout
+
+
+_board_mtime: Dict[Path, float] = {}
+
+
+def table_board(path: Path) -> Image.Image:
+    """
+    获取表格底图副本，底图解码后保存在素材缓存中，文件更新后重新读取
+    
+    Params:
+        `path`: 底图路径
+    Returns:
+        `Image.Image`
+    """
+    mtime = path.stat().st_mtime
+    if _board_mtime.get(path, mtime) != mtime:
+        assets.invalidate(path)
+    _board_mtime[path] = mtime
+    return assets.get(path).copy()
+
+
+def draw_rating_table_board(lv: str, lvlist: Dict[str, List[RaMusic]]) -> Image.Image:
+    """
+    绘制定数表底图，供渲染执行器调用
+    
+    Params:
+        `lv`: 等级
+        `lvlist`: 各定数的谱面
+    Returns:
+        `Image.Image`
+    """
+    dx = sprite('DX.png', (44, 16))
+    diff = [Image.new('RGBA', (75, 16), color) for color in ScoreBaseImage.bg_color]
+    layout = rating_table_layout(lv, lvlist)
+    width, height = 1400, layout.height
+    
+    im = background(width, height)
+
+    dr = ImageDraw.Draw(im)
+    sy = DrawText(dr, SIYUAN)
+    ts = DrawText(dr, TBFONT)
+    im.alpha_composite(sprite('design.png'), (200, height - 113))
+    sy.draw(
+        700, 
+        height - 70, 
+        22, 
+        f'Designed by xingdian. Generated by cangyao BOT', 
+        ScoreBaseImage.text_color, 
+        'mm'
+    )
+    for _lv, y in layout.labels:
+        im.alpha_composite(
+            sprite('UI_CMN_Chara_Level_S_01.png', (80, 80)), (50, y + 80)
+        )
+        ts.draw(88, y + 120, 35, _lv, anchor='mm')
+    for music, x, y in layout.cells:
+        cover = covers.get(music.id, (75, 75))
+        im.alpha_composite(cover, (x, y))
+        if music.type == 'DX':
+            im.alpha_composite(dx, (x + 31, y))
+        im.alpha_composite(diff[int(music.lv)], (x, y + 59))
+        ts.draw(x + 37, y + 67, 13, music.id, ScoreBaseImage.t_color[int(music.lv)], 'mm')
+    return im
 
 
 async def update_rating_table() -> str:
-    """更新定数表"""
+    """更新定数表，仅重新生成内容发生变化的等级"""
     try:
-        dx = Image.open(maimaidir / 'DX.png').convert('RGBA').resize((44, 16))
-        diff = [Image.new('RGBA', (75, 16), color) for color in ScoreBaseImage.bg_color]
-        atime = 0
+        manifest = await load_table_manifest()
+        jobs = {}
         for lv in levelList[6:]:
-            _otime = time.time()
-            picname = ratingdir / f'{lv}.png'
             lvlist = mai.total_level_data[lv]
-            lines = 0
-            for _lv in lvlist:
-                musicnum = len(lvlist[_lv])
-                if musicnum == 0:
-                    r = 1
-                else:
-                    remainder = musicnum % 14
-                    r = (musicnum // 14) + (1 if remainder else 0)
-                lines += r
-
-            if '+' in lv:
-                f = 4
-            elif lv == '6':
-                f = 10
-            else:
-                f = 6
-
-            linesheight = 85 * lines
-            """
-            `85` 为曲绘高度 `80` + 间隔 `5`
-            `lines` 为行数
-            """
-            
-            width, height = 1400, 325 + f * 20 + linesheight
-            """
-            `325` 为顶部文字和底部图片高度 + 上下间隔高度
-            `f * 20` 为等级数量 `f` * 等级间隔 `20`
-            `linesheight` 为各等级曲绘和间隔总和高度
-            """
-            
-            im = tricolor_gradient(width, height)
-            
-            im.alpha_composite(ScoreBaseImage.aurora_bg)
-            im.alpha_composite(ScoreBaseImage.shines_bg, (34, 0))
-            im.alpha_composite(ScoreBaseImage.rainbow_bg, (319, height - 643))
-            im.alpha_composite(ScoreBaseImage.rainbow_bottom_bg, (100, height - 343))
-            for h in range((height // 358) + 1):
-                im.alpha_composite(ScoreBaseImage.pattern_bg, (0, (358 + 7) * h))
-
-            dr = ImageDraw.Draw(im)
-            sy = DrawText(dr, SIYUAN)
-            ts = DrawText(dr, TBFONT)
-            im.alpha_composite(Image.open(maimaidir / 'design.png'), (200, height - 113))
-            sy.draw(
-                700, 
-                height - 70, 
-                22, 
-                f'Designed by xingdian. Generated by cangyao BOT', 
-                ScoreBaseImage.text_color, 
-                'mm'
-            )
-            y = 100
-            for _lv in lvlist: 
-                x = 160
-                y += 20
-                im.alpha_composite(
-                    Image.open(maimaidir / 'UI_CMN_Chara_Level_S_01.png').resize((80, 80)), (50, y + 80)
-                )
-                ts.draw(88, y + 120, 35, _lv, anchor='mm')
-                for num, music in enumerate(lvlist[_lv]):
-                    if num % 14 == 0:
-                        x = 160
-                        y += 85
-                    else:
-                        x += 85
-                    cover = Image.open(music_picture(music.id)).resize((75, 75))
-                    im.alpha_composite(cover, (x, y))
-                    if music.type == 'DX':
-                        im.alpha_composite(dx, (x + 31, y))
-                    im.alpha_composite(diff[int(music.lv)], (x, y + 59))
-                    ts.draw(x + 37, y + 67, 13, music.id, ScoreBaseImage.t_color[int(music.lv)], 'mm')
-                if not lvlist[_lv]:
-                    y += 85
-
-            by = BytesIO()
-            im.save(by, 'PNG')
-            async with aiofiles.open(picname, 'wb') as f:
-                await f.write(by.getbuffer())
-            _ntime = int(time.time() - _otime)
-            atime += _ntime
-            log.info(f'lv.{lv} 定数表更新完成，耗时：{_ntime}s')
-        log.info(f'定数表更新完成，共耗时{atime}s')
-        return f'定数表更新完成，共耗时{atime}s'
+            digest = table_hash({
+                _lv: [(m.id, m.ds, m.lv, m.type, _cover_stamp(m.id)) for m in lvlist[_lv]] 
+                for _lv in lvlist
+            })
+            jobs[lv] = (digest, ratingdir / f'{lv}.png', draw_rating_table_board, (lv, lvlist))
+        msg = await render_tables('定数表', manifest['rating'], jobs)
+        await writefile(table_manifest_file, manifest)
+        return msg
     except Exception as e:
         log.error(traceback.format_exc())
         return f'定数表更新失败，Error: {e}'
 
 
+def draw_plate_table_board(ralv: Dict[str, List[str]]) -> Image.Image:
+    """
+    绘制完成表底图，供渲染执行器调用
+    
+    Params:
+        `ralv`: 各等级已排序的曲目ID
+    Returns:
+        `Image.Image`
+    """
+    id_bg = Image.new('RGBA', (100, 20), (124, 129, 255, 255))
+    layout = plate_table_layout(ralv)
+    width, height = 1400, layout.height
+
+    im = background(width, height)
+    
+    dr = ImageDraw.Draw(im)
+    ts = DrawText(dr, TBFONT)
+    sy = DrawText(dr, SIYUAN)
+    im.alpha_composite(sprite('design.png'), (200, height - 113))
+    sy.draw(
+        700, 
+        height - 70, 
+        22, 
+        f'Designed by xingdian. Generated by cangyao BOT', 
+        ScoreBaseImage.text_color, 
+        'mm'
+    )
+    for r, y in layout.labels:
+        im.alpha_composite(
+            sprite('UI_CMN_Chara_Level_S_01.png'), (65, y + 115)
+        )
+        ts.draw(113, y + 164, 35, r, anchor='mm')
+    for music_id, x, y in layout.cells:
+        im.alpha_composite(covers.get(music_id, (100, 100)), (x, y))
+        im.alpha_composite(id_bg, (x, y + 80))
+        ts.draw(x + 50, y + 88, 20, music_id, anchor='mm')
+    return im
+
+
 async def update_plate_table() -> str:
-    """更新完成表"""
+    """更新完成表，仅重新生成内容发生变化的版本"""
     try:
         version = list(_ for _ in plate_to_dx_version.keys())[1:]
         # version.append('霸')
         # version.append('舞')
-        id_bg = Image.new('RGBA', (100, 20), (124, 129, 255, 255))
-        rlv: Dict[str, List[Music]] = {}
-        for _ in list(reversed(levelList)):
-            rlv[_] = []
+        manifest = await load_table_manifest()
+        jobs = {}
         for _v in version:
             if _v in platecn:
                 _v = platecn[_v]
-            ver, _ver = version_map.get(_v, ([plate_to_dx_version.get(_v)], _v))
-            
-            music_id_list = mai.total_plate_id_list[_ver]
-            music = mai.total_list.by_id_list(music_id_list)
-            ralv = copy.deepcopy(rlv)
-
-            for m in music:
-                ralv[m.level[3]].append(m)
-
-            lines = 0
-            interval = 0
-            for _ in ralv:
-                musicnum = len(ralv[_])
-                if musicnum == 0:
-                    continue
-                interval += 1
-                remainder = musicnum % 10
-                lines += (musicnum // 10) + (1 if remainder else 0)
-            
-            linesheight = 115 * lines + (interval - 1) * 15
-            """
-            `linesheight`: 各等级曲绘和间隔总和高度
-            
-                - `115` 为曲绘高度 `100` + 间隔 `15`
-                - `lines` 为行数
-                - `interval` 为各等级间隔行数
-                - `(interval - 1) * 15` 为各等级间隔高度，各等级之间间隔为 `30`，所以只加 `15`
-            """
-            width, height = 1400, 150 + linesheight + 360
-            """
-            `150` 为底部图片 `design` 高度 + 上下间隔高度
-            `linesheight` 为各等级曲绘和间隔总和高度
-            `360` 为顶部图片 `` 高度 + 上下间隔高度
-            """
-
-            im = tricolor_gradient(width, height)
-            
-            im.alpha_composite(ScoreBaseImage.aurora_bg)
-            im.alpha_composite(ScoreBaseImage.shines_bg, (34, 0))
-            im.alpha_composite(ScoreBaseImage.rainbow_bg, (319, height - 643))
-            im.alpha_composite(ScoreBaseImage.rainbow_bottom_bg, (100, height - 343))
-            for h in range((height // 358) + 1):
-                im.alpha_composite(ScoreBaseImage.pattern_bg, (0, (358 + 7) * h))
-            
-            dr = ImageDraw.Draw(im)
-            ts = DrawText(dr, TBFONT)
-            sy = DrawText(dr, SIYUAN)
-            im.alpha_composite(Image.open(maimaidir / 'design.png'), (200, height - 113))
-            sy.draw(
-                700, 
-                height - 70, 
-                22, 
-                f'Designed by xingdian. Generated by cangyao BOT', 
-                ScoreBaseImage.text_color, 
-                'mm'
-            )
-            y = 245
-            for r in ralv:
-                if _v in ['霸', '舞']:
-                    ralv[r].sort(key=lambda x: x.ds[-1], reverse=True)
-                else:
-                    ralv[r].sort(key=lambda x: x.ds[3], reverse=True)
-                if ralv[r]:
-                    y += 15
-                    im.alpha_composite(
-                        Image.open(maimaidir / 'UI_CMN_Chara_Level_S_01.png'), (65, y + 115)
-                    )
-                    ts.draw(113, y + 164, 35, r, anchor='mm')
-                x = 200
-                for num, music in enumerate(ralv[r]):
-                    if num % 10 == 0:
-                        x = 200
-                        y += 115
-                    else:
-                        x += 115
-                    cover = music_picture(music.id)
-                    im.alpha_composite(Image.open(cover).resize((100, 100)), (x, y))
-                    im.alpha_composite(id_bg, (x, y + 80))
-                    ts.draw(x + 50, y + 88, 20, music.id, anchor='mm')
-
-            by = BytesIO()
-            im.save(by, 'PNG')
-            async with aiofiles.open(platedir / f'{_v}.png', 'wb') as f:
-                await f.write(by.getbuffer())
-            log.info(f'{_v}代牌子更新完成')
-        return f'完成表更新完成'
+            if (ids := plate_table_ids(_v)) is None:
+                log.warning(f'未找到「{_v}」代牌子数据，跳过生成')
+                continue
+            digest = table_hash({r: [(_id, _cover_stamp(_id)) for _id in ids[r]] for r in ids})
+            jobs[_v] = (digest, platedir / f'{_v}.png', draw_plate_table_board, (ids,))
+        msg = await render_tables('完成表', manifest['plate'], jobs)
+        await writefile(table_manifest_file, manifest)
+        return msg
     except Exception as e:
         log.error(traceback.format_exc())
-        return f'完成表更新失败，Error: {e}'
\ No newline at end of file
+        return f'完成表更新失败，Error: {e}'
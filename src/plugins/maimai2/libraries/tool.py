@@ -2,12 +2,17 @@ import asyncio
 import json
 import time
 from pathlib import Path
-from typing import Any, Union
+from typing import Any, Optional, Tuple, Union
 
 import aiofiles
-from playwright.async_api import async_playwright
+from playwright.async_api import Browser, Page, Playwright, async_playwright
 
-from ..config import SNAPSHOT_JS, pie_html_file
+from ..config import SNAPSHOT_JS, log, maiconfig
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 def qqhash(qq: int):
@@ -16,30 +21,228 @@ def qqhash(qq: int):
     return (days * qq) >> 8
 
 
+def loads(data: Union[str, bytes]) -> Any:
+    """解析 JSON，已安装 `orjson` 时使用 `orjson`"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(data: Any, indent: Optional[int] = None) -> bytes:
+    """
+    序列化为 UTF-8 编码的 JSON，不缩进时输出紧凑格式，已安装 `orjson` 时使用 `orjson`
+
+    Params:
+        `data`: 数据
+        `indent`: 缩进
+    Returns:
+        `bytes`
+    """
+    if indent is None:
+        if orjson is not None:
+            return orjson.dumps(data)
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return json.dumps(data, ensure_ascii=False, indent=indent).encode('utf-8')
+
+
 async def openfile(file: Path) -> Union[dict, list]:
-    async with aiofiles.open(file, 'r', encoding='utf-8') as f:
-        data = json.loads(await f.read())
+    async with aiofiles.open(file, 'rb') as f:
+        data = loads(await f.read())
     return data
 
 
-async def writefile(file: Path, data: Any) -> bool:
-    async with aiofiles.open(file, 'w', encoding='utf-8') as f:
-        await f.write(json.dumps(data, ensure_ascii=False, indent=4))
+async def writefile(file: Path, data: Any, indent: Optional[int] = 4) -> bool:
+    """
+    写入 JSON 文件
+
+    Params:
+        `file`: 文件路径
+        `data`: 数据
+        `indent`: 缩进，暂存数据传入 `None` 以紧凑格式写入
+    """
+    async with aiofiles.open(file, 'wb') as f:
+        await f.write(dumps(data, indent))
     return True
 
 
-async def run_chrome_to_base64() -> str:
-    async with async_playwright() as p:
-        browers = await p.chromium.launch(headless=True)
-        page = await browers.new_page(java_script_enabled=True)
-        await page.goto('file://' + str(pie_html_file))
-        await asyncio.sleep(2)
+class Timer:
+
+    def __init__(self, name: str) -> None:
+        """
+        记录各阶段耗时并输出日志
+
+        Params:
+            `name`: 流程名称
+        """
+        self.name = name
+        self.start = self.last = time.perf_counter()
+
+    def phase(self, name: str) -> float:
+        """
+        记录自上一阶段结束以来的耗时
+
+        Params:
+            `name`: 阶段名称
+        Returns:
+            `float` 耗时
+        """
+        now = time.perf_counter()
+        cost, self.last = now - self.last, now
+        log.info(f'{self.name}「{name}」耗时 {cost * 1000:.0f}ms')
+        return cost
+
+    def done(self) -> float:
+        """输出总耗时"""
+        cost = time.perf_counter() - self.start
+        log.success(f'{self.name}完成，总耗时 {cost * 1000:.0f}ms')
+        return cost
+
+
+FINISHED_JS = (
+    "() => new Promise(resolve => {"
+    "const chart = echarts.getInstanceByDom(document.querySelector('div[_echarts_instance_]'));"
+    "chart.on('finished', () => resolve(true));"
+    "chart.setOption({animation: false});"
+    "})"
+)
+"""等待 ECharts 渲染完成，关闭动画后重新渲染，`finished` 事件触发时图表已为最终状态"""
+
+
+class BrowserPool:
+
+    def __init__(self) -> None:
+        """
+        常驻浏览器页面池，每个页面同一时刻只处理一个请求，页面数即为最大并发数
+        """
+        self._playwright: Optional[Playwright] = None
+        self._browser: Optional[Browser] = None
+        self._pages: Optional[asyncio.Queue[Optional[Page]]] = None
+        """页面池，页面池重建时旧队列中放入 `None` 唤醒等待中的请求"""
+        self._lock = asyncio.Lock()
+        self.closed = False
+        self.recycled = 0
+        """因异常而重建的页面数"""
+
+    @property
+    def size(self) -> int:
+        return max(maiconfig.maimaidxbrowserpages, 1)
+
+    async def start(self) -> None:
+        """启动浏览器并创建页面"""
+        async with self._lock:
+            self.closed = False
+            if self._browser is not None and self._browser.is_connected():
+                return
+            await self._close()
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=True)
+            self._pages = asyncio.Queue()
+            for _ in range(self.size):
+                self._pages.put_nowait(await self._new_page())
+            log.info(f'浏览器已启动：页面数「{self.size}」')
+
+    async def _new_page(self) -> Page:
+        return await self._browser.new_page(java_script_enabled=True)
+
+    async def _close(self) -> None:
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+        if self._pages is not None:
+            while not self._pages.empty():
+                self._pages.get_nowait()
+            self._pages.put_nowait(None)
+            self._pages = None
+
+    async def close(self) -> None:
+        """关闭浏览器"""
+        async with self._lock:
+            self.closed = True
+            await self._close()
+
+    async def restart(self) -> None:
+        """关闭并重新启动浏览器，已调用 `close` 时不再启动"""
+        async with self._lock:
+            await self._close()
+        if not self.closed:
+            await self.start()
+
+    async def _recycle(self, page: Page) -> Optional[Page]:
+        """
+        关闭异常页面并创建新页面，浏览器已断开或无法创建页面时重启浏览器
         
-        content: str = await page.evaluate(SNAPSHOT_JS)
-        await browers.close()
+        Returns:
+            `Optional[Page]` 新页面，重启浏览器时页面池已重新创建，返回 `None`
+        """
+        self.recycled += 1
+        try:
+            await page.close()
+        except Exception:
+            pass
+        if self._browser is not None and self._browser.is_connected():
+            try:
+                return await self._new_page()
+            except Exception as e:
+                log.warning(f'创建页面失败：{type(e)}，正在重启浏览器')
+        else:
+            log.warning('浏览器已断开，正在重启浏览器')
+        await self.restart()
+        return None
+
+    async def _acquire(self) -> Tuple[asyncio.Queue, Page]:
+        """
+        从页面池取出页面，取到 `None` 说明页面池已重建，放回 `None` 唤醒其余请求后转到新页面池
+
+        Returns:
+            `Tuple[asyncio.Queue, Page]` (页面池, 页面)
+        """
+        while True:
+            if self.closed:
+                raise RuntimeError('浏览器已关闭')
+            if self._pages is None or self._browser is None or not self._browser.is_connected():
+                await self.start()
+            pages = self._pages
+            page = await pages.get()
+            if page is not None:
+                return pages, page
+            pages.put_nowait(None)
+
+    async def snapshot(self, html: str, base: Path, timeout: float = 10) -> str:
+        """
+        渲染 ECharts 页面并截取图表
         
-    content_array = content.split(',')
-    if len(content_array) != 2:
-        raise OSError(content_array)
+        Params:
+            `html`: 页面内容
+            `base`: 页面中相对路径的根目录
+            `timeout`: 超时时间（秒）
+        Returns:
+            `str` base64 图片
+        """
+        pages, page = await self._acquire()
+        try:
+            html = html.replace('<head>', f'<head><base href="{base.resolve().as_uri()}/">', 1)
+            await page.set_content(html, timeout=timeout * 1000, wait_until='load')
+            await asyncio.wait_for(page.evaluate(FINISHED_JS), timeout)
+            content: str = await page.evaluate(SNAPSHOT_JS)
+        except Exception:
+            broken, page = page, None
+            page = await self._recycle(broken)
+            raise
+        finally:
+            if page is not None and pages is self._pages:
+                pages.put_nowait(page)
+        
+        content_array = content.split(',')
+        if len(content_array) != 2:
+            raise OSError(content_array)
+
+        return 'base64://' + content_array[-1]
+
 
-    return 'base64://' + content_array[-1]
\ No newline at end of file
+browser = BrowserPool()
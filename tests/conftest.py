@@ -0,0 +1,8 @@
+import sys
+import tempfile
+from pathlib import Path
+
+import nonebot
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+nonebot.init(driver='~none', maimaidxpath=tempfile.mkdtemp())
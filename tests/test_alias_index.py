@@ -0,0 +1,117 @@
+from typing import Dict, List
+
+import pytest
+
+from src.plugins.maimai2.libraries.maimaidx_model import Alias
+from src.plugins.maimai2.libraries.maimaidx_music import AliasList, alias_similarity, normalize_alias
+
+FIXTURE = [
+    (1, 'Oshama Scramble!', ['Oshama Scramble!', 'oshama', '大扫除', 'os']),
+    (2, 'PANDORA PARADOXXX', ['PANDORA PARADOXXX', '潘多拉', 'pan', 'ppx']),
+    (3, 'Garakuta Doll Play', ['Garakuta Doll Play', '垃圾人偶', 'garakuta', 'GDP']),
+    (4, 'Xevel', ['Xevel', 'xevel', 'ｘｅｖｅｌ']),
+    (5, 'Pandora Box', ['Pandora Box', '潘多拉魔盒', 'pandora']),
+    (6, '系ぎて', ['系ぎて', '系', 'tsunagite']),
+    (7, 'Panopticon', ['Panopticon', '全景监狱', 'pano']),
+]
+
+
+def alias_list() -> AliasList:
+    return AliasList(Alias(SongID=i, Name=name, Alias=list(names)) for i, name, names in FIXTURE)
+
+
+def linear_by_id(aliases: List[Alias], music_id: int) -> List[Alias]:
+    """改写前的线性查找"""
+    return [music for music in aliases if music.SongID == int(music_id)]
+
+
+def linear_by_alias(aliases: List[Alias], name: str) -> List[Alias]:
+    """改写前的线性查找，比较前对两侧归一化"""
+    key = normalize_alias(name)
+    return [music for music in aliases if key in {normalize_alias(a) for a in music.Alias}]
+
+
+def linear_prefix(aliases: List[Alias], prefix: str) -> List[str]:
+    key = normalize_alias(prefix)
+    return sorted({normalize_alias(a) for m in aliases for a in m.Alias if normalize_alias(a).startswith(key)})
+
+
+def linear_fuzzy(aliases: List[Alias], name: str, threshold: float) -> Dict[int, float]:
+    key = normalize_alias(name)
+    result: Dict[int, float] = {}
+    for music in aliases:
+        for alias in music.Alias:
+            candidate = normalize_alias(alias)
+            score = alias_similarity(key, candidate)
+            if candidate.startswith(key):
+                score = max(score, 1.0 if candidate == key else 0.9)
+            if score >= threshold:
+                result[music.SongID] = max(result.get(music.SongID, 0), round(score, 3))
+    return result
+
+
+def ids(aliases: List[Alias]) -> List[int]:
+    return sorted(music.SongID for music in aliases)
+
+
+@pytest.mark.parametrize('music_id', [1, 4, 7, 99])
+def test_by_id_matches_linear(music_id):
+    aliases = alias_list()
+    assert ids(aliases.by_id(music_id)) == ids(linear_by_id(aliases, music_id))
+
+
+@pytest.mark.parametrize('name', [alias for _, _, names in FIXTURE for alias in names] + ['missing'])
+def test_exact_alias_matches_linear(name):
+    aliases = alias_list()
+    assert ids(aliases.by_alias(name)) == ids(linear_by_alias(aliases, name))
+    # 原始写法能找到的别名，新索引同样能找到
+    assert set(ids([m for m in aliases if name in m.Alias])) <= set(ids(aliases.by_alias(name)))
+
+
+@pytest.mark.parametrize('name, expected', [
+    ('ＧＤＰ', [3]),
+    ('gdp', [3]),
+    ('  Oshama  Scramble! ', [1]),
+    ('ＯＳＨＡＭＡ', [1]),
+    ('XEVEL', [4]),
+])
+def test_width_case_and_spaces_are_normalised(name, expected):
+    assert ids(alias_list().by_alias(name)) == expected
+
+
+@pytest.mark.parametrize('prefix', ['pan', 'ＰＡＮ', 'o', '潘多', 'x', 'zzz'])
+def test_prefix_matches_linear(prefix):
+    aliases = alias_list()
+    assert sorted(aliases.by_prefix(prefix, limit=100)) == linear_prefix(aliases, prefix)
+    result = aliases.by_prefix(prefix, limit=2)
+    assert len(result) <= 2 and [len(r) for r in result] == sorted(len(r) for r in result)
+
+
+@pytest.mark.parametrize('name', ['pandora', '潘多拉魔', 'garakuta dol', 'oshama scrambl', 'tsunagi', 'panop'])
+@pytest.mark.parametrize('threshold', [0.3, 0.5, 0.8])
+def test_fuzzy_matches_linear(name, threshold):
+    aliases = alias_list()
+    result = {music.SongID: score for score, music in aliases.fuzzy(name, limit=100, threshold=threshold)}
+    assert result == linear_fuzzy(aliases, name, threshold)
+
+
+def test_fuzzy_threshold_and_order():
+    aliases = alias_list()
+    result = aliases.fuzzy('pandora', threshold=0.5)
+    scores = [score for score, _ in result]
+    assert scores == sorted(scores, reverse=True)
+    assert result[0][1].SongID == 5 and result[0][0] == 1.0
+    assert all(score >= 0.5 for score in scores)
+    assert aliases.fuzzy('完全无关', threshold=0.4) == []
+
+
+def test_append_and_add_alias_update_index():
+    aliases = alias_list()
+    aliases.build_index()
+    aliases.append(Alias(SongID=8, Name='Link', Alias=['Link', 'ＬＩＮＫ']))
+    assert aliases.add_alias(3, '人偶')
+    assert not aliases.add_alias(99, 'none')
+    assert ids(aliases.by_alias('link')) == [8]
+    assert ids(aliases.by_alias('人偶')) == [3]
+    assert ids(aliases.by_alias('人偶')) == ids(linear_by_alias(aliases, '人偶'))
+    assert 'link' in aliases.by_prefix('li')
@@ -0,0 +1,32 @@
+from PIL import Image
+
+from src.plugins.maimai2.libraries.image import AssetCache
+
+
+def solid(size):
+    return lambda: Image.new('RGBA', size)
+
+
+def test_maxsize_limits_entries():
+    cache = AssetCache(1 << 30, 2)
+    for height in (10, 20, 30):
+        cache.fetch(('<background>', (10, height)), solid((10, height)))
+    assert len(cache) == 2
+    assert cache.used == 10 * (20 + 30) * 4
+
+
+def test_budget_evicts_least_recently_used():
+    cache = AssetCache(10 * 10 * 4 * 2)
+    first = cache.fetch(('a', None), solid((10, 10)))
+    cache.fetch(('b', None), solid((10, 10)))
+    assert cache.fetch(('a', None), solid((10, 10))) is first
+    cache.fetch(('c', None), solid((10, 10)))
+    assert cache.hits == 1
+    assert cache.fetch(('a', None), solid((10, 10))) is first
+    assert cache.misses == 3
+
+
+def test_oversized_image_is_not_cached():
+    cache = AssetCache(100)
+    cache.fetch(('big', None), solid((10, 10)))
+    assert len(cache) == 0 and cache.used == 0
@@ -0,0 +1,142 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from src.plugins.maimai2.libraries import tool
+
+
+class FakePage:
+
+    def __init__(self, browser: 'FakeBrowser') -> None:
+        self.browser = browser
+        self.closed = False
+
+    async def set_content(self, *args, **kwargs) -> None:
+        assert not self.closed, 'closed page reused'
+        await asyncio.sleep(0.01)
+        if self.browser.crash:
+            raise RuntimeError('page crashed')
+
+    async def evaluate(self, js: str):
+        if js == tool.SNAPSHOT_JS:
+            return 'data:image/png;base64,AAAA'
+        return True
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class FakeBrowser:
+
+    def __init__(self) -> None:
+        self.connected = True
+        self.crash = False
+        self.fail_new_page = False
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    async def new_page(self, **kwargs) -> FakePage:
+        if self.fail_new_page:
+            raise RuntimeError('cannot create page')
+        return FakePage(self)
+
+    async def close(self) -> None:
+        self.connected = False
+
+
+class FakePlaywright:
+
+    def __init__(self) -> None:
+        self.chromium = self
+        self.browsers = []
+
+    async def start(self) -> 'FakePlaywright':
+        return self
+
+    async def launch(self, **kwargs) -> FakeBrowser:
+        await asyncio.sleep(0.01)
+        self.browsers.append(FakeBrowser())
+        return self.browsers[-1]
+
+    async def stop(self) -> None:
+        pass
+
+
+@pytest.fixture
+def playwright(monkeypatch) -> FakePlaywright:
+    fake = FakePlaywright()
+    monkeypatch.setattr(tool, 'async_playwright', lambda: fake)
+    monkeypatch.setattr(tool.maiconfig, 'maimaidxbrowserpages', 2)
+    return fake
+
+
+def snapshot(pool: tool.BrowserPool):
+    return pool.snapshot('<head></head>', Path('.'))
+
+
+def test_waiters_move_to_new_pool_on_restart(playwright):
+    pool = tool.BrowserPool()
+
+    async def main():
+        await pool.start()
+        tasks = [asyncio.ensure_future(snapshot(pool)) for _ in range(6)]
+        await asyncio.sleep(0.005)
+        playwright.browsers[-1].connected = False
+        await pool.start()
+        return await asyncio.wait_for(asyncio.gather(*tasks), 2)
+
+    assert asyncio.run(main()) == ['base64://AAAA'] * 6
+
+
+def test_waiters_fail_after_close(playwright):
+    pool = tool.BrowserPool()
+
+    async def main():
+        await pool.start()
+        tasks = [asyncio.ensure_future(snapshot(pool)) for _ in range(4)]
+        await asyncio.sleep(0.005)
+        await pool.close()
+        return await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), 2)
+
+    results = asyncio.run(main())
+    assert any(isinstance(r, RuntimeError) for r in results)
+
+
+def test_crash_during_recycle_does_not_requeue_closed_page(playwright):
+    pool = tool.BrowserPool()
+
+    async def main():
+        await pool.start()
+        browser = playwright.browsers[-1]
+        browser.crash = browser.fail_new_page = True
+        with pytest.raises(RuntimeError):
+            await snapshot(pool)
+        assert len(playwright.browsers) == 2
+        pages = []
+        while not pool._pages.empty():
+            pages.append(pool._pages.get_nowait())
+        assert pages and not any(page.closed for page in pages)
+        for page in pages:
+            pool._pages.put_nowait(page)
+        return await asyncio.wait_for(asyncio.gather(*(snapshot(pool) for _ in range(4))), 2)
+
+    assert asyncio.run(main()) == ['base64://AAAA'] * 4
+
+
+def test_broken_page_is_replaced(playwright):
+    pool = tool.BrowserPool()
+
+    async def main():
+        await pool.start()
+        browser = playwright.browsers[-1]
+        browser.crash = True
+        with pytest.raises(RuntimeError):
+            await snapshot(pool)
+        browser.crash = False
+        assert pool._pages.qsize() == pool.size
+        return await snapshot(pool)
+
+    assert asyncio.run(main()) == 'base64://AAAA'
+    assert pool.recycled == 1
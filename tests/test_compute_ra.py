@@ -0,0 +1,83 @@
+import math
+
+import numpy as np
+import pytest
+
+from src.plugins.maimai2.config import achievementList
+from src.plugins.maimai2.libraries.maimaidx_best_50 import computeRa, computeRa_array, rateList
+
+
+def legacy_compute_ra(ds: float, achievement: float):
+    """改写前的逐级判断实现，作为对照"""
+    if achievement < 50:
+        baseRa, rate = 7.0, 'D'
+    elif achievement < 60:
+        baseRa, rate = 8.0, 'C'
+    elif achievement < 70:
+        baseRa, rate = 9.6, 'B'
+    elif achievement < 75:
+        baseRa, rate = 11.2, 'BB'
+    elif achievement < 80:
+        baseRa, rate = 12.0, 'BBB'
+    elif achievement < 90:
+        baseRa, rate = 13.6, 'A'
+    elif achievement < 94:
+        baseRa, rate = 15.2, 'AA'
+    elif achievement < 97:
+        baseRa, rate = 16.8, 'AAA'
+    elif achievement < 98:
+        baseRa, rate = 20.0, 'S'
+    elif achievement < 99:
+        baseRa, rate = 20.3, 'Sp'
+    elif achievement < 99.5:
+        baseRa, rate = 20.8, 'SS'
+    elif achievement < 100:
+        baseRa, rate = 21.1, 'SSp'
+    elif achievement < 100.5:
+        baseRa, rate = 21.6, 'SSS'
+    else:
+        baseRa, rate = 22.4, 'SSSp'
+    return math.floor(ds * (min(100.5, achievement) / 100) * baseRa), rate
+
+
+DS = [round(1 + n / 10, 1) for n in range(150)]
+BOUNDARIES = [
+    value
+    for cutoff in achievementList
+    for value in (cutoff, round(cutoff - 0.0001, 4), float(np.nextafter(cutoff, 0)), round(cutoff + 0.0001, 4))
+]
+ACHIEVEMENTS = sorted(set(
+    [round(n / 100, 4) for n in range(0, 10200, 7)] + BOUNDARIES + [0.0, 100.5, 100.6, 101.0]
+))
+
+
+@pytest.mark.parametrize('achievement', BOUNDARIES + [100.5, 100.6, 101.0])
+def test_scalar_boundaries(achievement: float):
+    for ds in DS:
+        assert computeRa(ds, achievement, israte=True) == legacy_compute_ra(ds, achievement)
+        assert computeRa(ds, achievement) == legacy_compute_ra(ds, achievement)[0]
+        assert computeRa(ds, achievement, onlyrate=True) == legacy_compute_ra(ds, achievement)[1]
+
+
+def test_scalar_grid():
+    for ds in DS:
+        for achievement in ACHIEVEMENTS:
+            assert computeRa(ds, achievement, israte=True) == legacy_compute_ra(ds, achievement), (ds, achievement)
+
+
+def test_array_grid():
+    ra, rank = computeRa_array(np.array(DS)[:, None], np.array(ACHIEVEMENTS)[None, :])
+    assert ra.shape == rank.shape == (len(DS), len(ACHIEVEMENTS))
+    for i, ds in enumerate(DS):
+        for j, achievement in enumerate(ACHIEVEMENTS):
+            expected = legacy_compute_ra(ds, achievement)
+            assert (int(ra[i, j]), rateList[rank[i, j]]) == expected, (ds, achievement)
+
+
+def test_array_sequence_input():
+    ds = [13.7, 14.9, 15.0]
+    achievement = [100.5, 99.4999, 80.0]
+    ra, rank = computeRa_array(ds, achievement)
+    assert [(int(r), rateList[n]) for r, n in zip(ra, rank)] == [
+        legacy_compute_ra(d, a) for d, a in zip(ds, achievement)
+    ]
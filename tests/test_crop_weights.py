@@ -0,0 +1,62 @@
+import random
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.plugins.maimai2.libraries.maimaidx_music import CropWeights
+
+
+@pytest.fixture
+def weights(tmp_path):
+    rng = np.random.default_rng(0)
+    covers = {}
+    for cover, size in enumerate([(190, 190), (400, 400), (320, 200)]):
+        path = tmp_path / f'{cover}.png'
+        Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)).save(path)
+        covers[cover] = path
+    crop = CropWeights()
+    assert crop.build(covers, tmp_path / 'weights.npz') == len(covers)
+    return crop, covers, tmp_path / 'weights.npz'
+
+
+@pytest.mark.parametrize('scale', [0.15, 0.2, 0.27, 0.35, 0.399, 0.4])
+def test_sample_keeps_crop_inside_image(weights, scale):
+    crop, covers, _ = weights
+    random.seed(0)
+    for cover, path in covers.items():
+        w, h = Image.open(path).size
+        w2, h2 = int(w * scale), int(h * scale)
+        for _ in range(500):
+            px, py = crop.sample(cover, scale)
+            assert 0 <= px <= 1 - scale and 0 <= py <= 1 - scale
+            x, y = int(px * w), int(py * h)
+            assert x + w2 <= w and y + h2 <= h
+
+
+def test_sample_unknown_cover(weights):
+    crop, _, _ = weights
+    assert crop.sample(99, 0.2) is None
+
+
+def test_build_reuses_unchanged_covers(weights):
+    crop, covers, path = weights
+    cached = CropWeights()
+    assert cached.load(path) and len(cached) == len(covers)
+    assert cached.build(covers, path) == 0
+    np.testing.assert_array_equal(cached.cells, crop.cells)
+    np.testing.assert_array_equal(cached.offset, crop.offset)
+
+
+@pytest.mark.parametrize('scale', [0.15, 0.2, 0.27, 0.35, 0.399, 0.4])
+def test_sample_bottom_right_cell(weights, monkeypatch, scale):
+    crop, _, _ = weights
+    r = crop.resolution
+    # 每个分段只保留最靠右下的合法格子
+    for k, hi in enumerate(crop.scales[1:]):
+        side = r - int(np.ceil(hi * r)) + 1
+        start, end = crop.offset[0, k], crop.offset[0, k + 1]
+        crop.cells[start:end] = (side - 1) * r + side - 1
+    monkeypatch.setattr(random, 'random', lambda: 0.999999)
+    px, py = crop.sample(0, scale)
+    assert px <= 1 - scale and py <= 1 - scale
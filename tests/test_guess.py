@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.plugins.maimai2.libraries import maimaidx_music
+from src.plugins.maimai2.libraries.maimaidx_model import Alias
+from src.plugins.maimai2.libraries.maimaidx_music import AliasList, guess, mai
+
+GID = 10001
+
+
+@pytest.fixture
+def round_(monkeypatch):
+    aliases = AliasList([
+        Alias(SongID=834, Name='PANDORA PARADOXXX', Alias=['潘多拉', 'PPX']),
+        Alias(SongID=11311, Name='Xevel', Alias=['Xevel']),
+    ])
+    monkeypatch.setattr(mai, 'total_alias_list', aliases, raising=False)
+    monkeypatch.setattr(maimaidx_music.maiconfig, 'maimaidxguessfuzzy', 0)
+    music = SimpleNamespace(id='834', title='PANDORA PARADOXXX')
+    guess.Group[GID] = SimpleNamespace(answer=guess.answer_set(music))
+    yield
+    guess.Group.pop(GID, None)
+
+
+def test_answer_set_is_id_and_aliases(round_):
+    assert guess.Group[GID].answer == frozenset({'834', '潘多拉', 'ppx'})
+
+
+@pytest.mark.parametrize('ans', ['潘多拉', 'ppx', 'PPX', ' P P X '])
+def test_check_alias_hit(round_, ans):
+    assert guess.check(GID, ans)
+
+
+@pytest.mark.parametrize('ans', ['834', '８３４'])
+def test_check_id_hit(round_, ans):
+    assert guess.check(GID, ans)
+
+
+@pytest.mark.parametrize('ans', ['ＰＰＸ', 'ｐｐｘ', '潘多拉　'])
+def test_check_full_width_is_normalised(round_, ans):
+    assert guess.check(GID, ans)
+
+
+@pytest.mark.parametrize('ans', ['Xevel', '11311', '83', '潘多', 'PANDORA PARADOXXX'])
+def test_check_miss(round_, ans):
+    assert not guess.check(GID, ans)
+
+
+def test_check_fuzzy_tolerance(round_, monkeypatch):
+    assert not guess.check(GID, '潘多拉拉')
+    monkeypatch.setattr(maimaidx_music.maiconfig, 'maimaidxguessfuzzy', 0.6)
+    assert guess.check(GID, '潘多拉拉')
+    assert not guess.check(GID, '835')
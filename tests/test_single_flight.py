@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from src.plugins.maimai2.libraries.maimaidx_cache import SingleFlight
+
+
+def test_concurrent_calls_are_coalesced():
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return 'data'
+
+    async def main():
+        return await asyncio.gather(*(flight.do('key', fetch) for _ in range(5)))
+
+    assert asyncio.run(main()) == ['data'] * 5
+    assert calls == 1
+    assert flight.shared == 4
+    assert flight.inflight == 0
+
+
+def test_owner_cancelled_waiter_gets_result():
+    flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return 'data'
+
+    async def main():
+        owner = asyncio.ensure_future(flight.do('key', fetch))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(flight.do('key', fetch))
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        return await waiter
+
+    assert asyncio.run(main()) == 'data'
+    assert flight.calls == 1
+
+
+def test_exception_is_shared_and_key_released():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError('upstream')
+
+    async def ok():
+        return 'retry'
+
+    async def main():
+        results = await asyncio.gather(flight.do('key', fail), flight.do('key', fail), return_exceptions=True)
+        assert [type(r) for r in results] == [ValueError, ValueError]
+        await asyncio.sleep(0)
+        return await flight.do('key', ok)
+
+    assert asyncio.run(main()) == 'retry'
+    assert flight.inflight == 0
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from src.plugins.maimai2.libraries import maimaidx_update_plate
+from src.plugins.maimai2.libraries.maimaidx_update_plate import render_tables, table_hash
+
+
+def draw(key):
+    ...
+
+
+@pytest.fixture
+def rendered(monkeypatch):
+    keys = []
+
+    async def submit(func, args, lossless=False):
+        keys.append(args[0])
+        if args[0] == 'broken':
+            raise RuntimeError('render failed')
+        return args[0].encode(), 0.0
+
+    monkeypatch.setattr(maimaidx_update_plate.render, 'submit', submit)
+    return keys
+
+
+def make_jobs(tmp_path, contents):
+    return {
+        key: (table_hash(data), tmp_path / f'{key}.png', draw, (key,)) 
+        for key, data in contents.items()
+    }
+
+
+def test_table_hash_is_stable():
+    data = {'14': [('834', [13.0, 14.4], '14', 'SD', ('834.png', 1.0))]}
+    assert table_hash(data) == table_hash({'14': [('834', [13.0, 14.4], '14', 'SD', ('834.png', 1.0))]})
+    assert table_hash(data) != table_hash({'14': [('834', [13.0, 14.4], '14', 'SD', ('834.png', 2.0))]})
+
+
+def test_only_stale_tables_are_rendered(tmp_path, rendered):
+    contents = {'13': [1, 2], '13+': [3], '14': [4, 5]}
+    manifest = {}
+    asyncio.run(render_tables('定数表', manifest, make_jobs(tmp_path, contents)))
+    assert sorted(rendered) == ['13', '13+', '14']
+    assert manifest == {key: table_hash(data) for key, data in contents.items()}
+    assert (tmp_path / '14.png').read_bytes() == b'14'
+
+    rendered.clear()
+    msg = asyncio.run(render_tables('定数表', manifest, make_jobs(tmp_path, contents)))
+    assert rendered == [] and '无需更新' in msg
+
+    # 内容变化
+    contents['13+'] = [3, 6]
+    asyncio.run(render_tables('定数表', manifest, make_jobs(tmp_path, contents)))
+    assert rendered == ['13+']
+    assert manifest['13+'] == table_hash([3, 6])
+
+    # 内容未变但文件缺失
+    rendered.clear()
+    (tmp_path / '14.png').unlink()
+    asyncio.run(render_tables('定数表', manifest, make_jobs(tmp_path, contents)))
+    assert rendered == ['14'] and (tmp_path / '14.png').exists()
+
+
+def test_failed_table_stays_stale(tmp_path, rendered):
+    contents = {'broken': [1], '14': [2]}
+    manifest = {'broken': 'old'}
+    msg = asyncio.run(render_tables('定数表', manifest, make_jobs(tmp_path, contents)))
+    assert sorted(rendered) == ['14', 'broken']
+    assert manifest == {'broken': 'old', '14': table_hash([2])}
+    assert '「1/2」' in msg and 'broken' in msg
+
+    rendered.clear()
+    asyncio.run(render_tables('定数表', manifest, make_jobs(tmp_path, contents)))
+    assert rendered == ['broken']